@@ -0,0 +1,703 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+update_fm.py 性能基准
+在本地模拟 GitHub (文件树 API、raw 下载、仓库归档) 上测量 --add-missing 和 --check-updates
+在不同获取方式 (github / archive / source) 与解析方式 (主进程 / 进程池) 下的吞吐量。
+
+组成:
+    1. 语料: 生成合成的 flightmodels 目录 (或复制 --corpus 指定的 Datamine 快照)，
+       另外生成一份部分 FM 被修改过的版本，用于 --check-updates
+    2. 模拟服务器: 本地 HTTP 服务，可配置延迟、抖动、限流额度和错误率
+    3. 运行器: 每个 (获取方式, 解析进程数, 阶段) 在独立子进程中运行，
+       报告文件数/秒、峰值 RSS 和总耗时
+
+使用方法:
+    python bench_update_fm.py                                   # 默认: 300 架合成飞机, github 延迟配置
+    python bench_update_fm.py --aircraft 1000 --profile lan     # 无延迟，只测 CPU
+    python bench_update_fm.py --profile throttled --strategies github
+    python bench_update_fm.py --corpus ../War-Thunder-Datamine --json result.json
+    python bench_update_fm.py --serve                           # 只启动模拟服务器
+    python bench_update_fm.py --check-exhausted                 # 检查额度耗尽时快速失败
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import random
+import shutil
+import argparse
+import tarfile
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+import update_fm
+from update_fm import FM_PATH, git_blob_sha
+
+ARCHIVE_TOP_DIR = "War-Thunder-Datamine-master"
+
+# 子进程输出结果行的前缀
+RESULT_PREFIX = "BENCH_RESULT "
+
+# 延迟 / 限流配置: (延迟 ms, 抖动 ms, 每窗口请求额度 (0 = 不限), 窗口秒数, 错误率)
+PROFILES = {
+    "lan": (0, 0, 0, 0, 0.0),
+    "github": (80, 30, 5000, 3600, 0.0),
+    "flaky": (120, 60, 5000, 3600, 0.03),
+    "throttled": (80, 30, 60, 10, 0.0),
+}
+
+# --check-exhausted: 前 EXHAUSTED_BUDGET 个请求之后全部返回 429 + Retry-After: 3600，
+# 运行应在 EXHAUSTED_MAX_WALL_S 内中止，以 EXIT_ERROR 结束并在报告中记录额度耗尽
+EXHAUSTED_BUDGET = 20
+EXHAUSTED_RETRY_AFTER = 3600
+EXHAUSTED_MAX_WALL_S = 60
+
+STRATEGIES = ("github", "archive", "source")
+PHASES = ("add-missing", "check-updates")
+
+
+# ============================================================================
+# 语料
+# ============================================================================
+
+def _padding(rng: random.Random, size: int) -> Dict:
+    """与解析无关的填充字段，使文件大小接近真实 blkx"""
+    pad = {}
+    i = 0
+    while size > 0:
+        values = [round(rng.uniform(-1, 1), 4) for _ in range(16)]
+        pad[f"Table{i}"] = values
+        size -= 8 * 16 + 12
+        i += 1
+    return pad
+
+
+def _fm_blkx(rng: random.Random, file_kb: int) -> Dict:
+    vne = rng.randrange(500, 1200, 5)
+    return {
+        "Length": round(rng.uniform(8, 20), 2),
+        "VneControl": vne,
+        "Aerodynamics": {
+            "WingPlane": {
+                "Span": round(rng.uniform(9, 18), 2),
+                "Areas": {k: round(rng.uniform(1, 6), 3)
+                          for k in ("LeftIn", "LeftMid", "LeftOut", "RightIn", "RightMid", "RightOut")},
+                "Strength": {
+                    "VNE": vne,
+                    "MNE": round(rng.uniform(0.7, 1.0), 2),
+                    "CritOverload": [round(rng.uniform(-12, -6), 1), round(rng.uniform(12, 20), 1)],
+                },
+                "FlapsPolar0": {"alphaCritHigh": round(rng.uniform(14, 20), 1),
+                                "alphaCritLow": round(rng.uniform(-14, -8), 1)},
+                "FlapsPolar1": {"alphaCritHigh": round(rng.uniform(12, 18), 1),
+                                "alphaCritLow": round(rng.uniform(-12, -6), 1)},
+            },
+            "FlapsAxis": {
+                "Combat": {"Presents": True, "Flaps": 0.2},
+                "Takeoff": {"Flaps": 0.33},
+            },
+        },
+        "Mass": {
+            "EmptyMass": rng.randrange(2000, 15000, 10),
+            "MaxFuelMass0": rng.randrange(300, 5000, 10),
+            "MaxNitro": 0,
+            "GearDestructionIndSpeed": rng.randrange(300, 450, 5),
+            "FlapsDestructionIndSpeedP": [0.2, rng.randrange(400, 600, 5), 1.0, rng.randrange(250, 400, 5)],
+        },
+        "EngineType0": {
+            "Main": {"RPMMin": 600, "RPMMax": 2700, "RPMMaxAllowed": 3000},
+            "Mixer": {"NitroConsumption": 0},
+        },
+        "EngineType1": {},
+        "Padding": _padding(rng, file_kb * 1024),
+    }
+
+
+def _unit_blkx(rng: random.Random, fm_name: str, file_kb: int) -> Dict:
+    return {
+        "fmFile": f"fm/{fm_name}.blk",
+        "type": rng.choice(["typeFighter", "typeBomber", "typeAssault"]),
+        "Padding": _padding(rng, file_kb * 1024),
+    }
+
+
+def _write_json(path: str, data: Dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def make_corpus(root: str, aircraft: int, file_kb: int, seed: int = 0):
+    """在 root 下生成合成的 flightmodels 目录 (每架飞机一个 FM 文件和一个单位文件)"""
+    rng = random.Random(seed)
+    for i in range(aircraft):
+        name = f"bench_{i:05d}"
+        _write_json(os.path.join(root, FM_PATH, "fm", f"{name}.blkx"), _fm_blkx(rng, file_kb))
+        _write_json(os.path.join(root, FM_PATH, f"{name}.blkx"), _unit_blkx(rng, name, file_kb))
+
+
+def copy_corpus(src: str, root: str):
+    """复制 Datamine 快照中的 flightmodels 目录"""
+    shutil.copytree(os.path.join(src, FM_PATH), os.path.join(root, FM_PATH))
+
+
+def mutate_corpus(root: str, fraction: float) -> int:
+    """修改 fraction 比例的 FM 文件 (Length 加 0.1)，返回修改的文件数"""
+    fm_dir = os.path.join(root, FM_PATH, "fm")
+    names = sorted(n for n in os.listdir(fm_dir) if n.endswith(".blkx"))
+    if fraction <= 0 or not names:
+        return 0
+    step = max(1, round(1 / fraction))
+    changed = 0
+    for name in names[::step]:
+        path = os.path.join(fm_dir, name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except ValueError:
+            continue
+        if not isinstance(data, dict):
+            continue
+        length = data.get("Length")
+        data["Length"] = round((length if isinstance(length, (int, float)) else 0) + 0.1, 4)
+        _write_json(path, data)
+        changed += 1
+    return changed
+
+
+# ============================================================================
+# 模拟服务器
+# ============================================================================
+
+class StandInServer:
+    """
+    模拟 GitHub 的本地 HTTP 服务器
+
+    每个语料版本挂在 /<version>/ 下:
+        /<version>/git/trees/master?recursive=1   文件树 (含 git blob SHA)
+        /<version>/raw/<仓库路径>                  文件内容
+        /<version>/archive.tar.gz                  整个仓库的归档
+    每个响应前按配置延迟，超过额度时返回 403 (文件树) 或 429 + Retry-After (其他)，
+    并附带 X-RateLimit-* 头。指定 retry_after 时模拟次级限流: 超过额度的请求返回
+    429 + 固定的 Retry-After，不带 X-RateLimit-* 头。
+    """
+
+    def __init__(self, versions: Dict[str, str], latency_ms: float = 0, jitter_ms: float = 0,
+                 rate_limit: int = 0, window: float = 3600, error_rate: float = 0.0,
+                 port: int = 0, retry_after: Optional[int] = None):
+        self.versions = versions  # 版本名 -> 语料根目录
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit = rate_limit
+        self.window = window
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+
+        self._lock = threading.Lock()
+        self._trees: Dict[str, bytes] = {}
+        self._archives: Dict[str, bytes] = {}
+        self.stats = {"requests": 0, "limited": 0, "errors": 0, "bytes": 0}
+        self.reset_budget()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._handle(self)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def prepare(self):
+        """预先生成各版本的文件树和归档，避免第一个测试计入服务器端的准备时间"""
+        for version in self.versions:
+            self._tree(version)
+            self._archive(version)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_budget(self):
+        """重置限流窗口和统计 (每个测试阶段开始前调用)"""
+        with self._lock:
+            self._window_start = time.time()
+            self._used = 0
+            for key in self.stats:
+                self.stats[key] = 0
+
+    # ------------------------------------------------------------------
+    # 内容
+    # ------------------------------------------------------------------
+
+    def _files(self, version: str):
+        root = self.versions[version]
+        for dirpath, _, filenames in os.walk(os.path.join(root, FM_PATH)):
+            for filename in sorted(filenames):
+                full = os.path.join(dirpath, filename)
+                yield os.path.relpath(full, root).replace(os.sep, "/"), full
+
+    def _tree(self, version: str) -> bytes:
+        with self._lock:
+            if version not in self._trees:
+                tree = []
+                for path, full in self._files(version):
+                    with open(full, "rb") as f:
+                        data = f.read()
+                    tree.append({"path": path, "mode": "100644", "type": "blob",
+                                 "sha": git_blob_sha(data), "size": len(data)})
+                self._trees[version] = json.dumps(
+                    {"sha": version, "tree": tree, "truncated": False}).encode("utf-8")
+            return self._trees[version]
+
+    def _archive(self, version: str) -> bytes:
+        with self._lock:
+            if version not in self._archives:
+                buf = io.BytesIO()
+                with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+                    for path, full in self._files(version):
+                        tar.add(full, arcname=f"{ARCHIVE_TOP_DIR}/{path}")
+                self._archives[version] = buf.getvalue()
+            return self._archives[version]
+
+    # ------------------------------------------------------------------
+    # 请求处理
+    # ------------------------------------------------------------------
+
+    def _rate_headers(self) -> Tuple[bool, Dict[str, str]]:
+        """消耗一次额度，返回 (是否超限, 限流响应头)"""
+        with self._lock:
+            self.stats["requests"] += 1
+            if not self.rate_limit:
+                return False, {}
+            now = time.time()
+            if now - self._window_start >= self.window:
+                self._window_start = now
+                self._used = 0
+            over = self._used >= self.rate_limit
+            if not over:
+                self._used += 1
+            else:
+                self.stats["limited"] += 1
+            return over, {
+                "X-RateLimit-Limit": str(self.rate_limit),
+                "X-RateLimit-Remaining": str(self.rate_limit - self._used),
+                "X-RateLimit-Reset": str(int(self._window_start + self.window) + 1),
+                "X-RateLimit-Used": str(self._used),
+            }
+
+    def _handle(self, req: BaseHTTPRequestHandler):
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+        over, headers = self._rate_headers()
+        if self.retry_after is not None:
+            headers = {}  # 次级限流不公布额度
+        path = req.path.split("?", 1)[0]
+        version, _, rest = path.lstrip("/").partition("/")
+
+        if over and self.retry_after is not None:
+            req.send_response(429)
+            req.send_header("Retry-After", str(self.retry_after))
+            req.send_header("Content-Length", "0")
+            req.end_headers()
+            return
+        if over:
+            if rest.startswith("git/trees/"):
+                req.send_response(403)
+            else:
+                req.send_response(429)
+                retry = max(1, int(float(headers["X-RateLimit-Reset"]) - time.time()))
+                req.send_header("Retry-After", str(retry))
+            for k, v in headers.items():
+                req.send_header(k, v)
+            req.send_header("Content-Length", "0")
+            req.end_headers()
+            return
+
+        if self.error_rate and random.random() < self.error_rate:
+            with self._lock:
+                self.stats["errors"] += 1
+            req.send_response(503)
+            req.send_header("Content-Length", "0")
+            req.end_headers()
+            return
+
+        body = None
+        content_type = "application/octet-stream"
+        if version in self.versions:
+            if rest.startswith("git/trees/"):
+                body = self._tree(version)
+                content_type = "application/json"
+            elif rest == "archive.tar.gz":
+                body = self._archive(version)
+                content_type = "application/gzip"
+            elif rest.startswith("raw/"):
+                full = os.path.join(self.versions[version], *rest[len("raw/"):].split("/"))
+                if os.path.isfile(full):
+                    with open(full, "rb") as f:
+                        body = f.read()
+                    content_type = "text/plain; charset=utf-8"
+
+        if body is None:
+            req.send_response(404)
+            req.send_header("Content-Length", "0")
+            req.end_headers()
+            return
+
+        with self._lock:
+            self.stats["bytes"] += len(body)
+        req.send_response(200)
+        req.send_header("Content-Type", content_type)
+        req.send_header("Content-Length", str(len(body)))
+        for k, v in headers.items():
+            req.send_header(k, v)
+        req.end_headers()
+        req.wfile.write(body)
+
+
+# ============================================================================
+# 子进程: 运行单个阶段
+# ============================================================================
+
+def _rss_mb(maxrss: int) -> float:
+    # Linux 为 KB，macOS 为字节
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+
+def run_worker(spec: Dict):
+    """在当前进程运行一个阶段，结果以 RESULT_PREFIX 开头的一行 JSON 输出"""
+    u = update_fm
+
+    # 所有数据文件写到工作目录，不影响真实数据库
+    ws = spec["workspace"]
+    u.FM_DATA_CSV = os.path.join(ws, "fm_data_db.csv")
+    u.FM_NAMES_CSV = os.path.join(ws, "fm_names_db.csv")
+    u.FM_VERSION_FILE = os.path.join(ws, "fm_version")
+    u.FM_HISTORY_DB = os.path.join(ws, "fm_history.db")
+    u.BACKUP_DIR = os.path.join(ws, "backups")
+    os.environ.pop("GITHUB_TOKEN", None)
+
+    base = f"{spec['base_url']}/{spec['version']}"
+    strategy = spec["strategy"]
+    if strategy == "github":
+        fetcher = u.GitHubFetcher(max_workers=spec["workers"], rate=spec["rate"],
+                                  tree_url=f"{base}/git/trees/master", raw_base=f"{base}/raw")
+    elif strategy == "archive":
+        fetcher = u.ArchiveFetcher(f"{base}/archive.tar.gz", max_workers=spec["workers"])
+    else:
+        fetcher = u.LocalFetcher(spec["corpus"], max_workers=spec["workers"],
+                                 stat_cache_path=os.path.join(ws, "stat.json"))
+
+    # 统计实际获取并解析的文件数
+    counter = {"files": 0}
+    fetch_many = fetcher.fetch_many
+
+    def counted(names, download, desc=""):
+        for item in fetch_many(names, download, desc=desc):
+            counter["files"] += 1
+            yield item
+    fetcher.fetch_many = counted
+
+    db = u.FMDatabase()
+    manifest = u.SyncManifest(os.path.join(ws, "manifest.json"))
+    journal = u.CheckpointJournal(os.path.join(ws, "journal.jsonl"))
+    policy = u.AcceptPolicy(["all"])
+    report = u.ChangeReport()
+
+    start = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=spec["parse_procs"]) if spec["parse_procs"] > 0 else None
+    try:
+        u.run_updates(db, fetcher, manifest, journal,
+                      add_missing=spec["phase"] == "add-missing",
+                      check_updates=spec["phase"] != "add-missing",
+                      full=spec["full"], pool=pool, policy=policy, report=report)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    wall = time.perf_counter() - start
+    if report.exit_code() != u.EXIT_ERROR:
+        journal.clear()
+
+    result = dict(spec)
+    result.update({
+        "files": counter["files"],
+        "wall_s": round(wall, 3),
+        "files_per_s": round(counter["files"] / wall, 1) if wall > 0 else None,
+        "peak_rss_mb": None,
+        "children_rss_mb": None,
+        "summary": report.summary(),
+        "exit_code": report.exit_code(),
+        "errors": report.errors,
+    })
+    if resource is not None:
+        result["peak_rss_mb"] = round(_rss_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss), 1)
+        result["children_rss_mb"] = round(_rss_mb(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss), 1)
+    print(RESULT_PREFIX + json.dumps(result, ensure_ascii=False), flush=True)
+
+
+# ============================================================================
+# 运行器
+# ============================================================================
+
+def run_phase(spec: Dict, verbose: bool = False, timeout: Optional[float] = None) -> Optional[Dict]:
+    """在子进程中运行一个阶段 (峰值 RSS 互不影响)"""
+    try:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", json.dumps(spec)],
+            stdout=subprocess.PIPE, stderr=None if verbose else subprocess.DEVNULL,
+            text=True, encoding="utf-8", errors="replace", timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        print(f"  子进程超时 ({timeout:g} 秒)")
+        return None
+    result = None
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            result = json.loads(line[len(RESULT_PREFIX):])
+        elif verbose:
+            print("    " + line)
+    if result is None:
+        print(f"  子进程失败 (退出码 {proc.returncode})")
+    return result
+
+
+def check_exhausted(args) -> bool:
+    """
+    限流要求的等待 (Retry-After: 3600) 远超 MAX_RATE_LIMIT_WAIT 时，
+    GitHub 方式的运行应快速中止: 其他工作线程不能阻塞到重置时刻，也不能逐个下载
+    剩余文件；运行以 EXIT_ERROR 结束，报告中记录额度耗尽
+    """
+    tmp = tempfile.mkdtemp(prefix="bench_update_fm_")
+    try:
+        corpus = os.path.join(tmp, "v0")
+        make_corpus(corpus, args.aircraft, args.file_kb)
+        server = StandInServer({"v0": corpus}, rate_limit=EXHAUSTED_BUDGET,
+                               window=EXHAUSTED_RETRY_AFTER, retry_after=EXHAUSTED_RETRY_AFTER)
+        server.prepare()
+        server.start()
+        ws = os.path.join(tmp, "ws")
+        os.makedirs(ws)
+        spec = {
+            "strategy": "github", "parse_procs": 0, "phase": "add-missing", "version": "v0",
+            "workspace": ws, "base_url": server.base_url, "corpus": corpus,
+            "workers": max(2, args.workers), "rate": args.rate, "full": False,
+        }
+        print(f"检查: {EXHAUSTED_BUDGET} 个请求后返回 Retry-After: {EXHAUSTED_RETRY_AFTER}，"
+              f"{spec['workers']} 个工作线程")
+        result = run_phase(spec, verbose=args.verbose, timeout=EXHAUSTED_MAX_WALL_S)
+        stats = dict(server.stats)
+        server.stop()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if result is None:
+        print(f"失败: 运行未能在 {EXHAUSTED_MAX_WALL_S} 秒内结束 (工作线程被限流暂停阻塞)")
+        return False
+    print(f"  耗时 {result['wall_s']:.1f} 秒，请求 {stats['requests']} 次，其中被限流 {stats['limited']} 次")
+    if not stats["limited"]:
+        print("失败: 没有触发限流")
+        return False
+    if result["exit_code"] != update_fm.EXIT_ERROR:
+        print(f"失败: 退出码为 {result['exit_code']}，应为 {update_fm.EXIT_ERROR}")
+        return False
+    if not any("限流" in e for e in result["errors"]):
+        print(f"失败: 报告中没有记录额度耗尽 (errors: {result['errors']})")
+        return False
+    if result["summary"]["failed"]:
+        print(f"失败: 额度耗尽后没有中止，{result['summary']['failed']} 个文件逐个记为下载失败")
+        return False
+    print(f"  {result['errors'][0]}")
+    print("通过")
+    return True
+
+
+def _fmt(value, spec: str = "") -> str:
+    return "n/a" if value is None else format(value, spec)
+
+
+def print_table(results: List[Dict]):
+    header = f"{'获取':<8} {'解析进程':>8} {'阶段':<14} {'文件数':>7} {'耗时 s':>8} {'文件/秒':>9} {'峰值RSS MB':>11} {'子进程RSS MB':>12}"
+    print("\n" + header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['strategy']:<8} {r['parse_procs']:>8} {r['phase']:<14} {r['files']:>7} "
+              f"{_fmt(r['wall_s'], '.2f'):>8} {_fmt(r['files_per_s'], '.1f'):>9} "
+              f"{_fmt(r['peak_rss_mb'], '.1f'):>11} {_fmt(r['children_rss_mb'], '.1f'):>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="update_fm.py 性能基准 (本地模拟 GitHub)",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--aircraft", type=int, default=300,
+                        help="合成语料的飞机数量 (默认 300)")
+    parser.add_argument("--file-kb", type=int, default=40,
+                        help="合成 blkx 文件的大致大小 KB (默认 40)")
+    parser.add_argument("--corpus", metavar="DIR",
+                        help="使用 Datamine 快照 (检出目录) 代替合成语料")
+    parser.add_argument("--changed", type=float, default=0.1,
+                        help="--check-updates 阶段被修改的 FM 比例 (默认 0.1)")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES),
+                        help=f"获取方式，逗号分隔 (默认 {','.join(STRATEGIES)})")
+    parser.add_argument("--parse-procs", default=f"0,{os.cpu_count() or 1}",
+                        help="解析进程数列表，逗号分隔 (默认 0,CPU 核数)")
+    parser.add_argument("--phases", default=",".join(PHASES),
+                        help=f"测试阶段，逗号分隔 (默认 {','.join(PHASES)})")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="并发下载数 (默认 8)")
+    parser.add_argument("--rate", type=float, default=20.0,
+                        help="GitHubFetcher 每秒请求数，0 为不限速 (默认 20)")
+    parser.add_argument("--full", action="store_true",
+                        help="--check-updates 阶段忽略同步清单，全部重新比较")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="github",
+                        help="延迟和限流配置 (默认 github)")
+    parser.add_argument("--latency-ms", type=float, help="覆盖配置中的延迟")
+    parser.add_argument("--jitter-ms", type=float, help="覆盖配置中的延迟抖动")
+    parser.add_argument("--rate-limit", type=int, help="覆盖配置中的每窗口请求额度 (0 = 不限)")
+    parser.add_argument("--window", type=float, help="覆盖配置中的限流窗口秒数")
+    parser.add_argument("--error-rate", type=float, help="覆盖配置中的 503 错误率")
+    parser.add_argument("--json", metavar="PATH", help="将结果保存为 JSON")
+    parser.add_argument("--serve", action="store_true", help="只启动模拟服务器，不运行基准")
+    parser.add_argument("--check-exhausted", action="store_true",
+                        help="检查额度耗尽 (Retry-After 3600) 时运行快速失败而不是挂起")
+    parser.add_argument("--port", type=int, default=0, help="模拟服务器端口 (默认随机)")
+    parser.add_argument("--verbose", action="store_true", help="显示子进程输出")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(json.loads(args.worker))
+        return
+    if args.check_exhausted:
+        sys.exit(0 if check_exhausted(args) else 1)
+
+    latency, jitter, rate_limit, window, error_rate = PROFILES[args.profile]
+    latency = latency if args.latency_ms is None else args.latency_ms
+    jitter = jitter if args.jitter_ms is None else args.jitter_ms
+    rate_limit = rate_limit if args.rate_limit is None else args.rate_limit
+    window = window if args.window is None else args.window
+    error_rate = error_rate if args.error_rate is None else args.error_rate
+
+    strategies = [s for s in args.strategies.split(",") if s]
+    for s in strategies:
+        if s not in STRATEGIES:
+            parser.error(f"未知的获取方式: {s}")
+    phases = [p for p in args.phases.split(",") if p]
+    for p in phases:
+        if p not in PHASES:
+            parser.error(f"未知的阶段: {p}")
+    parse_procs = [int(p) for p in args.parse_procs.split(",") if p]
+
+    tmp = tempfile.mkdtemp(prefix="bench_update_fm_")
+    try:
+        # 语料: v0 为基线，v1 修改部分 FM
+        v0, v1 = os.path.join(tmp, "v0"), os.path.join(tmp, "v1")
+        print("正在准备语料...")
+        if args.corpus:
+            copy_corpus(args.corpus, v0)
+        else:
+            make_corpus(v0, args.aircraft, args.file_kb)
+        shutil.copytree(v0, v1)
+        changed = mutate_corpus(v1, args.changed)
+        n_files = sum(len(files) for _, _, files in os.walk(v0))
+        print(f"  基线 {n_files} 个文件，修改版本中 {changed} 个 FM 有变化")
+
+        server = StandInServer({"v0": v0, "v1": v1}, latency, jitter, rate_limit, window,
+                               error_rate, port=args.port)
+        server.prepare()
+        server.start()
+        print(f"模拟服务器: {server.base_url} (延迟 {latency}±{jitter} ms, "
+              f"额度 {rate_limit or '不限'}/{window:g}s, 错误率 {error_rate:g})")
+
+        if args.serve:
+            print(f"  文件树: {server.base_url}/v0/git/trees/master?recursive=1")
+            print(f"  raw:    {server.base_url}/v0/raw/{FM_PATH}/...")
+            print(f"  归档:   {server.base_url}/v0/archive.tar.gz")
+            print("按 Ctrl-C 退出")
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                pass
+            server.stop()
+            return
+
+        results = []
+        for strategy in strategies:
+            for procs in parse_procs:
+                # 每个组合使用独立的工作目录: add-missing 从空数据库开始，
+                # check-updates 在其结果 (及同步清单) 之上检查修改版本
+                ws = os.path.join(tmp, f"ws_{strategy}_{procs}")
+                os.makedirs(ws)
+                for phase in phases:
+                    version = "v0" if phase == "add-missing" else "v1"
+                    spec = {
+                        "strategy": strategy,
+                        "parse_procs": procs,
+                        "phase": phase,
+                        "version": version,
+                        "workspace": ws,
+                        "base_url": server.base_url,
+                        "corpus": v0 if version == "v0" else v1,
+                        "workers": args.workers,
+                        "rate": args.rate,
+                        "full": args.full,
+                    }
+                    print(f"运行: {strategy} / 解析进程 {procs} / {phase}")
+                    server.reset_budget()
+                    result = run_phase(spec, verbose=args.verbose)
+                    if result is None:
+                        continue
+                    result["server"] = dict(server.stats)
+                    for key in ("workspace", "base_url", "corpus"):
+                        result.pop(key, None)
+                    results.append(result)
+        server.stop()
+
+        print_table(results)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({
+                    "profile": {"latency_ms": latency, "jitter_ms": jitter, "rate_limit": rate_limit,
+                                "window": window, "error_rate": error_rate},
+                    "corpus": {"files": n_files, "changed": changed, "source": args.corpus or "synthetic"},
+                    "results": results,
+                }, f, ensure_ascii=False, indent=2)
+            print(f"\n结果已保存: {args.json}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
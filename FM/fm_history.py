@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+FM 数据版本历史 (SQLite)
+
+替代每次运行都完整复制 CSV 的备份方式: 每个版本只记录相对上一版本发生变化
+(新增/修改/删除) 的记录，任意历史快照都可以通过索引直接重建。
+
+表结构:
+    versions(id, created_at, game_version, note)
+    changes(version_id, tbl, name, record, deleted)
+        tbl: 'data' (fm_data_db.csv) 或 'names' (fm_names_db.csv)
+        record: 记录的 JSON (字段值统一为字符串)，删除时为 NULL
+"""
+
+import os
+import json
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+TABLES = ("data", "names")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    game_version TEXT,
+    note TEXT
+);
+CREATE TABLE IF NOT EXISTS changes (
+    version_id INTEGER NOT NULL REFERENCES versions(id),
+    tbl TEXT NOT NULL,
+    name TEXT NOT NULL,
+    record TEXT,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (tbl, name, version_id)
+);
+CREATE INDEX IF NOT EXISTS idx_changes_version ON changes(version_id);
+CREATE INDEX IF NOT EXISTS idx_versions_game ON versions(game_version);
+"""
+
+
+def _normalize(record: Dict) -> Dict[str, str]:
+    """字段值统一转为字符串，保证与 CSV 读回的记录可比较"""
+    return {k: str(v) for k, v in record.items()}
+
+
+class FMHistory:
+    """FM 数据的增量版本库"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def commit(self, tables: Dict[str, Dict[str, Dict]], game_version: str = "",
+               note: str = "", created_at: Optional[str] = None) -> Optional[int]:
+        """
+        记录一个新版本，只写入相对最新版本有变化的记录
+
+        Args:
+            tables: {'data': {name: record}, 'names': {name: record}}，缺省的表视为未变化
+            game_version: 游戏版本号 (fm_version)
+            created_at: 版本时间 (ISO 格式)，默认当前时间
+
+        Returns:
+            新版本 id；没有任何变化时返回 None (不创建空版本)
+        """
+        pending: List[Tuple[str, str, Optional[str], int]] = []
+        for tbl, records in tables.items():
+            if tbl not in TABLES:
+                raise ValueError(f"未知的表: {tbl}")
+            latest = self.snapshot(tbl)
+            for name, record in records.items():
+                rec = _normalize(record)
+                if latest.get(name) != rec:
+                    pending.append((tbl, name, json.dumps(rec, ensure_ascii=False), 0))
+            for name in latest.keys() - records.keys():
+                pending.append((tbl, name, None, 1))
+
+        if not pending:
+            return None
+
+        created_at = created_at or datetime.now().isoformat(timespec="seconds")
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO versions (created_at, game_version, note) VALUES (?, ?, ?)",
+                (created_at, game_version, note)
+            )
+            version_id = cur.lastrowid
+            self.conn.executemany(
+                "INSERT INTO changes (version_id, tbl, name, record, deleted) VALUES (?, ?, ?, ?, ?)",
+                [(version_id, tbl, name, rec, deleted) for tbl, name, rec, deleted in pending]
+            )
+        return version_id
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def latest_version(self) -> Optional[int]:
+        row = self.conn.execute("SELECT MAX(id) FROM versions").fetchone()
+        return row[0]
+
+    def versions(self) -> List[Tuple[int, str, str, str, int]]:
+        """[(id, created_at, game_version, note, 变化记录数), ...]"""
+        return self.conn.execute(
+            "SELECT v.id, v.created_at, v.game_version, v.note, COUNT(c.name) "
+            "FROM versions v LEFT JOIN changes c ON c.version_id = v.id "
+            "GROUP BY v.id ORDER BY v.id"
+        ).fetchall()
+
+    def snapshot(self, tbl: str, version_id: Optional[int] = None) -> Dict[str, Dict[str, str]]:
+        """
+        重建某个版本 (默认最新) 的完整表: 每个名称取 version_id 之前最后一次变化
+        """
+        if version_id is None:
+            version_id = self.latest_version()
+            if version_id is None:
+                return {}
+        rows = self.conn.execute(
+            "SELECT c.name, c.record FROM changes c "
+            "JOIN (SELECT name, MAX(version_id) AS vid FROM changes "
+            "      WHERE tbl = ? AND version_id <= ? GROUP BY name) last "
+            "  ON c.name = last.name AND c.version_id = last.vid "
+            "WHERE c.tbl = ? AND c.deleted = 0",
+            (tbl, version_id, tbl)
+        )
+        return {name: json.loads(rec) for name, rec in rows}
+
+    def field_history(self, name: str, field: str, tbl: str = "data") -> List[Tuple[int, str, str, Optional[str]]]:
+        """
+        某条记录某个字段的变化历史 (仅列出值发生变化的版本)
+
+        Returns:
+            [(version_id, created_at, game_version, value), ...]，删除时 value 为 None
+        """
+        rows = self.conn.execute(
+            "SELECT v.id, v.created_at, v.game_version, c.record, c.deleted "
+            "FROM changes c JOIN versions v ON v.id = c.version_id "
+            "WHERE c.tbl = ? AND c.name = ? ORDER BY v.id",
+            (tbl, name)
+        )
+        result = []
+        prev = object()
+        for vid, created_at, game_version, rec, deleted in rows:
+            value = None if deleted else json.loads(rec).get(field)
+            if value != prev:
+                result.append((vid, created_at, game_version, value))
+                prev = value
+        return result
+
+
+def read_csv_records(path: str, columns: List[str]) -> Dict[str, Dict[str, str]]:
+    """读取分号分隔的 CSV 为 {name: record}"""
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, 'r', encoding='utf-8') as f:
+        next(f, None)  # 跳过 Header
+        for line in f:
+            parts = line.rstrip('\r\n').split(';')
+            if parts and parts[0]:
+                records[parts[0]] = {
+                    col: parts[i] if i < len(parts) else "" for i, col in enumerate(columns)
+                }
+    return records
+
+
+def write_csv_records(path: str, columns: List[str], records: Dict[str, Dict]):
+    """
+    按名称排序写出分号分隔的 CSV (与 update_fm.py 的保存格式一致)
+
+    先写入同目录临时文件再重命名，中断时不会留下写了一半的 CSV
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(';'.join(columns) + '\n')
+        for name in sorted(records.keys()):
+            record = records[name]
+            f.write(';'.join(str(record.get(col, "")) for col in columns) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
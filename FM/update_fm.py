@@ -8,6 +8,9 @@ FM Database Update Tool
     python update_fm.py --add-missing    # 添加缺失的飞机FM和名称映射
     python update_fm.py --check-updates  # 检查并更新已有飞机的FM数据
     python update_fm.py --all            # 执行全部操作
+    python update_fm.py --all --archive master.tar.gz   # 从仓库归档读取 (单次传输)
+    python update_fm.py --all --source ../War-Thunder-Datamine   # 从本地检出读取 (离线)
+    python update_fm.py --all --accept new --report report.json   # 无人值守批处理
 
 环境变量:
     GITHUB_TOKEN    # 设置 GitHub Token 以避免 API 限流
@@ -16,10 +19,26 @@ FM Database Update Tool
 import os
 import sys
 import json
-import argparse
+import re
 import shutil
+import argparse
+import csv
+import time
+import random
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple, Any, Set
+import codecs
+import hashlib
+import heapq
+import itertools
+import tarfile
+import tempfile
+import threading
+import zipfile
+from collections import deque
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Any, Set, Callable, Iterator
 
 # 确保可以导入依赖库
 try:
@@ -33,6 +52,11 @@ except ImportError as e:
     print("请运行: pip install requests python-dotenv tqdm")
     sys.exit(1)
 
+# 共享项目根目录下的 core 模块 (列式 FM 存储)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.fm_store import FMStore, FM_DATA_COLUMNS
+from fm_history import FMHistory, read_csv_records, write_csv_records
+
 
 # ============================================================================
 # 常量配置
@@ -41,22 +65,50 @@ except ImportError as e:
 GITHUB_API_BASE = "https://api.github.com/repos/gszabi99/War-Thunder-Datamine/contents"
 GITHUB_RAW_BASE = "https://raw.githubusercontent.com/gszabi99/War-Thunder-Datamine/master"
 GITHUB_TREE_API = "https://api.github.com/repos/gszabi99/War-Thunder-Datamine/git/trees/master"
+GITHUB_ARCHIVE_URL = "https://codeload.github.com/gszabi99/War-Thunder-Datamine/tar.gz/refs/heads/master"
 FM_PATH = "aces.vromfs.bin_u/gamedata/flightmodels"
 
+# 默认并发下载数
+DEFAULT_WORKERS = 8
+
+# 流式读取文件树的块大小
+TREE_CHUNK_SIZE = 64 * 1024
+
+# 请求限速 (令牌桶，每个主机独立): 默认每秒请求数和突发容量
+DEFAULT_REQUEST_RATE = 20.0
+REQUEST_BURST = 16
+
+# 失败重试: 最大重试次数、指数退避的基数和上限 (秒)
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+# 剩余额度低于该值时开始按重置时间均匀限速 (额度充足时全速)
+RATE_LIMIT_LOW_WATER = 200
+
+# 限流等待超过该时间 (秒) 时放弃本次请求，已完成的部分保存在断点日志中
+MAX_RATE_LIMIT_WAIT = 15 * 60
+
+# 请求优先级 (数值越小越先发出)
+PRIORITY_TREE = 0
+PRIORITY_FM = 1
+PRIORITY_UNIT = 2
+
+# 可重试的服务器错误
+RETRY_STATUS = (500, 502, 503, 504)
+
 # 本地文件路径 (相对于脚本所在目录)
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 FM_DATA_CSV = os.path.join(SCRIPT_DIR, "fm_data_db.csv")
 FM_NAMES_CSV = os.path.join(SCRIPT_DIR, "fm_names_db.csv")
 FM_VERSION_FILE = os.path.join(SCRIPT_DIR, "fm_version")
+FM_HISTORY_DB = os.path.join(SCRIPT_DIR, "fm_history.db")
+FM_MANIFEST_FILE = os.path.join(SCRIPT_DIR, "fm_manifest.json")
+LOCAL_STAT_CACHE = os.path.join(SCRIPT_DIR, "fm_local_stat.json")
+FM_JOURNAL_FILE = os.path.join(SCRIPT_DIR, "fm_journal.jsonl")
+BACKUP_DIR = os.path.join(SCRIPT_DIR, "backups")
 
-# CSV 列定义
-FM_DATA_COLUMNS = [
-    "Name", "Length", "WingSpan", "WingArea", "EmptyMass", "MaxFuelMass",
-    "CritAirSpd", "CritAirSpdMach", "CritGearSpd", "CombatFlaps", "TakeoffFlaps",
-    "CritFlapsSpd", "CritWingOverload", "NumEngines", "RPM", "MaxNitro",
-    "NitroConsum", "CritAoA"
-]
-
+# CSV 列定义 (FM_DATA_COLUMNS 见 core/fm_store.py)
 FM_NAMES_COLUMNS = ["Name", "FmName", "Type", "English"]
 
 # 飞机类型映射
@@ -72,6 +124,84 @@ TYPE_MAP = {
 }
 
 
+def read_game_version() -> str:
+    """读取 fm_version 中记录的游戏版本号 (取最后一个非空行)"""
+    if not os.path.exists(FM_VERSION_FILE):
+        return ""
+    with open(FM_VERSION_FILE, 'r', encoding='utf-8') as f:
+        lines = [line.strip() for line in f if line.strip()]
+    return lines[-1] if lines else ""
+
+
+# ============================================================================
+# FieldSpec - 声明式字段路径
+# ============================================================================
+
+class FieldSpec:
+    """
+    声明式字段路径规格: {字段名: (key1, key2, ...)}
+    
+    构造时编译为前缀树，从 json.loads 解码后的字典中取出所有字段，需要读取的路径
+    集中声明在一处。缺失的路径不出现在结果中。
+    
+    这只是组织上的改进: 文件仍由 json.loads 完整解码 (纯 Python 的跳过式扫描实测
+    比 C 实现的 json.loads 更慢)，解析的开销靠 parse_many 的进程池分摊到多核。
+    """
+    
+    def __init__(self, spec: Dict[str, Tuple[str, ...]]):
+        self.spec = spec
+        # 节点: (子节点 {key: 节点}, 在此节点结束的字段名列表)
+        self._root: Tuple[Dict, List[str]] = ({}, [])
+        for field, path in spec.items():
+            node = self._root
+            for key in path:
+                node = node[0].setdefault(key, ({}, []))
+            node[1].append(field)
+    
+    def extract(self, data: Dict) -> Dict[str, Any]:
+        out = {}
+        stack = [(self._root, data)]
+        while stack:
+            (children, fields), obj = stack.pop()
+            for field in fields:
+                out[field] = obj
+            if children and isinstance(obj, dict):
+                for key, child in children.items():
+                    if key in obj:
+                        stack.append((child, obj[key]))
+        return out
+
+
+# FM 文件需要读取的字段
+FM_FIELD_SPEC = FieldSpec({
+    "Length": ("Length",),
+    "VneControl": ("VneControl",),
+    "WingSpan": ("Aerodynamics", "WingPlane", "Span"),
+    "WingAreas": ("Aerodynamics", "WingPlane", "Areas"),
+    "VNE": ("Aerodynamics", "WingPlane", "Strength", "VNE"),
+    "MNE": ("Aerodynamics", "WingPlane", "Strength", "MNE"),
+    "CritOverload": ("Aerodynamics", "WingPlane", "Strength", "CritOverload"),
+    "FlapsPolar0": ("Aerodynamics", "WingPlane", "FlapsPolar0"),
+    "FlapsPolar1": ("Aerodynamics", "WingPlane", "FlapsPolar1"),
+    "CombatAxis": ("Aerodynamics", "FlapsAxis", "Combat"),
+    "TakeoffFlaps": ("Aerodynamics", "FlapsAxis", "Takeoff", "Flaps"),
+    "Mass": ("Mass",),
+    "EmptyMass": ("Mass", "EmptyMass"),
+    "MaxFuelMass": ("Mass", "MaxFuelMass0"),
+    "MaxNitro": ("Mass", "MaxNitro"),
+    "GearDestructionIndSpeed": ("Mass", "GearDestructionIndSpeed"),
+    "FlapsDestructionIndSpeedP": ("Mass", "FlapsDestructionIndSpeedP"),
+    "Engine0Main": ("EngineType0", "Main"),
+    "NitroConsumption": ("EngineType0", "Mixer", "NitroConsumption"),
+})
+
+# 单位文件需要读取的字段
+UNIT_FIELD_SPEC = FieldSpec({
+    "fmFile": ("fmFile",),
+    "type": ("type",),
+})
+
+
 # ============================================================================
 # BlkxParser - 解析 blkx 文件
 # ============================================================================
@@ -88,17 +218,6 @@ class BlkxParser:
             print(f"  JSON 解析错误: {e}")
             return None
     
-    @staticmethod
-    def safe_get(data: Dict, *keys, default=None):
-        """安全地获取嵌套字典值"""
-        current = data
-        for key in keys:
-            if isinstance(current, dict) and key in current:
-                current = current[key]
-            else:
-                return default
-        return current
-    
     @staticmethod
     def extract_fm_data(fm_content: str, fm_name: str) -> Optional[Dict]:
         """
@@ -115,18 +234,18 @@ class BlkxParser:
         if not data:
             return None
         
+        # 按 FM_FIELD_SPEC 取出所有需要的原始值
+        raw = FM_FIELD_SPEC.extract(data)
         result = {"Name": fm_name}
         
         # Length - 根级
-        result["Length"] = BlkxParser.safe_get(data, "Length", default="")
+        result["Length"] = raw.get("Length", "")
         
         # WingSpan - Aerodynamics.WingPlane.Span
-        result["WingSpan"] = BlkxParser.safe_get(
-            data, "Aerodynamics", "WingPlane", "Span", default=""
-        )
+        result["WingSpan"] = raw.get("WingSpan", "")
         
         # WingArea - 需要计算: 各区域面积之和
-        wing_areas = BlkxParser.safe_get(data, "Aerodynamics", "WingPlane", "Areas", default={})
+        wing_areas = raw.get("WingAreas", {})
         if wing_areas:
             total_area = 0
             for key in ["LeftIn", "LeftMid", "LeftOut", "RightIn", "RightMid", "RightOut"]:
@@ -138,34 +257,26 @@ class BlkxParser:
             result["WingArea"] = ""
         
         # EmptyMass - Mass.EmptyMass
-        result["EmptyMass"] = BlkxParser.safe_get(data, "Mass", "EmptyMass", default="")
+        result["EmptyMass"] = raw.get("EmptyMass", "")
         
         # MaxFuelMass - Mass.MaxFuelMass0
-        result["MaxFuelMass"] = BlkxParser.safe_get(data, "Mass", "MaxFuelMass0", default="")
+        result["MaxFuelMass"] = raw.get("MaxFuelMass", "")
         
         # CritAirSpd - Aerodynamics.WingPlane.Strength.VNE (首选) 或 VneControl (备选)
-        crit_air_spd = BlkxParser.safe_get(
-            data, "Aerodynamics", "WingPlane", "Strength", "VNE", default=None
-        )
+        crit_air_spd = raw.get("VNE")
         if crit_air_spd is None:
-            crit_air_spd = BlkxParser.safe_get(data, "VneControl", default="")
+            crit_air_spd = raw.get("VneControl", "")
         result["CritAirSpd"] = crit_air_spd
         
         # CritAirSpdMach - Aerodynamics.WingPlane.Strength.MNE (Mach Never Exceed)
-        result["CritAirSpdMach"] = BlkxParser.safe_get(
-            data, "Aerodynamics", "WingPlane", "Strength", "MNE", default=""
-        )
+        result["CritAirSpdMach"] = raw.get("MNE", "")
         
         # CritGearSpd - Mass.GearDestructionIndSpeed
-        result["CritGearSpd"] = BlkxParser.safe_get(
-            data, "Mass", "GearDestructionIndSpeed", default=""
-        )
+        result["CritGearSpd"] = raw.get("GearDestructionIndSpeed", "")
         
         # CombatFlaps - Aerodynamics.FlapsAxis.Combat
         # 仅当 Combat.Presents == True 时才有意义
-        combat_axis = BlkxParser.safe_get(
-            data, "Aerodynamics", "FlapsAxis", "Combat", default={}
-        )
+        combat_axis = raw.get("CombatAxis", {})
         if combat_axis.get("Presents", False):
             flaps_ratio = combat_axis.get("Flaps", 0)
             result["CombatFlaps"] = round(flaps_ratio * 100, 1) if flaps_ratio else 0
@@ -173,22 +284,20 @@ class BlkxParser:
             result["CombatFlaps"] = 0
         
         # TakeoffFlaps (存储为百分比 0-100)
-        takeoff_flaps_ratio = BlkxParser.safe_get(
-            data, "Aerodynamics", "FlapsAxis", "Takeoff", "Flaps", default=None
-        )
+        takeoff_flaps_ratio = raw.get("TakeoffFlaps")
         if takeoff_flaps_ratio is not None:
             result["TakeoffFlaps"] = round(takeoff_flaps_ratio * 100, 1)
         else:
             result["TakeoffFlaps"] = 0
         
         # CritFlapsSpd - Mass.FlapsDestructionIndSpeedP 或 FlapsDestructionIndSpeedP0/P1
-        flaps_spd = BlkxParser.safe_get(data, "Mass", "FlapsDestructionIndSpeedP", default=None)
+        flaps_spd = raw.get("FlapsDestructionIndSpeedP")
         if flaps_spd and isinstance(flaps_spd, list):
             # 格式: [比例1, 速度1, 比例2, 速度2, ...]
             result["CritFlapsSpd"] = ",".join(str(v) for v in flaps_spd)
         else:
             # 尝试 FlapsDestructionIndSpeedP0/P1 格式
-            mass = BlkxParser.safe_get(data, "Mass", default={})
+            mass = raw.get("Mass", {})
             flaps_parts = []
             for i in range(10):  # 最多10个
                 key = f"FlapsDestructionIndSpeedP{i}"
@@ -203,9 +312,7 @@ class BlkxParser:
                 result["CritFlapsSpd"] = ""
         
         # CritWingOverload - Aerodynamics.WingPlane.Strength.CritOverload
-        crit_overload = BlkxParser.safe_get(
-            data, "Aerodynamics", "WingPlane", "Strength", "CritOverload", default=None
-        )
+        crit_overload = raw.get("CritOverload")
         if crit_overload and isinstance(crit_overload, list) and len(crit_overload) >= 2:
             # 格式: [负过载, 正过载]
             result["CritWingOverload"] = f"{crit_overload[0]},{crit_overload[1]}"
@@ -220,7 +327,7 @@ class BlkxParser:
         result["NumEngines"] = num_engines if num_engines > 0 else ""
         
         # RPM - EngineType0.Main 的 RPMMin, RPMMax, RPMMaxAllowed
-        engine0 = BlkxParser.safe_get(data, "EngineType0", "Main", default={})
+        engine0 = raw.get("Engine0Main", {})
         rpm_min = engine0.get("RPMMin", "")
         rpm_max = engine0.get("RPMMax", "")
         rpm_allowed = engine0.get("RPMMaxAllowed", "")
@@ -230,24 +337,18 @@ class BlkxParser:
             result["RPM"] = ""
         
         # MaxNitro - Mass.MaxNitro
-        result["MaxNitro"] = BlkxParser.safe_get(data, "Mass", "MaxNitro", default="")
+        result["MaxNitro"] = raw.get("MaxNitro", "")
         
         # NitroConsum - EngineType0.Mixer.NitroConsumption
-        nitro_consum = BlkxParser.safe_get(
-            data, "EngineType0", "Mixer", "NitroConsumption", default=None
-        )
+        nitro_consum = raw.get("NitroConsumption")
         result["NitroConsum"] = nitro_consum if nitro_consum is not None else 0
         
         # CritAoA - Aerodynamics.WingPlane.FlapsPolar0 的 alphaCritHigh, alphaCritLow
-        polar0 = BlkxParser.safe_get(
-            data, "Aerodynamics", "WingPlane", "FlapsPolar0", default={}
-        )
+        polar0 = raw.get("FlapsPolar0", {})
         aoa_high = polar0.get("alphaCritHigh", "")
         aoa_low = polar0.get("alphaCritLow", "")
         # 同时获取 FlapsPolar1 的值 (襟翼放下时)
-        polar1 = BlkxParser.safe_get(
-            data, "Aerodynamics", "WingPlane", "FlapsPolar1", default={}
-        )
+        polar1 = raw.get("FlapsPolar1", {})
         aoa_high_flaps = polar1.get("alphaCritHigh", "")
         aoa_low_flaps = polar1.get("alphaCritLow", "")
         
@@ -270,10 +371,11 @@ class BlkxParser:
         if not data:
             return None
         
+        raw = UNIT_FIELD_SPEC.extract(data)
         result = {}
         
         # fmFile 路径提取 fm 名称: "fm/xxx.blk" -> "xxx"
-        fm_file = data.get("fmFile", "")
+        fm_file = raw.get("fmFile", "")
         if fm_file:
             fm_name = fm_file.replace("fm/", "").replace(".blk", "")
             result["fm_name"] = fm_name
@@ -281,7 +383,7 @@ class BlkxParser:
             result["fm_name"] = ""
         
         # type - 可能是字符串或列表
-        raw_type = data.get("type", "")
+        raw_type = raw.get("type", "")
         # 如果是列表，取第一个元素
         if isinstance(raw_type, list):
             raw_type = raw_type[0] if raw_type else ""
@@ -293,14 +395,286 @@ class BlkxParser:
         return result
 
 
+# ============================================================================
+# 并行解析 (进程池)
+# ============================================================================
+
+def _parse_fm_job(fm_name: str, content: Optional[str]) -> Optional[Dict]:
+    """进程池任务: 解析 FM 文件 (必须是模块级函数以便 pickle)"""
+    if not content:
+        return None
+    return BlkxParser.extract_fm_data(content, fm_name)
+
+
+def _parse_unit_job(unit_name: str, content: Optional[str]) -> Optional[Dict]:
+    """进程池任务: 解析单位文件"""
+    if not content:
+        return None
+    return BlkxParser.extract_unit_info(content)
+
+
+def parse_many(fetched: Iterator[Tuple[str, Optional[str]]], job: Callable,
+               pool: Optional[ProcessPoolExecutor], window: int = 64) -> Iterator[Tuple[str, Optional[Dict]]]:
+    """
+    将 (name, content) 流交给进程池解析，按输入顺序产出 (name, 解析结果)
+    
+    pool 为 None 时在当前进程内顺序解析。同时在途的任务数不超过 window，
+    下载 (fetch_many) 与解析可以流水线并行。
+    """
+    if pool is None:
+        for name, content in fetched:
+            yield name, job(name, content)
+        return
+    
+    pending = deque()
+    for name, content in fetched:
+        pending.append((name, pool.submit(job, name, content)))
+        if len(pending) >= window:
+            done_name, future = pending.popleft()
+            yield done_name, future.result()
+    while pending:
+        done_name, future = pending.popleft()
+        yield done_name, future.result()
+
+
+# ============================================================================
+# RateLimiter - 令牌桶请求调度
+# ============================================================================
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After 头: 秒数或 HTTP 日期，返回需要等待的秒数"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitExhausted(requests.RequestException):
+    """额度耗尽且距重置超过 MAX_RATE_LIMIT_WAIT，请求被放弃"""
+
+
+class RateLimiter:
+    """
+    线程安全的令牌桶调度器
+    
+    - 按 rate (次/秒) 补充令牌，最多积攒 burst 个，每个请求消耗一个
+    - 剩余额度 (X-RateLimit-Remaining) 低于 RATE_LIMIT_LOW_WATER 时把速率降到
+      剩余额度可以均匀用到重置时刻；额度耗尽或收到 Retry-After 时暂停所有请求
+    - 需要等待超过 MAX_RATE_LIMIT_WAIT 时不暂停，直到重置之前 acquire() 直接抛出
+      RateLimitExhausted，所有请求立即失败而不是挂起
+    - 等待中的请求按 (priority, 到达顺序) 依次放行
+    """
+    
+    def __init__(self, rate: float = DEFAULT_REQUEST_RATE, burst: int = REQUEST_BURST):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._pause_until = 0.0
+        self._exhausted_until = 0.0
+        self._waiters: List[Tuple[int, int]] = []  # 堆: (priority, seq)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+    
+    def _refill(self, now: float):
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+    
+    def acquire(self, priority: int = PRIORITY_FM):
+        """阻塞直到轮到该请求且有可用令牌；额度耗尽 (见 exhausted()) 时抛出 RateLimitExhausted"""
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if now < self._exhausted_until:
+                        raise RateLimitExhausted(
+                            f"GitHub 限流，{self._exhausted_until - now:.0f} 秒后才会重置，已放弃")
+                    self._refill(now)
+                    timeout = None  # 不是队首: 等待通知
+                    if self._waiters[0] == ticket:
+                        if now < self._pause_until:
+                            timeout = self._pause_until - now
+                        elif self.rate <= 0 or self._tokens >= 1:
+                            if self.rate > 0:
+                                self._tokens -= 1
+                            heapq.heappop(self._waiters)
+                            self._cond.notify_all()
+                            return
+                        else:
+                            timeout = (1 - self._tokens) / self.rate
+                    self._cond.wait(timeout)
+            except BaseException:
+                if ticket in self._waiters:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                    self._cond.notify_all()
+                raise
+    
+    def pause(self, seconds: float):
+        """暂停所有请求 seconds 秒"""
+        with self._cond:
+            self._pause_until = max(self._pause_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+    
+    def exhausted(self) -> float:
+        """额度耗尽且等待超过 MAX_RATE_LIMIT_WAIT 时距重置的秒数，否则为 0"""
+        return max(0.0, self._exhausted_until - time.monotonic())
+    
+    def observe(self, headers) -> Optional[float]:
+        """
+        根据响应头调整速率
+        
+        Returns:
+            响应头要求的等待秒数 (Retry-After 或额度耗尽时距重置的时间)，没有则为 None
+        """
+        wait = _parse_retry_after(headers.get("Retry-After"))
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        
+        with self._cond:
+            if remaining is not None and reset is not None:
+                try:
+                    remaining = int(remaining)
+                    until_reset = max(0.0, float(reset) - time.time())
+                except ValueError:
+                    remaining = None
+                if remaining is not None:
+                    if remaining <= 0:
+                        wait = max(wait or 0.0, until_reset)
+                    elif self.base_rate > 0:
+                        self._refill(time.monotonic())
+                        if remaining < RATE_LIMIT_LOW_WATER:
+                            # 额度快用完: 把剩余额度均匀分配到重置之前
+                            self.rate = min(self.base_rate, remaining / max(until_reset, 1.0))
+                            self._tokens = min(self._tokens, float(remaining))
+                        else:
+                            self.rate = self.base_rate
+            if wait and wait > MAX_RATE_LIMIT_WAIT:
+                # 不暂停 (否则所有请求都会挂起到重置时刻)，让等待中和之后的请求立即放弃
+                self._exhausted_until = max(self._exhausted_until, time.monotonic() + wait)
+                self._cond.notify_all()
+            elif wait:
+                self._pause_until = max(self._pause_until, time.monotonic() + wait)
+                self._cond.notify_all()
+        return wait
+    
+    @staticmethod
+    def backoff(attempt: int) -> float:
+        """第 attempt 次重试的退避时间: 指数增长，带随机抖动避免多线程同时重试"""
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _is_rate_limited(resp) -> bool:
+    """429，或带限流头的 403 (无权限的 403 不重试)"""
+    if resp.status_code == 429:
+        return True
+    if resp.status_code != 403:
+        return False
+    return resp.headers.get("X-RateLimit-Remaining") == "0" or "Retry-After" in resp.headers
+
+
 # ============================================================================
 # GitHubFetcher - GitHub API 和文件下载
 # ============================================================================
 
+_TREE_START_RE = re.compile(r'"tree"\s*:\s*\[')
+_TRUNCATED_RE = re.compile(r'"truncated"\s*:\s*true')
+
+
+def iter_tree_entries(chunks: Iterator[bytes], prefix: str, status: Optional[Dict] = None) -> Iterator[Dict]:
+    """
+    流式解析 Git Trees API 的 JSON 响应，逐个产出路径以 prefix 开头的条目
+    
+    不构建完整的 JSON 对象: 在 "tree" 数组内逐个 raw_decode 条目对象，
+    不匹配的条目解码后立即丢弃，匹配的只保留 path/type/sha。
+    
+    Args:
+        chunks: 响应字节块
+        prefix: 需要保留的路径前缀
+        status: 可选，解析结束后写入 {'total': 条目总数, 'truncated': bool}
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    in_tree = False
+    done = False
+    total = 0
+    tail = ""
+    
+    for chunk in chunks:
+        buf = buf[pos:] + utf8.decode(chunk)
+        pos = 0
+        
+        if done:
+            tail += buf
+            buf = ""
+            continue
+        
+        if not in_tree:
+            m = _TREE_START_RE.search(buf)
+            if not m:
+                # 保留末尾一小段，防止 "tree" 键被块边界截断
+                pos = max(0, len(buf) - 32)
+                continue
+            in_tree = True
+            pos = m.end()
+        
+        while True:
+            # 跳过空白和逗号
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buf):
+                break
+            if buf[pos] == "]":
+                done = True
+                tail = buf[pos + 1:]
+                buf = ""
+                pos = 0
+                break
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break  # 对象不完整，等待更多数据
+            pos = end
+            total += 1
+            path = item.get("path", "")
+            if path.startswith(prefix):
+                yield {"path": path, "type": item.get("type", ""), "sha": item.get("sha", "")}
+    
+    if in_tree and not done:
+        raise ValueError("文件树 JSON 不完整")
+    if status is not None:
+        status["total"] = total
+        status["truncated"] = bool(_TRUNCATED_RE.search(tail + utf8.decode(b"", final=True)))
+
 class GitHubFetcher:
-    """从 GitHub 获取 War Thunder Datamine 数据"""
+    """
+    从 GitHub 获取 War Thunder Datamine 数据
     
-    def __init__(self):
+    所有请求经过按主机区分的 RateLimiter: 按额度限速，限流或服务器错误时退避重试。
+    tree_url / raw_base 可指向本地模拟服务器用于测试。
+    """
+    
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, rate: float = DEFAULT_REQUEST_RATE,
+                 tree_url: str = GITHUB_TREE_API, raw_base: str = GITHUB_RAW_BASE):
+        self.tree_url = tree_url
+        self.raw_base = raw_base
+        self.rate = rate
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._limiters_lock = threading.Lock()
+        
         self.session = requests.Session()
         self.session.headers.update({
             "Accept": "application/vnd.github.v3+json",
@@ -310,33 +684,106 @@ class GitHubFetcher:
         # 缓存仓库文件树
         self._tree_cache = None
         
+        # 并发下载线程数，每个工作线程使用独立的 Session
+        self.max_workers = max(1, max_workers)
+        self._local = threading.local()
+        
         # 支持 GitHub Token 以避免 API 限流
         github_token = os.environ.get("GITHUB_TOKEN")
         if github_token:
             self.session.headers["Authorization"] = f"token {github_token}"
             print("已配置 GitHub Token")
     
+    def _thread_session(self) -> "requests.Session":
+        """当前线程的 Session (主线程直接使用 self.session)"""
+        if threading.current_thread() is threading.main_thread():
+            return self.session
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.session.headers)
+            self._local.session = session
+        return session
+    
+    def _limiter(self, url: str) -> RateLimiter:
+        """url 所在主机的限速器 (API 和 raw 的额度相互独立)"""
+        host = urlsplit(url).netloc
+        with self._limiters_lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = RateLimiter(self.rate, burst=max(REQUEST_BURST, self.max_workers))
+                self._limiters[host] = limiter
+            return limiter
+    
+    def _request(self, url: str, priority: int = PRIORITY_FM, timeout: float = 30,
+                 stream: bool = False) -> "requests.Response":
+        """
+        经限速器发出 GET 请求
+        
+        限流 (429 / 额度耗尽的 403) 按 Retry-After / X-RateLimit-Reset 暂停后重试，
+        连接错误和 5xx 按带抖动的指数退避重试。重试用尽时返回最后一次响应
+        (或抛出最后一次连接异常)；需要等待超过 MAX_RATE_LIMIT_WAIT 时抛出
+        RateLimitExhausted，同一主机之后的请求也立即抛出。
+        """
+        limiter = self._limiter(url)
+        for attempt in range(MAX_RETRIES + 1):
+            limiter.acquire(priority)
+            try:
+                resp = self._thread_session().get(url, timeout=timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == MAX_RETRIES:
+                    raise
+                time.sleep(limiter.backoff(attempt))
+                continue
+            
+            wait = limiter.observe(resp.headers)
+            if _is_rate_limited(resp) and wait is not None and wait > MAX_RATE_LIMIT_WAIT:
+                resp.close()
+                raise RateLimitExhausted(f"GitHub 限流，{wait:.0f} 秒后才会重置，已放弃")
+            if attempt == MAX_RETRIES:
+                return resp
+            if _is_rate_limited(resp):
+                if wait is None:
+                    limiter.pause(limiter.backoff(attempt))
+                elif wait > BACKOFF_MAX:
+                    print(f"  GitHub 限流，{wait:.0f} 秒后自动重试...")
+            elif resp.status_code in RETRY_STATUS:
+                time.sleep(limiter.backoff(attempt))
+            else:
+                return resp
+            resp.close()
+        return resp
+    
     def _get_repo_tree(self) -> List[Dict]:
         """获取并缓存仓库文件树"""
         if self._tree_cache is not None:
             return self._tree_cache
         
-        tree_url = f"{GITHUB_TREE_API}?recursive=1"
+        tree_url = f"{self.tree_url}?recursive=1"
         
         try:
             print("  正在获取仓库文件树 (首次获取可能需要较长时间)...")
-            resp = self.session.get(tree_url, timeout=120)
+            resp = self._request(tree_url, PRIORITY_TREE, timeout=120, stream=True)
             if resp.status_code == 403:
                 print("  警告: GitHub API 限流，请稍后重试或配置 GITHUB_TOKEN 环境变量")
                 return []
             resp.raise_for_status()
             
-            data = resp.json()
-            self._tree_cache = data.get("tree", [])
-            print(f"  文件树获取完成，共 {len(self._tree_cache)} 个条目")
+            # 流式解析，只保留 flightmodels/ 下的条目
+            status = {}
+            entries = list(iter_tree_entries(
+                resp.iter_content(chunk_size=TREE_CHUNK_SIZE), f"{FM_PATH}/", status
+            ))
+            if status.get("truncated"):
+                print("  警告: GitHub 返回的文件树被截断，结果可能不完整")
+            self._tree_cache = entries
+            print(f"  文件树获取完成，共 {status.get('total', 0)} 个条目，"
+                  f"其中 flightmodels {len(self._tree_cache)} 个")
             return self._tree_cache
             
-        except requests.RequestException as e:
+        except RateLimitExhausted:
+            raise
+        except (requests.RequestException, ValueError) as e:
             print(f"  获取文件树失败: {e}")
             return []
     
@@ -412,31 +859,476 @@ class GitHubFetcher:
         print(f"  总共找到 {len(unit_names)} 个单位文件")
         return unit_names
     
+    @staticmethod
+    def fm_file_path(fm_name: str) -> str:
+        """FM 文件在仓库中的路径"""
+        return f"{FM_PATH}/fm/{fm_name}.blkx"
+    
+    @staticmethod
+    def unit_file_path(unit_name: str) -> str:
+        """单位文件在仓库中的路径"""
+        return f"{FM_PATH}/{unit_name}.blkx"
+    
+    def get_blob_shas(self) -> Dict[str, str]:
+        """flightmodels 目录下所有文件的 git blob SHA: {仓库路径: sha}"""
+        tree = self._get_repo_tree()
+        prefix = f"{FM_PATH}/"
+        return {
+            item["path"]: item["sha"]
+            for item in tree
+            if item.get("type") == "blob" and item.get("path", "").startswith(prefix) and "sha" in item
+        }
+    
     def download_fm_file(self, fm_name: str) -> Optional[str]:
-        """下载 FM 文件内容"""
-        url = f"{GITHUB_RAW_BASE}/{FM_PATH}/fm/{fm_name}.blkx"
+        """下载 FM 文件内容 (失败返回 None；请求额度耗尽时抛出 RateLimitExhausted)"""
+        url = f"{self.raw_base}/{self.fm_file_path(fm_name)}"
         try:
-            resp = self.session.get(url, timeout=30)
+            resp = self._request(url, PRIORITY_FM)
             if resp.status_code == 404:
                 return None
             resp.raise_for_status()
             return resp.text
+        except RateLimitExhausted:
+            raise
         except requests.RequestException as e:
             print(f"  下载 {fm_name} 失败: {e}")
             return None
     
     def download_unit_file(self, unit_name: str) -> Optional[str]:
-        """下载单位文件内容"""
-        url = f"{GITHUB_RAW_BASE}/{FM_PATH}/{unit_name}.blkx"
+        """下载单位文件内容 (同 download_fm_file)"""
+        url = f"{self.raw_base}/{self.unit_file_path(unit_name)}"
         try:
-            resp = self.session.get(url, timeout=30)
+            resp = self._request(url, PRIORITY_UNIT)
             if resp.status_code == 404:
                 return None
             resp.raise_for_status()
             return resp.text
+        except RateLimitExhausted:
+            raise
         except requests.RequestException as e:
             print(f"  下载 {unit_name} 失败: {e}")
             return None
+    
+    def fetch_many(self, names: List[str], download: Callable[[str], Optional[str]],
+                   desc: str = "") -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        并发下载多个文件，按输入顺序逐个产出 (name, content)
+        
+        同时在途的请求数不超过 2 * max_workers；调用方在主线程解析已产出的结果时，
+        后续文件仍在后台下载。进度条按完成顺序更新。
+        
+        Args:
+            names: 文件名列表 (决定产出顺序)
+            download: 单文件下载函数，如 self.download_fm_file
+            desc: 进度条描述
+        """
+        window = self.max_workers * 2
+        progress = tqdm(total=len(names), desc=desc)
+        pending = deque()
+        
+        def task(name):
+            content = download(name)
+            progress.update(1)
+            return content
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            try:
+                it = iter(names)
+                for name in it:
+                    pending.append((name, pool.submit(task, name)))
+                    if len(pending) >= window:
+                        break
+                while pending:
+                    name, future = pending.popleft()
+                    # 保持窗口填满
+                    for next_name in it:
+                        pending.append((next_name, pool.submit(task, next_name)))
+                        break
+                    yield name, future.result()
+            finally:
+                for _, future in pending:
+                    future.cancel()
+                progress.close()
+
+
+# ============================================================================
+# ArchiveFetcher - 从单个仓库归档读取
+# ============================================================================
+
+def git_blob_sha(data: bytes) -> str:
+    """计算 git blob SHA (与 Git Trees API 返回的 sha 一致)"""
+    h = hashlib.sha1()
+    h.update(b"blob %d\0" % len(data))
+    h.update(data)
+    return h.hexdigest()
+
+
+class ArchiveFetcher(GitHubFetcher):
+    """
+    从整个仓库的归档 (tar.gz / zip，本地文件或 URL) 读取数据
+    
+    只需一次传输: 流式读取归档，只保留 flightmodels/ 下的条目 (保存在内存中，
+    不解包到磁盘)，之后的文件列表和"下载"都直接读内存。
+    文件 SHA 按 git blob 规则计算，可与 GitHub 来源共用同步清单。
+    """
+    
+    def __init__(self, source: str, max_workers: int = DEFAULT_WORKERS):
+        super().__init__(max_workers=max_workers)
+        self.source = source
+        self._files: Optional[Dict[str, bytes]] = None
+    
+    @staticmethod
+    def _repo_path(name: str) -> Optional[str]:
+        """归档内路径 -> 仓库路径 (去掉顶层目录)，非 flightmodels 条目返回 None"""
+        name = name.replace("\\", "/").lstrip("./")
+        prefix = f"{FM_PATH}/"
+        if name.startswith(prefix):
+            return name
+        _, _, rest = name.partition("/")
+        if rest.startswith(prefix):
+            return rest
+        return None
+    
+    def _read_tar(self, fileobj):
+        # r|* 为流式模式，按顺序读取，不需要随机访问
+        with tarfile.open(fileobj=fileobj, mode="r|*") as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                path = self._repo_path(member.name)
+                if path:
+                    self._files[path] = tar.extractfile(member).read()
+    
+    def _read_zip(self, fileobj):
+        with zipfile.ZipFile(fileobj) as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                path = self._repo_path(info.filename)
+                if path:
+                    self._files[path] = zf.read(info)
+    
+    def _load_archive(self):
+        if self._files is not None:
+            return
+        self._files = {}
+        
+        print(f"  正在读取归档: {self.source}")
+        if self.source.startswith(("http://", "https://")):
+            try:
+                resp = self._request(self.source, PRIORITY_TREE, timeout=120, stream=True)
+                resp.raise_for_status()
+                resp.raw.decode_content = True
+                if self.source.lower().endswith(".zip"):
+                    # zip 需要随机访问，先落到临时文件 (小于 64MB 时在内存中)
+                    with tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024) as tmp:
+                        shutil.copyfileobj(resp.raw, tmp)
+                        tmp.seek(0)
+                        self._read_zip(tmp)
+                else:
+                    self._read_tar(resp.raw)
+            except RateLimitExhausted:
+                raise
+            except (requests.RequestException, tarfile.TarError, zipfile.BadZipFile) as e:
+                print(f"  读取归档失败: {e}")
+                return
+        else:
+            try:
+                if zipfile.is_zipfile(self.source):
+                    self._read_zip(self.source)
+                else:
+                    with open(self.source, "rb") as f:
+                        self._read_tar(f)
+            except (OSError, tarfile.TarError, zipfile.BadZipFile) as e:
+                print(f"  读取归档失败: {e}")
+                return
+        
+        print(f"  归档读取完成，共 {len(self._files)} 个 flightmodels 文件")
+    
+    def _get_repo_tree(self) -> List[Dict]:
+        if self._tree_cache is not None:
+            return self._tree_cache
+        self._load_archive()
+        self._tree_cache = [
+            {"path": path, "type": "blob", "sha": git_blob_sha(data)}
+            for path, data in self._files.items()
+        ]
+        return self._tree_cache
+    
+    def _read(self, path: str) -> Optional[str]:
+        self._load_archive()
+        data = self._files.get(path)
+        if data is None:
+            return None
+        return data.decode("utf-8")
+    
+    def download_fm_file(self, fm_name: str) -> Optional[str]:
+        return self._read(self.fm_file_path(fm_name))
+    
+    def download_unit_file(self, unit_name: str) -> Optional[str]:
+        return self._read(self.unit_file_path(unit_name))
+
+
+# ============================================================================
+# LocalFetcher - 从本地 Datamine 仓库读取
+# ============================================================================
+
+class LocalFetcher(GitHubFetcher):
+    """
+    从本地 War-Thunder-Datamine 检出 (或相同目录结构的目录) 读取数据，可离线使用
+    
+    文件 SHA 按 git blob 规则计算，并按 (mtime, size) 缓存到 fm_local_stat.json:
+    mtime 未变的文件不重新读取，配合同步清单直接跳过。
+    """
+    
+    def __init__(self, root: str, max_workers: int = DEFAULT_WORKERS,
+                 stat_cache_path: str = LOCAL_STAT_CACHE):
+        super().__init__(max_workers=max_workers)
+        self.root = os.path.abspath(root)
+        self.stat_cache_path = stat_cache_path
+    
+    def _abs_path(self, repo_path: str) -> str:
+        return os.path.join(self.root, *repo_path.split("/"))
+    
+    def _load_stat_cache(self) -> Dict[str, List]:
+        try:
+            with open(self.stat_cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            # 换了目录时缓存无效
+            if cache.get("root") == self.root:
+                return cache.get("files", {})
+        except (OSError, ValueError):
+            pass
+        return {}
+    
+    def _save_stat_cache(self, files: Dict[str, List]):
+        tmp_path = self.stat_cache_path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"root": self.root, "files": files}, f)
+            os.replace(tmp_path, self.stat_cache_path)
+        except OSError as e:
+            print(f"  警告: 保存文件状态缓存失败 - {e}")
+    
+    def _scan(self) -> Dict[str, os.stat_result]:
+        """列出 flightmodels/ 和 flightmodels/fm/ 下的 .blkx 文件: {仓库路径: stat}"""
+        entries = {}
+        for rel_dir in (FM_PATH, f"{FM_PATH}/fm"):
+            abs_dir = self._abs_path(rel_dir)
+            if not os.path.isdir(abs_dir):
+                continue
+            with os.scandir(abs_dir) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(".blkx"):
+                        entries[f"{rel_dir}/{entry.name}"] = entry.stat()
+        return entries
+    
+    def _hash_file(self, repo_path: str) -> Optional[str]:
+        try:
+            with open(self._abs_path(repo_path), 'rb') as f:
+                return git_blob_sha(f.read())
+        except OSError as e:
+            print(f"  读取 {repo_path} 失败: {e}")
+            return None
+    
+    def _get_repo_tree(self) -> List[Dict]:
+        if self._tree_cache is not None:
+            return self._tree_cache
+        
+        if not os.path.isdir(self._abs_path(FM_PATH)):
+            print(f"  错误: {self.root} 下没有 {FM_PATH} 目录")
+            return []
+        
+        print(f"  正在扫描本地目录: {self.root}")
+        entries = self._scan()
+        old_cache = self._load_stat_cache()
+        new_cache = {}
+        stale = []
+        for path, st in entries.items():
+            cached = old_cache.get(path)
+            if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                new_cache[path] = cached
+            else:
+                stale.append(path)
+        
+        # mtime 变化的文件并行读取并计算 SHA
+        if stale:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                for path, sha in zip(stale, pool.map(self._hash_file, stale)):
+                    if sha:
+                        st = entries[path]
+                        new_cache[path] = [st.st_mtime_ns, st.st_size, sha]
+        self._save_stat_cache(new_cache)
+        
+        print(f"  扫描完成，共 {len(entries)} 个文件，{len(stale)} 个 mtime 有变化")
+        self._tree_cache = [
+            {"path": path, "type": "blob", "sha": cached[2]}
+            for path, cached in new_cache.items()
+        ]
+        return self._tree_cache
+    
+    def _read(self, repo_path: str) -> Optional[str]:
+        try:
+            with open(self._abs_path(repo_path), 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            print(f"  读取 {repo_path} 失败: {e}")
+            return None
+    
+    def download_fm_file(self, fm_name: str) -> Optional[str]:
+        return self._read(self.fm_file_path(fm_name))
+    
+    def download_unit_file(self, unit_name: str) -> Optional[str]:
+        return self._read(self.unit_file_path(unit_name))
+
+
+# ============================================================================
+# SyncManifest - 上次同步的文件 SHA 清单
+# ============================================================================
+
+class SyncManifest:
+    """
+    记录上次成功同步时每个远程文件的 git blob SHA
+    
+    SHA 未变化的文件内容必然相同，检查更新时可直接跳过下载和解析。
+    """
+    
+    def __init__(self, path: str = FM_MANIFEST_FILE):
+        self.path = path
+        self.shas: Dict[str, str] = {}
+        self.load()
+    
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.shas = json.load(f).get("shas", {})
+        except (OSError, ValueError) as e:
+            print(f"警告: 读取同步清单失败，将执行完整检查 - {e}")
+            self.shas = {}
+    
+    def save(self):
+        """原子写入 (临时文件 + 重命名)"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"updated": datetime.now().isoformat(timespec="seconds"),
+                       "shas": self.shas}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+    
+    def is_unchanged(self, path: str, sha: Optional[str]) -> bool:
+        return sha is not None and self.shas.get(path) == sha
+    
+    def update(self, path: str, sha: Optional[str]):
+        if sha:
+            self.shas[path] = sha
+
+
+# ============================================================================
+# CheckpointJournal - 断点续传日志
+# ============================================================================
+
+class CheckpointJournal:
+    """
+    追加写入的解析结果日志: 每行 {"path", "sha", "record"}
+    
+    每个文件下载解析完成后立即写入并 flush，运行被中断 (网络错误、Ctrl-C、限流)
+    后重新运行时，SHA 相同的文件直接使用日志中的结果。全部操作成功完成后清除。
+    
+    sha 优先取文件树中的 blob SHA；文件树获取失败 (例如被限流) 时改用下载内容
+    计算的 git blob SHA，恢复时仍可与文件树比对。恢复时文件树也不可用则无法校验，
+    直接使用日志中的结果 (日志只保存被中断的那次运行的结果)。
+    """
+    
+    def __init__(self, path: str = FM_JOURNAL_FILE):
+        self.path = path
+        self.entries: Dict[str, Tuple[str, Dict]] = {}  # path -> (sha, record)
+        self._file = None
+        self.load()
+    
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # 中断时可能留下不完整的最后一行
+                self.entries[entry["path"]] = (entry["sha"], entry["record"])
+        if self.entries:
+            print(f"从断点日志恢复 {len(self.entries)} 条已解析记录")
+    
+    def get(self, path: str, sha: Optional[str]) -> Optional[Dict]:
+        """SHA 一致 (或远端 SHA 未知) 时返回日志中的记录"""
+        entry = self.entries.get(path)
+        if entry is None or (sha is not None and entry[0] != sha):
+            return None
+        return entry[1]
+    
+    def append(self, path: str, sha: str, record: Dict):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps({"path": path, "sha": sha, "record": record},
+                                    ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.entries[path] = (sha, record)
+    
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def clear(self):
+        """全部操作完成后删除日志"""
+        self.close()
+        self.entries.clear()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def fetch_and_parse(fetcher: "GitHubFetcher", names: List[str], path_of: Callable[[str], str],
+                    download: Callable[[str], Optional[str]], job: Callable,
+                    remote_shas: Dict[str, str], journal: Optional[CheckpointJournal],
+                    pool: Optional[ProcessPoolExecutor], desc: str = "") -> Iterator[Tuple[str, Optional[Dict]]]:
+    """
+    下载并解析 names，按输入顺序产出 (name, 解析结果)
+    
+    断点日志中 SHA 一致的文件直接复用，其余文件经 fetch_many + parse_many 处理后写入日志。
+    """
+    cached = {}
+    if journal is not None:
+        for name in names:
+            path = path_of(name)
+            record = journal.get(path, remote_shas.get(path))
+            if record is not None:
+                cached[name] = record
+        if cached:
+            print(f"  断点日志命中 {len(cached)} 个文件，跳过下载")
+    
+    to_fetch = [name for name in names if name not in cached]
+    content_shas = {}
+    
+    def hashed(fetched):
+        # 文件树缺少的文件按下载内容计算 SHA，供断点日志使用
+        for name, content in fetched:
+            if journal is not None and content is not None and path_of(name) not in remote_shas:
+                content_shas[name] = git_blob_sha(content.encode("utf-8"))
+            yield name, content
+    
+    parsed = parse_many(hashed(fetcher.fetch_many(to_fetch, download, desc=desc)), job, pool)
+    
+    for name in names:
+        if name in cached:
+            yield name, cached[name]
+            continue
+        fetched_name, result = next(parsed)
+        if result is not None and journal is not None:
+            path = path_of(fetched_name)
+            journal.append(path, remote_shas.get(path) or content_shas.pop(fetched_name), result)
+        yield fetched_name, result
 
 
 # ============================================================================
@@ -449,23 +1341,17 @@ class FMDatabase:
     def __init__(self):
         self.data_records: Dict[str, Dict] = {}  # fm_name -> record
         self.names_records: Dict[str, Dict] = {}  # unit_name -> record
+        self.store = FMStore()  # fm_data_db.csv 的列式视图 (用于查询)
+        self._store_dirty = False
         self.load()
     
     def load(self):
         """加载本地 CSV 文件"""
         # 加载 fm_data_db.csv
         if os.path.exists(FM_DATA_CSV):
-            with open(FM_DATA_CSV, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                if lines:
-                    # 跳过 header
-                    for line in lines[1:]:
-                        parts = line.strip().split(';')
-                        if len(parts) >= 1 and parts[0]:
-                            record = {}
-                            for i, col in enumerate(FM_DATA_COLUMNS):
-                                record[col] = parts[i] if i < len(parts) else ""
-                            self.data_records[parts[0]] = record
+            self.store = FMStore.load(FM_DATA_CSV)
+            for aid, name in enumerate(self.store.names):
+                self.data_records[name] = self.store.record(aid)
         
         # 加载 fm_names_db.csv
         if os.path.exists(FM_NAMES_CSV):
@@ -482,43 +1368,32 @@ class FMDatabase:
         
         print(f"已加载 {len(self.data_records)} 条 FM 数据, {len(self.names_records)} 条名称映射")
     
-    def backup(self):
-        """备份当前数据文件"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_dir = os.path.join(SCRIPT_DIR, "backups")
-        os.makedirs(backup_dir, exist_ok=True)
-        
-        if os.path.exists(FM_DATA_CSV):
-            backup_path = os.path.join(backup_dir, f"fm_data_db_{timestamp}.csv")
-            shutil.copy(FM_DATA_CSV, backup_path)
-            print(f"已备份: {backup_path}")
+    def backup(self, note: str = ""):
+        """将磁盘上的当前数据记录到版本历史 (只保存相对上一版本变化的记录)"""
+        history = FMHistory(FM_HISTORY_DB)
+        try:
+            version_id = history.commit(
+                {
+                    "data": read_csv_records(FM_DATA_CSV, FM_DATA_COLUMNS),
+                    "names": read_csv_records(FM_NAMES_CSV, FM_NAMES_COLUMNS),
+                },
+                game_version=read_game_version(),
+                note=note
+            )
+        finally:
+            history.close()
         
-        if os.path.exists(FM_NAMES_CSV):
-            backup_path = os.path.join(backup_dir, f"fm_names_db_{timestamp}.csv")
-            shutil.copy(FM_NAMES_CSV, backup_path)
+        if version_id is not None:
+            print(f"已记录版本历史: #{version_id}")
     
     def save_data(self):
         """保存 fm_data_db.csv"""
-        with open(FM_DATA_CSV, 'w', encoding='utf-8', newline='') as f:
-            # Header
-            f.write(';'.join(FM_DATA_COLUMNS) + '\n')
-            # Data (按名称排序)
-            for name in sorted(self.data_records.keys()):
-                record = self.data_records[name]
-                values = [str(record.get(col, "")) for col in FM_DATA_COLUMNS]
-                f.write(';'.join(values) + '\n')
+        write_csv_records(FM_DATA_CSV, FM_DATA_COLUMNS, self.data_records)
         print(f"已保存 {len(self.data_records)} 条 FM 数据")
     
     def save_names(self):
         """保存 fm_names_db.csv"""
-        with open(FM_NAMES_CSV, 'w', encoding='utf-8', newline='') as f:
-            # Header
-            f.write(';'.join(FM_NAMES_COLUMNS) + '\n')
-            # Data (按名称排序)
-            for name in sorted(self.names_records.keys()):
-                record = self.names_records[name]
-                values = [str(record.get(col, "")) for col in FM_NAMES_COLUMNS]
-                f.write(';'.join(values) + '\n')
+        write_csv_records(FM_NAMES_CSV, FM_NAMES_COLUMNS, self.names_records)
         print(f"已保存 {len(self.names_records)} 条名称映射")
     
     def get_existing_fm_names(self) -> Set[str]:
@@ -534,6 +1409,7 @@ class FMDatabase:
         name = record.get("Name", "")
         if name:
             self.data_records[name] = record
+            self._store_dirty = True
     
     def add_names_record(self, unit_name: str, fm_name: str, unit_type: str, english: str):
         """添加或更新名称映射记录"""
@@ -587,14 +1463,163 @@ class FMDatabase:
             if not self._values_equal(old_val, new_val):
                 diffs.append((col, old_val, new_val))
         return diffs
+    
+    def query(self, *conditions) -> List[str]:
+        """
+        按数值条件查询飞机名称 (条件取交集)
+        
+        例: db.query("CritAirSpdMach<0.9", "NumEngines>=2")
+        """
+        # 记录有增改时重建列式视图，保证查询结果与内存数据一致
+        if self._store_dirty:
+            self.store = FMStore.from_records(self.data_records)
+            self._store_dirty = False
+        return sorted(self.store.names_of(self.store.where(*conditions)))
+
+
+# ============================================================================
+# 批处理模式: 接受规则和变更报告
+# ============================================================================
+
+# 批处理模式的退出码 (多种情况同时出现时取靠后的)
+EXIT_NO_CHANGES = 0   # 没有任何变化
+EXIT_UPDATED = 2      # 已应用变化
+EXIT_PENDING = 3      # 有变化被规则拒绝，等待人工处理
+EXIT_ERROR = 1        # 无法获取远程数据等错误
+
+
+class AcceptPolicy:
+    """
+    批处理模式下自动接受变化的规则 (多个规则取并集)
+    
+        all            接受全部新增和修改
+        new            只接受新增的飞机和名称映射
+        fields:A,B     只接受差异全部落在 A, B 字段内的修改
+        none           不接受任何变化 (只生成报告)
+    """
+    
+    def __init__(self, rules: List[str]):
+        self.accept_all = False
+        self.accept_new = False
+        self.fields: Set[str] = set()
+        for rule in rules:
+            rule = rule.strip()
+            if rule == "all":
+                self.accept_all = True
+            elif rule == "new":
+                self.accept_new = True
+            elif rule.startswith("fields:"):
+                fields = {f.strip() for f in rule[len("fields:"):].split(",") if f.strip()}
+                unknown = fields - set(FM_DATA_COLUMNS)
+                if unknown:
+                    raise ValueError(f"未知的字段: {', '.join(sorted(unknown))}")
+                self.fields |= fields
+            elif rule != "none":
+                raise ValueError(f"未知的接受规则: {rule}")
+    
+    def accepts_new(self) -> bool:
+        return self.accept_all or self.accept_new
+    
+    def accepts_change(self, diffs: List[Tuple[str, Any, Any]]) -> bool:
+        if self.accept_all:
+            return True
+        return bool(self.fields) and all(col in self.fields for col, _, _ in diffs)
+
+
+class ChangeReport:
+    """
+    批处理运行的变更报告
+    
+    每条记录: action (added / updated / pending / failed), table (data / names), name,
+    fields [(字段, 旧值, 新值), ...] (来自 FMDatabase.compare_records，新增记录为空)
+    failed 为下载或解析失败的文件，与 errors 一样使运行结果为 EXIT_ERROR
+    """
+    
+    CSV_COLUMNS = ["action", "table", "name", "field", "old", "new"]
+    
+    def __init__(self):
+        self.entries: List[Dict] = []
+        self.errors: List[str] = []
+    
+    def add(self, action: str, table: str, name: str, diffs: Optional[List[Tuple[str, Any, Any]]] = None):
+        self.entries.append({
+            "action": action,
+            "table": table,
+            "name": name,
+            "fields": [{"field": col, "old": str(old), "new": str(new)} for col, old, new in diffs or []],
+        })
+    
+    def error(self, message: str):
+        print(f"错误: {message}")
+        self.errors.append(message)
+    
+    def count(self, action: str) -> int:
+        return sum(1 for e in self.entries if e["action"] == action)
+    
+    def exit_code(self) -> int:
+        if self.errors or self.count("failed"):
+            return EXIT_ERROR
+        if self.count("pending"):
+            return EXIT_PENDING
+        if self.count("added") or self.count("updated"):
+            return EXIT_UPDATED
+        return EXIT_NO_CHANGES
+    
+    def summary(self) -> Dict[str, int]:
+        return {
+            "added": self.count("added"),
+            "updated": self.count("updated"),
+            "pending": self.count("pending"),
+            "failed": self.count("failed"),
+            "errors": len(self.errors),
+        }
+    
+    def write(self, path: str):
+        """按扩展名写出 JSON 或 CSV (分号分隔，每个字段差异一行)"""
+        if path.lower().endswith(".csv"):
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f, delimiter=";")
+                writer.writerow(self.CSV_COLUMNS)
+                for e in self.entries:
+                    for d in e["fields"] or [{"field": "", "old": "", "new": ""}]:
+                        writer.writerow([e["action"], e["table"], e["name"], d["field"], d["old"], d["new"]])
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "created_at": datetime.now().isoformat(timespec="seconds"),
+                    "game_version": read_game_version(),
+                    "exit_code": self.exit_code(),
+                    "summary": self.summary(),
+                    "errors": self.errors,
+                    "changes": self.entries,
+                }, f, ensure_ascii=False, indent=2)
+        print(f"变更报告已保存: {path}")
+
+
+def _confirm(prompt: str, policy: Optional[AcceptPolicy]) -> bool:
+    """交互模式询问用户；批处理模式直接继续 (由接受规则逐条决定)"""
+    if policy is not None:
+        return True
+    return input(prompt).strip().lower() == 'y'
 
 
 # ============================================================================
 # 功能1: 添加缺失的飞机
 # ============================================================================
 
-def add_missing_aircraft(db: FMDatabase, fetcher: GitHubFetcher):
-    """功能1: 添加缺失的飞机（同时更新 FM 数据和名称映射）"""
+def add_missing_aircraft(db: FMDatabase, fetcher: GitHubFetcher, manifest: SyncManifest,
+                         pool: Optional[ProcessPoolExecutor] = None,
+                         journal: Optional[CheckpointJournal] = None,
+                         policy: Optional[AcceptPolicy] = None,
+                         report: Optional[ChangeReport] = None):
+    """
+    功能1: 添加缺失的飞机（同时更新 FM 数据和名称映射）
+    
+    pool: 可选的解析进程池，为 None 时在主进程内解析
+    journal: 可选的断点日志
+    policy / report: 批处理模式的接受规则和变更报告，为 None 时交互确认
+    """
+    report = report if report is not None else ChangeReport()
     print("\n" + "="*60)
     print("功能1: 检索并添加缺失的飞机")
     print("="*60)
@@ -602,7 +1627,7 @@ def add_missing_aircraft(db: FMDatabase, fetcher: GitHubFetcher):
     # 获取远程 FM 列表
     remote_fm_names = set(fetcher.get_fm_file_list())
     if not remote_fm_names:
-        print("错误: 无法获取远程 FM 列表")
+        report.error("无法获取远程 FM 列表")
         return
     
     # 获取远程单位列表（用于名称映射）
@@ -638,41 +1663,48 @@ def add_missing_aircraft(db: FMDatabase, fetcher: GitHubFetcher):
         if len(missing_units) > 10:
             print(f"  ... 还有 {len(missing_units) - 10} 个")
     
-    confirm = input(f"\n是否添加缺失的数据? (y/N): ").strip().lower()
-    if confirm != 'y':
+    if not _confirm(f"\n是否添加缺失的数据? (y/N): ", policy):
         print("已取消")
         return
     
+    if policy is not None and not policy.accepts_new():
+        print("接受规则不包含新增记录，只记录到报告")
+        for name in sorted(missing_fm):
+            report.add("pending", "data", name)
+        for name in sorted(missing_units):
+            report.add("pending", "names", name)
+        return
+    
     # 备份
-    db.backup()
+    db.backup(note="before update")
+    remote_shas = fetcher.get_blob_shas()
     
     # 下载并解析缺失的 FM
     fm_added = 0
     if missing_fm:
         print(f"\n正在添加 {len(missing_fm)} 个 FM...")
-        for fm_name in tqdm(sorted(missing_fm), desc="添加FM数据"):
-            content = fetcher.download_fm_file(fm_name)
-            if not content:
-                continue
-            
-            record = BlkxParser.extract_fm_data(content, fm_name)
+        for fm_name, record in fetch_and_parse(
+                fetcher, sorted(missing_fm), fetcher.fm_file_path, fetcher.download_fm_file,
+                _parse_fm_job, remote_shas, journal, pool, desc="添加FM数据"):
             if not record:
+                report.add("failed", "data", fm_name)
                 continue
             
             db.add_data_record(record)
+            path = fetcher.fm_file_path(fm_name)
+            manifest.update(path, remote_shas.get(path))
+            report.add("added", "data", fm_name)
             fm_added += 1
     
     # 下载并解析缺失的单位名称映射
     units_added = 0
     if missing_units:
         print(f"\n正在添加 {len(missing_units)} 个单位映射...")
-        for unit_name in tqdm(sorted(missing_units), desc="添加名称映射"):
-            content = fetcher.download_unit_file(unit_name)
-            if not content:
-                continue
-            
-            info = BlkxParser.extract_unit_info(content)
+        for unit_name, info in fetch_and_parse(
+                fetcher, sorted(missing_units), fetcher.unit_file_path, fetcher.download_unit_file,
+                _parse_unit_job, remote_shas, journal, pool, desc="添加名称映射"):
             if not info:
+                report.add("failed", "names", unit_name)
                 continue
             
             # 跳过直升机
@@ -685,6 +1717,9 @@ def add_missing_aircraft(db: FMDatabase, fetcher: GitHubFetcher):
                 info.get("type", "fighter"),
                 info.get("english", unit_name)
             )
+            path = fetcher.unit_file_path(unit_name)
+            manifest.update(path, remote_shas.get(path))
+            report.add("added", "names", unit_name)
             units_added += 1
     
     # 保存
@@ -692,56 +1727,100 @@ def add_missing_aircraft(db: FMDatabase, fetcher: GitHubFetcher):
         db.save_data()
     if units_added > 0:
         db.save_names()
+    if fm_added > 0 or units_added > 0:
+        db.backup(note="add-missing")
+        manifest.save()
     
     print(f"\n完成! 添加了 {fm_added} 个 FM, {units_added} 个单位映射")
+    if report.count("failed"):
+        print(f"有 {report.count('failed')} 个文件下载或解析失败，重新运行时会再次尝试")
 
 
 # ============================================================================
 # 功能2: 检查并更新已有飞机
 # ============================================================================
 
-def check_and_update_aircraft(db: FMDatabase, fetcher: GitHubFetcher):
-    """功能2: 检查并更新已有飞机"""
+def check_and_update_aircraft(db: FMDatabase, fetcher: GitHubFetcher, manifest: SyncManifest,
+                              full: bool = False, pool: Optional[ProcessPoolExecutor] = None,
+                              journal: Optional[CheckpointJournal] = None,
+                              policy: Optional[AcceptPolicy] = None,
+                              report: Optional[ChangeReport] = None):
+    """
+    功能2: 检查并更新已有飞机
+    
+    默认只检查 blob SHA 与上次同步清单不同的文件; full=True 时全部重新下载比较
+    pool: 可选的解析进程池，为 None 时在主进程内解析
+    journal: 可选的断点日志
+    policy / report: 批处理模式的接受规则和变更报告，为 None 时逐个交互确认
+    """
+    report = report if report is not None else ChangeReport()
     print("\n" + "="*60)
     print("功能2: 检查并更新已有飞机")
     print("="*60)
     
     local_fm_names = sorted(db.get_existing_fm_names())
-    print(f"本地共有 {len(local_fm_names)} 个 FM 需要检查")
-    
     if not local_fm_names:
         print("本地没有 FM 数据")
         return
     
-    confirm = input(f"开始检查? 这可能需要一些时间 (y/N): ").strip().lower()
-    if confirm != 'y':
+    remote_shas = fetcher.get_blob_shas()
+    if not remote_shas:
+        if policy is not None:
+            report.error("无法获取远程文件列表")
+            return
+        if not full:
+            print("警告: 无法获取远程文件 SHA，将执行完整检查")
+            full = True
+    
+    if not full:
+        unchanged = [n for n in local_fm_names
+                     if manifest.is_unchanged(fetcher.fm_file_path(n), remote_shas.get(fetcher.fm_file_path(n)))]
+        removed = [n for n in local_fm_names if fetcher.fm_file_path(n) not in remote_shas]
+        skip = set(unchanged) | set(removed)
+        local_fm_names = [n for n in local_fm_names if n not in skip]
+        print(f"SHA 未变化 {len(unchanged)} 个, 远程不存在 {len(removed)} 个, 已跳过")
+    
+    print(f"本地共有 {len(local_fm_names)} 个 FM 需要检查")
+    if not local_fm_names:
+        manifest.save()
+        print("没有发现任何更改")
+        return
+    
+    if not _confirm(f"开始检查? 这可能需要一些时间 (y/N): ", policy):
         print("已取消")
         return
     
     # 备份
-    db.backup()
+    db.backup(note="before update")
     
     changes = []  # [(fm_name, diffs, new_record), ...]
+    failed = 0
     
     print("\n正在检查更新...")
-    for fm_name in tqdm(local_fm_names, desc="检查FM数据"):
-        content = fetcher.download_fm_file(fm_name)
-        if not content:
-            continue
-        
-        new_record = BlkxParser.extract_fm_data(content, fm_name)
+    for fm_name, new_record in fetch_and_parse(
+            fetcher, local_fm_names, fetcher.fm_file_path, fetcher.download_fm_file,
+            _parse_fm_job, remote_shas, journal, pool, desc="检查FM数据"):
         if not new_record:
+            report.add("failed", "data", fm_name)
+            failed += 1
             continue
         
         old_record = db.data_records.get(fm_name, {})
         diffs = db.compare_records(old_record, new_record)
+        path = fetcher.fm_file_path(fm_name)
         
         if diffs:
             changes.append((fm_name, diffs, new_record))
+        else:
+            # 内容一致，记录 SHA 以便下次跳过
+            manifest.update(path, remote_shas.get(path))
     
     print()
+    if failed:
+        print(f"有 {failed} 个 FM 下载或解析失败，重新运行时会再次检查")
     
     if not changes:
+        manifest.save()
         print("没有发现任何更改")
         return
     
@@ -760,8 +1839,22 @@ def check_and_update_aircraft(db: FMDatabase, fetcher: GitHubFetcher):
             new_display = new_str[:30] + "..." if len(new_str) > 30 else new_str
             print(f"  {col}: {old_display} -> {new_display}")
         
+        path = fetcher.fm_file_path(fm_name)
+        if policy is not None:
+            if policy.accepts_change(diffs):
+                db.add_data_record(new_record)
+                manifest.update(path, remote_shas.get(path))
+                report.add("updated", "data", fm_name, diffs)
+                updated_count += 1
+            else:
+                print("  接受规则不允许，跳过")
+                report.add("pending", "data", fm_name, diffs)
+            continue
+        
         if update_all:
             db.add_data_record(new_record)
+            manifest.update(path, remote_shas.get(path))
+            report.add("updated", "data", fm_name, diffs)
             updated_count += 1
             continue
         
@@ -770,19 +1863,131 @@ def check_and_update_aircraft(db: FMDatabase, fetcher: GitHubFetcher):
         if choice == 'q':
             print("已退出")
             break
-        elif choice == 'a':
-            update_all = True
-            db.add_data_record(new_record)
-            updated_count += 1
-        elif choice == 'y':
+        elif choice in ('a', 'y'):
+            update_all = choice == 'a'
             db.add_data_record(new_record)
+            manifest.update(path, remote_shas.get(path))
+            report.add("updated", "data", fm_name, diffs)
             updated_count += 1
+        else:
+            report.add("pending", "data", fm_name, diffs)
     
+    # 被拒绝的更改不记录新 SHA，下次仍会提示
     if updated_count > 0:
         db.save_data()
+        db.backup(note="check-updates")
         print(f"\n完成! 更新了 {updated_count} 个 FM")
     else:
         print("\n没有进行任何更新")
+    manifest.save()
+
+
+def run_updates(db: FMDatabase, fetcher: GitHubFetcher, manifest: SyncManifest,
+                journal: CheckpointJournal, add_missing: bool = False, check_updates: bool = False,
+                full: bool = False, pool: Optional[ProcessPoolExecutor] = None,
+                policy: Optional[AcceptPolicy] = None, report: Optional[ChangeReport] = None) -> ChangeReport:
+    """
+    依次执行功能1 / 功能2
+    
+    请求额度耗尽 (RateLimitExhausted) 时中止整个运行并记入报告的 errors；
+    已解析的记录保留在断点日志中，额度重置后重新运行即可继续
+    """
+    report = report if report is not None else ChangeReport()
+    try:
+        if add_missing:
+            add_missing_aircraft(db, fetcher, manifest, pool=pool, journal=journal,
+                                 policy=policy, report=report)
+        if check_updates:
+            check_and_update_aircraft(db, fetcher, manifest, full=full, pool=pool, journal=journal,
+                                      policy=policy, report=report)
+    except RateLimitExhausted as e:
+        journal.close()
+        report.error(f"运行已中止: {e}")
+        print("已解析的记录保存在断点日志中，额度重置后重新运行即可继续")
+    return report
+
+
+# ============================================================================
+# 版本历史
+# ============================================================================
+
+def import_legacy_backups():
+    """将 backups/ 下旧的完整 CSV 备份按时间顺序导入版本历史"""
+    if not os.path.isdir(BACKUP_DIR):
+        print("没有找到 backups 目录")
+        return
+    
+    # fm_data_db.csv (无时间戳) 视为最早的备份
+    snapshots = {"": None}
+    for filename in os.listdir(BACKUP_DIR):
+        m = re.match(r"^fm_data_db(?:_(\d{8}_\d{6}))?\.csv$", filename)
+        if m:
+            snapshots[m.group(1) or ""] = None
+    
+    history = FMHistory(FM_HISTORY_DB)
+    try:
+        for stamp in sorted(snapshots):
+            suffix = f"_{stamp}" if stamp else ""
+            data_path = os.path.join(BACKUP_DIR, f"fm_data_db{suffix}.csv")
+            names_path = os.path.join(BACKUP_DIR, f"fm_names_db{suffix}.csv")
+            if not os.path.exists(data_path):
+                continue
+            
+            tables = {"data": read_csv_records(data_path, FM_DATA_COLUMNS)}
+            if os.path.exists(names_path):
+                tables["names"] = read_csv_records(names_path, FM_NAMES_COLUMNS)
+            if stamp:
+                created_at = datetime.strptime(stamp, "%Y%m%d_%H%M%S").isoformat()
+            else:
+                created_at = datetime.fromtimestamp(os.path.getmtime(data_path)).isoformat(timespec="seconds")
+            version_id = history.commit(tables, note=f"import backups/fm_data_db{suffix}.csv",
+                                        created_at=created_at)
+            status = f"版本 #{version_id}" if version_id else "无变化"
+            print(f"  导入 fm_data_db{suffix}.csv: {status}")
+    finally:
+        history.close()
+    print("导入完成，确认无误后可删除 backups/ 目录下的 CSV 文件")
+
+
+def show_versions():
+    history = FMHistory(FM_HISTORY_DB)
+    try:
+        for vid, created_at, game_version, note, count in history.versions():
+            print(f"#{vid}  {created_at}  {game_version or '-'}  {count} 条变化  {note or ''}")
+    finally:
+        history.close()
+
+
+def show_field_history(name: str, field: str):
+    table = "names" if field in FM_NAMES_COLUMNS and field not in FM_DATA_COLUMNS else "data"
+    history = FMHistory(FM_HISTORY_DB)
+    try:
+        rows = history.field_history(name, field, table)
+    finally:
+        history.close()
+    
+    if not rows:
+        print(f"版本历史中没有 {name} 的记录")
+        return
+    print(f"【{name}】{field} 变化历史:")
+    for vid, created_at, game_version, value in rows:
+        shown = "(已删除)" if value is None else value
+        print(f"  #{vid}  {created_at}  {game_version or '-'}  {shown}")
+
+
+def export_snapshot(version_id: int, out_dir: str):
+    """将指定版本重建为 CSV 文件"""
+    history = FMHistory(FM_HISTORY_DB)
+    try:
+        data = history.snapshot("data", version_id)
+        names = history.snapshot("names", version_id)
+    finally:
+        history.close()
+    
+    os.makedirs(out_dir, exist_ok=True)
+    write_csv_records(os.path.join(out_dir, "fm_data_db.csv"), FM_DATA_COLUMNS, data)
+    write_csv_records(os.path.join(out_dir, "fm_names_db.csv"), FM_NAMES_COLUMNS, names)
+    print(f"已导出版本 #{version_id}: {len(data)} 条 FM 数据, {len(names)} 条名称映射 -> {out_dir}")
 
 
 # ============================================================================
@@ -798,6 +2003,8 @@ def main():
   python update_fm.py --add-missing     # 添加缺失的飞机
   python update_fm.py --check-updates   # 检查并更新已有飞机
   python update_fm.py --all             # 执行全部操作
+  python update_fm.py --query "CritAirSpdMach<0.9"   # 按字段条件查询飞机
+  python update_fm.py --history f_14a_early --field CritAirSpd   # 查看 VNE 变化历史
         """
     )
     
@@ -807,28 +2014,120 @@ def main():
                         help="检查并更新已有飞机的FM数据")
     parser.add_argument("--all", action="store_true",
                         help="执行全部操作")
+    parser.add_argument("--query", action="append", metavar="COND",
+                        help="按字段条件查询本地数据, 如 \"CritAirSpdMach<0.9\" (可重复, 取交集)")
+    
+    parser.add_argument("--archive", nargs="?", const=GITHUB_ARCHIVE_URL, metavar="PATH_OR_URL",
+                        help="从整个仓库的归档 (tar.gz/zip) 读取数据，而不是逐个下载文件; "
+                             "不带参数时下载 GitHub master 分支归档")
+    parser.add_argument("--source", metavar="DIR",
+                        help="从本地 War-Thunder-Datamine 检出目录读取数据 (离线模式)")
+    parser.add_argument("--full", action="store_true",
+                        help="忽略同步清单，重新下载比较全部 FM 文件")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"并发下载数 (默认 {DEFAULT_WORKERS})")
+    parser.add_argument("--rate", type=float, default=DEFAULT_REQUEST_RATE,
+                        help=f"每个主机每秒最多请求数，0 为不限速 (默认 {DEFAULT_REQUEST_RATE:g})")
+    parser.add_argument("--accept", action="append", metavar="RULE",
+                        help="无人值守批处理: 自动接受的变化 (all / new / fields:A,B / none, 可重复)，"
+                             "不再询问确认")
+    parser.add_argument("--report", metavar="PATH",
+                        help="将变更报告写入 PATH (.json 或 .csv)")
+    parser.add_argument("--parse-procs", type=int, default=os.cpu_count() or 1,
+                        help="解析 blkx 的进程数 (默认 CPU 核数, 0 = 在主进程内解析)")
+    parser.add_argument("--versions", action="store_true",
+                        help="列出版本历史")
+    parser.add_argument("--history", metavar="NAME",
+                        help="查看某架飞机的字段变化历史 (配合 --field)")
+    parser.add_argument("--field", default="CritAirSpd",
+                        help="--history 查看的字段 (默认 CritAirSpd)")
+    parser.add_argument("--export-snapshot", nargs=2, metavar=("VERSION", "DIR"),
+                        help="将指定版本重建为 CSV 导出到目录")
+    parser.add_argument("--import-backups", action="store_true",
+                        help="将 backups/ 下旧的完整 CSV 备份导入版本历史")
     
     args = parser.parse_args()
     
+    if args.import_backups:
+        import_legacy_backups()
+        return
+    if args.versions:
+        show_versions()
+        return
+    if args.history:
+        show_field_history(args.history, args.field)
+        return
+    if args.export_snapshot:
+        export_snapshot(int(args.export_snapshot[0]), args.export_snapshot[1])
+        return
+    
+    if args.query:
+        db = FMDatabase()
+        try:
+            names = db.query(*args.query)
+        except (ValueError, KeyError) as e:
+            print(f"查询失败: {e}")
+            sys.exit(1)
+        for name in names:
+            print(name)
+        print(f"共 {len(names)} 架飞机")
+        return
+    
     # 如果没有任何参数，显示帮助
     if not any([args.add_missing, args.check_updates, args.all]):
         parser.print_help()
         return
     
+    policy = None
+    if args.accept:
+        try:
+            policy = AcceptPolicy(args.accept)
+        except ValueError as e:
+            print(f"错误: {e}")
+            sys.exit(EXIT_ERROR)
+    report = ChangeReport()
+    
     print("="*60)
     print("FM 数据库更新工具")
     print("="*60)
     
     db = FMDatabase()
-    fetcher = GitHubFetcher()
-    
-    if args.all or args.add_missing:
-        add_missing_aircraft(db, fetcher)
+    if args.source:
+        fetcher = LocalFetcher(args.source, max_workers=args.workers)
+    elif args.archive:
+        fetcher = ArchiveFetcher(args.archive, max_workers=args.workers)
+    else:
+        fetcher = GitHubFetcher(max_workers=args.workers, rate=args.rate)
+    manifest = SyncManifest()
+    journal = CheckpointJournal()
+    pool = ProcessPoolExecutor(max_workers=args.parse_procs) if args.parse_procs > 0 else None
     
-    if args.all or args.check_updates:
-        check_and_update_aircraft(db, fetcher)
+    try:
+        run_updates(db, fetcher, manifest, journal,
+                    add_missing=args.all or args.add_missing,
+                    check_updates=args.all or args.check_updates,
+                    full=args.full, pool=pool, policy=policy, report=report)
+    except KeyboardInterrupt:
+        journal.close()
+        print("\n已中断，已解析的记录保存在断点日志中，重新运行即可继续")
+        sys.exit(130)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
     
+    # 有失败时保留断点日志，重新运行只需处理失败的文件
+    if report.exit_code() != EXIT_ERROR:
+        journal.clear()
+    if args.report:
+        report.write(args.report)
     print("\n全部操作完成!")
+    if policy is not None:
+        summary = report.summary()
+        print(f"新增 {summary['added']}, 更新 {summary['updated']}, "
+              f"待处理 {summary['pending']}, 失败 {summary['failed']}, 错误 {summary['errors']}")
+        sys.exit(report.exit_code())
+    if report.errors:
+        sys.exit(EXIT_ERROR)
 
 
 if __name__ == "__main__":
@@ -14,11 +14,21 @@ DEFAULT_CONFIG = {
     "text_prefix": "IAS: ",      # 前缀文本
     "update_rate": 30,           # 默认 30 Hz
     "warn_percent": 97,          # 警告阈值 (70-95)
+    "crit_speed_pct": 99.2,      # 速度/过载/迎角临界阈值 (% 限制值)
+    "crit_mach_margin": 0.02,    # 马赫数临界: MNE 减去该值
+    "alert_exit_margin_pct": 0.5, # 告警降级需比进入阈值低多少 (百分点)
+    "alert_min_dwell_ms": 300,   # 进入某一告警等级后至少保持的时间 (ms)
     "unit": "km/h",              # km/h, kt, mph
     "show_unit": True,           # 是否显示单位
     "smart_hide": True,          # 默认开启智能隐藏 (仅在空战中显示)
     "enable_sound": False,       # 默认关闭声音
     "sound_volume": 35,          # 音量 0-100
+    "alarm_preset": "normal",    # 告警曲线: gentle / normal / aggressive
+    "alarm_streaming": True,     # 流式合成 (相位连续); False 为逐次播放缓存的蜂鸣
+    "audio_idle_suspend": 30,    # 无告警多少秒后释放音频设备 (0 = 不释放)
+    "audio_backend": "auto",     # auto / pygame / winmm (无需 pygame) / null (静音)
+    "log_format": "csv",         # 调试日志格式: csv / binary (.wtrec 列式记录)
+    "log_compress": True,        # binary 日志按块 zlib 压缩
     "exp_telemetry_enabled": False, # 实验性遥测 (Exp Telemetry)
     "ab_trigger_pct": 99.7,      # 触发阈值
     "ab_exit_pct": 95.0,         # 退出阈值
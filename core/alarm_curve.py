@@ -0,0 +1,82 @@
+from array import array
+
+# 曲线预设 (来自 sounds/test.py 的调参结果)
+#   f_min/f_max: 蜂鸣频率 (Hz)，pitch_pow 越大越晚升调
+#   t_max/t_min: 蜂鸣间隔 (s)，刚进入警告时为 t_max，接近临界时为 t_min
+#   v_min/v_max: 相对音量 (0-1)，再乘以用户音量
+#   dur_max/dur_min: 单次蜂鸣时长 (ms)，越危险越短促
+ALARM_PRESETS = {
+    "gentle": {
+        "f_min": 550, "f_max": 1800, "pitch_pow": 2.1,
+        "t_min": 0.09, "t_max": 0.90, "time_pow": 2.5,
+        "v_min": 0.12, "v_max": 0.85, "vol_pow": 1.6,
+        "dur_min": 40, "dur_max": 80,
+        "waveform": "sine",
+    },
+    "normal": {
+        "f_min": 600, "f_max": 2200, "pitch_pow": 1.8,
+        "t_min": 0.06, "t_max": 0.80, "time_pow": 2.2,
+        "v_min": 0.15, "v_max": 1.00, "vol_pow": 1.4,
+        "dur_min": 30, "dur_max": 70,
+        "waveform": "sine",
+    },
+    "aggressive": {
+        "f_min": 700, "f_max": 2600, "pitch_pow": 1.4,
+        "t_min": 0.04, "t_max": 0.60, "time_pow": 1.8,
+        "v_min": 0.20, "v_max": 1.00, "vol_pow": 1.2,
+        "dur_min": 25, "dur_max": 60,
+        "waveform": "square",
+    },
+}
+
+DEFAULT_PRESET = "normal"
+
+# 曲线表的分辨率 (危险程度 u ∈ [0, 1] 的采样点数)
+CURVE_STEPS = 256
+
+
+def _clamp(x, a, b):
+    return a if x < a else (b if x > b else x)
+
+
+class AlarmCurve:
+    """
+    危险程度 -> 蜂鸣参数 的预计算曲线表
+
+    危险程度 u = (ratio - start) / (1 - start)，ratio 为 当前值/限制值，
+    start 为开始告警的比例 (即用户的警告阈值)。构造时按 CURVE_STEPS 个采样点
+    预先计算间隔、频率、音量和时长，调度线程每次只需一次查表。
+    """
+    def __init__(self, start=0.97, preset=DEFAULT_PRESET):
+        params = ALARM_PRESETS.get(preset, ALARM_PRESETS[DEFAULT_PRESET])
+        self.preset = preset if preset in ALARM_PRESETS else DEFAULT_PRESET
+        self.start = _clamp(start, 0.5, 0.999)
+        self.waveform = params["waveform"]
+        self.f_max = params["f_max"]
+        self.v_max = params["v_max"]
+
+        n = CURVE_STEPS
+        self.interval = array('d')  # s
+        self.freq = array('i')      # Hz
+        self.volume = array('d')    # 0-1
+        self.dur_ms = array('i')    # ms
+        for i in range(n):
+            u = i / (n - 1)
+            self.freq.append(int(params["f_min"] + (params["f_max"] - params["f_min"]) * u ** params["pitch_pow"]))
+            self.interval.append(params["t_min"] + (params["t_max"] - params["t_min"]) * (1.0 - u) ** params["time_pow"])
+            self.volume.append(params["v_min"] + (params["v_max"] - params["v_min"]) * u ** params["vol_pow"])
+            self.dur_ms.append(int(params["dur_max"] - (params["dur_max"] - params["dur_min"]) * u))
+
+    def index(self, ratio):
+        """ratio -> 曲线表下标 (低于 start 时为 0)"""
+        u = _clamp((ratio - self.start) / (1.0 - self.start), 0.0, 1.0)
+        return int(u * (CURVE_STEPS - 1) + 0.5)
+
+    def lookup(self, ratio):
+        """返回 (间隔 s, 频率 Hz, 相对音量, 时长 ms)"""
+        i = self.index(ratio)
+        return self.interval[i], self.freq[i], self.volume[i], self.dur_ms[i]
+
+    def tones(self):
+        """曲线表中出现的全部 (频率, 时长 ms)，按危险程度从低到高去重"""
+        return list(dict.fromkeys(zip(self.freq, self.dur_ms)))
@@ -0,0 +1,115 @@
+import math
+from array import array
+
+# 每个块的时长 (ms)；参数变化最迟在 (正在播放 + 已排队) 两个块之后生效
+CHUNK_MS = 20
+# 合成音的峰值幅度 (相对 int16 满幅)
+TONE_AMPLITUDE = 0.6
+# 淡入淡出时长 (s)，防止爆音
+FADE_S = 0.002
+
+# 告警等级 (与 LimitEngine 一致)
+LEVEL_NONE = 0
+LEVEL_WARN = 1
+LEVEL_CRIT = 2
+# 提示音 (非结构告警，如实验性减速板动作): 上行的两个短音，只播放一次
+LEVEL_CUE = 3
+CUE_FREQS = (660, 990)
+CUE_NOTE_MS = 60
+CUE_VOLUME = 0.5
+
+
+def wave_sample(waveform, phase):
+    """phase 为周期内的位置 [0, 1)"""
+    if waveform == 'square':
+        return 1.0 if phase < 0.5 else -1.0
+    if waveform == 'triangle':
+        return 4.0 * abs(phase - 0.5) - 1.0
+    return math.sin(2.0 * math.pi * phase)
+
+
+class AlarmSynth:
+    """
+    相位连续的流式告警合成器
+
+    每次 render() 把下一个 CHUNK_MS 的 PCM 写入同一个预分配的 buf。振荡器相位、
+    蜂鸣周期内的位置和包络幅度跨块保留，音高/节奏变化只在块边界改变参数，
+    波形本身不会断开；蜂鸣的起止和静音都经过 FADE_S 的线性斜坡，没有爆音。
+    """
+    def __init__(self, sample_rate, channels=1, chunk_ms=CHUNK_MS):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames = max(1, int(sample_rate * chunk_ms / 1000.0))
+        self.chunk_s = self.frames / sample_rate
+        self.buf = array('h', bytes(2 * self.frames * channels))
+        self._fade = max(1, int(sample_rate * FADE_S))
+        self.reset()
+
+    def reset(self):
+        self.phase = 0.0
+        self.freq = 0.0
+        self.gain = 0.0   # 当前包络幅度 (已含音量)
+        self.pos = 0      # 当前蜂鸣周期内已经过的样本数
+        self.level = LEVEL_NONE
+
+    def render(self, curve, level, ratio, volume):
+        """
+        按当前目标合成下一个块
+
+        Returns:
+            False 表示该块完全静音 (已淡出且无需发声)，调用方可以停止送块
+        """
+        sr = self.sample_rate
+        if level == LEVEL_CUE and self.level != LEVEL_CUE:
+            self.pos = 0  # 提示音从头开始
+
+        if level == LEVEL_CRIT:
+            freq, vol = curve.f_max, curve.v_max
+            on = period = self.frames + 1  # 常开
+        elif level == LEVEL_CUE:
+            # 按块切换音高 (相位连续)，两个音播完后保持静音直到目标变化
+            note = int(CUE_NOTE_MS * sr / 1000.0)
+            freq = CUE_FREQS[0] if self.pos < note else CUE_FREQS[1]
+            vol = CUE_VOLUME
+            on = len(CUE_FREQS) * note
+            period = on + 10 * sr
+        elif level == LEVEL_WARN:
+            interval, freq, vol, dur_ms = curve.lookup(ratio)
+            period = max(1, int(interval * sr))
+            on = min(period, int(dur_ms * sr / 1000.0))
+        else:
+            if self.gain == 0.0:
+                return False
+            # 保持原音高淡出
+            freq, vol, on, period = self.freq, 0.0, 0, 1
+
+        amp = 32767 * TONE_AMPLITUDE * max(0.0, min(1.0, volume * vol))
+        ramp = 32767 * TONE_AMPLITUDE / self._fade
+        step = freq / sr
+        waveform = curve.waveform
+        phase, gain, pos = self.phase, self.gain, self.pos
+        if pos >= period:
+            pos = 0
+
+        buf, ch = self.buf, self.channels
+        k = 0
+        for _ in range(self.frames):
+            target = amp if pos < on else 0.0
+            if gain < target:
+                gain = min(target, gain + ramp)
+            elif gain > target:
+                gain = max(target, gain - ramp)
+            s = int(gain * wave_sample(waveform, phase)) if gain else 0
+            for _ in range(ch):
+                buf[k] = s
+                k += 1
+            phase += step
+            if phase >= 1.0:
+                phase -= 1.0
+            pos += 1
+            if pos >= period:
+                pos = 0
+
+        self.phase, self.freq, self.gain, self.pos = phase, freq, gain, pos
+        self.level = level
+        return True
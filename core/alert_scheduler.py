@@ -0,0 +1,144 @@
+import time
+import threading
+
+from core.limit_engine import LEVEL_NONE, LEVEL_CRIT
+from core.alarm_synth import LEVEL_CUE
+
+# 优先级 (数值越大越优先)
+PRIORITY_CUE = 10     # 提示音 (如实验性减速板动作)
+PRIORITY_WARN = 20    # 结构限制: 警告
+PRIORITY_CRIT = 30    # 结构限制: 临界
+
+# 告警在最后一次触发后保持的时间 (s)；轮询线程每个 tick 都会刷新
+DEFAULT_TTL = 0.5
+# 提示音的持续时间，同时作为开始期限 (s)
+CUE_TTL = 0.4
+
+
+def limit_priority(level):
+    """结构限制告警的优先级 (临界高于警告)"""
+    return PRIORITY_CRIT if level >= LEVEL_CRIT else PRIORITY_WARN
+
+
+class _Alert:
+    __slots__ = ("source", "priority", "level", "ratio", "expires", "start_by", "posted", "started")
+
+    def __init__(self, source, priority, level, ratio, expires, start_by, posted):
+        self.source = source
+        self.priority = priority
+        self.level = level
+        self.ratio = ratio
+        self.expires = expires
+        self.start_by = start_by
+        self.posted = posted
+        self.started = False
+
+    def rank(self):
+        # 同优先级时: 等级高者优先，其次比例高者，再次先触发者
+        return (self.priority, self.level, self.ratio, -self.posted)
+
+
+class AlertScheduler:
+    """
+    多告警源的优先级调度
+
+    每个来源 (source) 同时只有一条告警: 重复触发只刷新等级、比例和过期时间
+    (合并)，不会重新开始声音。post()/clear() 在调用线程内同步选出优先级最高的
+    告警并立即交给 sink(level, ratio) (通常为 SoundManager.update_alarm)，
+    较低优先级的声音被直接替换。选择只遍历来源表，开销与来源数成正比，
+    与触发次数无关，最高优先级告警的开始延迟 = 本次调用 + 音频线程的响应时间。
+
+    deadline:
+        ttl: 最后一次触发后 ttl 秒未再触发则过期
+        start_within: 若在该时间内一直被更高优先级压住而没能开始，则丢弃
+            (用于过时后没有意义的提示音)；这类告警开始后被打断也直接丢弃，
+            不会在更高优先级结束后重播。None 表示一直等到过期
+
+    提示音使用 LEVEL_CUE，由 sink 播放独立的提示声音而不是结构告警声
+    """
+    def __init__(self, sink, clock=time.monotonic):
+        self.sink = sink
+        self.clock = clock
+        self._alerts = {}          # source -> _Alert
+        self._lock = threading.Lock()
+        self._active = None        # 当前输出的 _Alert
+        self._output = (LEVEL_NONE, 0.0)
+
+        self.posts = 0
+        self.coalesced = 0
+        self.preemptions = 0
+        self.dropped = 0
+
+    @property
+    def active(self):
+        """当前正在输出的来源 (无告警时为 None)"""
+        alert = self._active
+        return alert.source if alert is not None else None
+
+    def post(self, source, priority, level, ratio=0.0, ttl=DEFAULT_TTL, start_within=None):
+        """触发 (或刷新) 一条告警；level 为 LEVEL_NONE 时等同 clear(source)"""
+        if level == LEVEL_NONE:
+            self.clear(source)
+            return
+        now = self.clock()
+        with self._lock:
+            self.posts += 1
+            alert = self._alerts.get(source)
+            if alert is None:
+                start_by = None if start_within is None else now + start_within
+                self._alerts[source] = _Alert(source, priority, level, ratio, now + ttl, start_by, now)
+            else:
+                self.coalesced += 1
+                alert.priority = priority
+                alert.level = level
+                alert.ratio = ratio
+                alert.expires = now + ttl
+            self._dispatch(now)
+
+    def clear(self, source):
+        with self._lock:
+            if self._alerts.pop(source, None) is not None:
+                self._dispatch(self.clock())
+
+    def clear_all(self):
+        with self._lock:
+            self._alerts.clear()
+            self._dispatch(self.clock())
+
+    def refresh(self):
+        """重新把当前输出交给 sink (例如声音设置变化后)"""
+        with self._lock:
+            self._output = None
+            self._dispatch(self.clock())
+
+    def tick(self):
+        """处理过期和错过开始时间的告警 (轮询线程每个 tick 调用一次)"""
+        with self._lock:
+            self._dispatch(self.clock())
+
+    def _dispatch(self, now):
+        best = None
+        for source, alert in list(self._alerts.items()):
+            if now >= alert.expires or (not alert.started and alert.start_by is not None
+                                        and now >= alert.start_by):
+                del self._alerts[source]
+                if not alert.started:
+                    self.dropped += 1
+                continue
+            if best is None or alert.rank() > best.rank():
+                best = alert
+
+        prev = self._active
+        if best is not prev:
+            if prev is not None and best is not None and self._alerts.get(prev.source) is prev:
+                self.preemptions += 1
+                if prev.start_by is not None:
+                    del self._alerts[prev.source]
+            self._active = best
+        if best is not None:
+            best.started = True
+
+        output = (best.level, best.ratio) if best is not None else (LEVEL_NONE, 0.0)
+        if output != self._output:
+            self._output = output
+            self.sink(*output)
@@ -0,0 +1,394 @@
+import sys
+import time
+import ctypes
+import importlib.util
+from array import array
+
+# === 音频库 ===
+# 只检查是否安装；pygame (SDL) 在创建 PygameBackend 时才导入，选用其他后端时不付出其启动开销
+PYGAME_AVAILABLE = importlib.util.find_spec("pygame") is not None
+
+
+class AudioBackend:
+    """
+    音频输出后端: 一个专用输出通道，语义与 pygame.mixer.Channel 相同
+
+    声音对象由 make_sound() 从单声道/多声道 16-bit PCM 构造，只能交给同一个后端播放。
+    所有方法只由 SoundManager 的音频线程调用。
+    """
+    name = ""
+    available = True
+    # queued() 为 True 前最多可排队的声音数 (流式模式的提前量)
+    queue_ahead = 1
+
+    def open(self, sample_rate, buffer_samples):
+        """打开设备，返回实际的 (采样率, 声道数)；失败时抛出异常"""
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def make_sound(self, data):
+        raise NotImplementedError
+
+    def stream_buffer(self, nbytes):
+        """
+        流式模式用的可复用缓冲，返回对象的 write(data) 写入新块并返回可播放的声音
+        """
+        raise NotImplementedError
+
+    def play(self, sound, loops=0):
+        """立即播放 (打断当前声音和队列)，loops=-1 为无限循环"""
+        raise NotImplementedError
+
+    def queue(self, sound):
+        """当前声音播完后无缝接着播放；通道空闲时立即播放"""
+        raise NotImplementedError
+
+    def stop(self):
+        raise NotImplementedError
+
+    def set_volume(self, volume):
+        raise NotImplementedError
+
+    def busy(self):
+        """是否正在发声"""
+        raise NotImplementedError
+
+    def queued(self):
+        """排队未开始的声音是否已达到 queue_ahead"""
+        raise NotImplementedError
+
+
+# ----------------------------------------------------------------------
+# pygame
+# ----------------------------------------------------------------------
+
+class _PygameStreamBuffer:
+    """预先创建的 Sound，通过其缓冲协议原地改写样本；不可写时每次新建 Sound"""
+    def __init__(self, nbytes):
+        import pygame
+        self._mixer = pygame.mixer
+        self.sound = pygame.mixer.Sound(buffer=bytes(nbytes))
+        try:
+            self.view = memoryview(self.sound).cast('B')
+            if self.view.readonly:
+                self.view = None
+        except TypeError:
+            self.view = None
+
+    def write(self, data):
+        if self.view is None:
+            return self._mixer.Sound(buffer=data)
+        self.view[:] = memoryview(data).cast('B')
+        return self.sound
+
+
+class PygameBackend(AudioBackend):
+    """pygame.mixer (SDL)，保留 0 号通道给告警"""
+    name = "pygame"
+    available = PYGAME_AVAILABLE
+
+    def __init__(self):
+        import pygame
+        self.mixer = pygame.mixer
+        self.channel = None
+
+    def open(self, sample_rate, buffer_samples):
+        mixer = self.mixer
+        mixer.pre_init(sample_rate, -16, 1, buffer_samples)
+        mixer.init()
+        rate, _, channels = mixer.get_init()
+        mixer.set_reserved(1)
+        self.channel = mixer.Channel(0)
+        return rate, channels
+
+    def close(self):
+        self.channel = None
+        self.mixer.quit()
+
+    def make_sound(self, data):
+        return self.mixer.Sound(buffer=data)
+
+    def stream_buffer(self, nbytes):
+        return _PygameStreamBuffer(nbytes)
+
+    def play(self, sound, loops=0):
+        self.channel.play(sound, loops=loops)
+
+    def queue(self, sound):
+        self.channel.queue(sound)
+
+    def stop(self):
+        self.channel.stop()
+
+    def set_volume(self, volume):
+        self.channel.set_volume(volume)
+
+    def busy(self):
+        return self.channel.get_busy()
+
+    def queued(self):
+        return self.channel.get_queue() is not None
+
+
+# ----------------------------------------------------------------------
+# WinMM waveOut (仅标准库)
+# ----------------------------------------------------------------------
+
+WAVE_MAPPER = 0xFFFFFFFF
+WAVE_FORMAT_PCM = 1
+CALLBACK_NULL = 0
+WHDR_DONE = 0x01
+WHDR_BEGINLOOP = 0x04
+WHDR_ENDLOOP = 0x08
+
+
+class _WAVEFORMATEX(ctypes.Structure):
+    _fields_ = [
+        ("wFormatTag", ctypes.c_ushort),
+        ("nChannels", ctypes.c_ushort),
+        ("nSamplesPerSec", ctypes.c_uint32),
+        ("nAvgBytesPerSec", ctypes.c_uint32),
+        ("nBlockAlign", ctypes.c_ushort),
+        ("wBitsPerSample", ctypes.c_ushort),
+        ("cbSize", ctypes.c_ushort),
+    ]
+
+
+class _WAVEHDR(ctypes.Structure):
+    _fields_ = [
+        ("lpData", ctypes.c_void_p),
+        ("dwBufferLength", ctypes.c_uint32),
+        ("dwBytesRecorded", ctypes.c_uint32),
+        ("dwUser", ctypes.c_size_t),
+        ("dwFlags", ctypes.c_uint32),
+        ("dwLoops", ctypes.c_uint32),
+        ("lpNext", ctypes.c_void_p),
+        ("reserved", ctypes.c_size_t),
+    ]
+
+
+class _PCMBuffer:
+    """ctypes 内存中的一段 PCM，同时作为 waveOut 后端的声音和流式缓冲"""
+    def __init__(self, data):
+        self.nbytes = len(memoryview(data).cast('B'))
+        self.buf = (ctypes.c_char * self.nbytes)()
+        self.write(data)
+
+    def write(self, data):
+        src = data.buffer_info()[0] if isinstance(data, array) else bytes(data)
+        ctypes.memmove(self.buf, src, self.nbytes)
+        return self
+
+
+class WinMMBackend(AudioBackend):
+    """
+    Windows waveOut，通过 ctypes 调用 winmm.dll，无需任何第三方库
+
+    启动快、占用内存小，但经过系统混音，输出延迟通常比 pygame 高几十毫秒。
+    每次 play/queue 提交一个 WAVEHDR，驱动按提交顺序播放，天然支持无缝排队。
+    """
+    name = "winmm"
+    available = sys.platform == 'win32'
+    # 系统混音需要更多提前量，否则流式块之间会断流
+    queue_ahead = 3
+
+    def __init__(self):
+        self._winmm = None
+        self._handle = None
+        self._pending = []  # [(WAVEHDR, _PCMBuffer)]，按提交顺序
+
+    def open(self, sample_rate, buffer_samples):
+        self._winmm = ctypes.WinDLL('winmm')
+        fmt = _WAVEFORMATEX(WAVE_FORMAT_PCM, 1, sample_rate, sample_rate * 2, 2, 16, 0)
+        handle = ctypes.c_void_p()
+        err = self._winmm.waveOutOpen(ctypes.byref(handle), ctypes.c_uint(WAVE_MAPPER),
+                                      ctypes.byref(fmt), None, None, CALLBACK_NULL)
+        if err:
+            raise OSError(f"waveOutOpen 失败: {err}")
+        self._handle = handle
+        return sample_rate, 1
+
+    def close(self):
+        if self._handle is not None:
+            self.stop()
+            self._winmm.waveOutClose(self._handle)
+            self._handle = None
+
+    def make_sound(self, data):
+        return _PCMBuffer(data)
+
+    def stream_buffer(self, nbytes):
+        return _PCMBuffer(bytes(nbytes))
+
+    def _submit(self, sound, loops):
+        hdr = _WAVEHDR()
+        hdr.lpData = ctypes.cast(sound.buf, ctypes.c_void_p)
+        hdr.dwBufferLength = sound.nbytes
+        if loops:
+            hdr.dwFlags = WHDR_BEGINLOOP | WHDR_ENDLOOP
+            hdr.dwLoops = 0xFFFFFFFF if loops < 0 else loops + 1
+        size = ctypes.sizeof(_WAVEHDR)
+        self._winmm.waveOutPrepareHeader(self._handle, ctypes.byref(hdr), size)
+        self._winmm.waveOutWrite(self._handle, ctypes.byref(hdr), size)
+        # 播放完成前必须保持 WAVEHDR 和数据存活
+        self._pending.append((hdr, sound))
+
+    def _reap(self):
+        size = ctypes.sizeof(_WAVEHDR)
+        while self._pending and self._pending[0][0].dwFlags & WHDR_DONE:
+            hdr, _ = self._pending.pop(0)
+            self._winmm.waveOutUnprepareHeader(self._handle, ctypes.byref(hdr), size)
+
+    def play(self, sound, loops=0):
+        self.stop()
+        self._submit(sound, loops)
+
+    def queue(self, sound):
+        self._submit(sound, 0)
+
+    def stop(self):
+        if self._pending:
+            # waveOutReset 会把所有已提交的缓冲标记为完成
+            self._winmm.waveOutReset(self._handle)
+            self._reap()
+
+    def set_volume(self, volume):
+        v = int(max(0.0, min(1.0, volume)) * 0xFFFF)
+        self._winmm.waveOutSetVolume(self._handle, ctypes.c_uint32(v | (v << 16)))
+
+    def busy(self):
+        self._reap()
+        return bool(self._pending)
+
+    def queued(self):
+        self._reap()
+        return len(self._pending) > self.queue_ahead
+
+
+# ----------------------------------------------------------------------
+# 空后端 / 录制
+# ----------------------------------------------------------------------
+
+class _RecordedSound:
+    def __init__(self, backend, data, keep_data):
+        self.nbytes = len(memoryview(data).cast('B'))
+        self.duration = self.nbytes / (2 * backend.channels * backend.sample_rate)
+        self.data = bytes(data) if keep_data else None
+        self._keep = keep_data
+
+    def write(self, data):
+        if self._keep:
+            self.data = bytes(data)
+        return self
+
+
+class RecordingBackend(AudioBackend):
+    """
+    不发声的后端，按时钟模拟通道的播放/排队，并记录每次调用
+
+    events 为 [(时间, 操作, 声音, loops)]，操作为 play/queue/start/stop；
+    start 表示排队的声音实际开始播放的 (模拟) 时间。clock 可替换为假时钟，
+    用于确定性的测试和延迟测量。record=False 时只模拟不记录 (即 null 后端)。
+    """
+    name = "null"
+
+    def __init__(self, clock=time.perf_counter, record=True, keep_data=False):
+        self.clock = clock
+        self.record = record
+        self.keep_data = keep_data
+        self.events = []
+        self.sample_rate = 44100
+        self.channels = 1
+        self.volume = 1.0
+        self.is_open = False
+        self._end = 0.0      # 当前声音结束时间
+        self._queue = None
+
+    def _log(self, t, op, sound=None, loops=0):
+        if self.record:
+            self.events.append((t, op, sound, loops))
+
+    def _advance(self):
+        now = self.clock()
+        if self._queue is not None and now >= self._end:
+            sound, self._queue = self._queue, None
+            start = self._end
+            self._end = start + sound.duration
+            self._log(start, 'start', sound)
+        return now
+
+    def open(self, sample_rate, buffer_samples):
+        self.sample_rate = sample_rate
+        self.is_open = True
+        self._log(self.clock(), 'open')
+        return self.sample_rate, self.channels
+
+    def close(self):
+        self._end, self._queue = 0.0, None
+        self.is_open = False
+        self._log(self.clock(), 'close')
+
+    def make_sound(self, data):
+        return _RecordedSound(self, data, self.keep_data)
+
+    def stream_buffer(self, nbytes):
+        return _RecordedSound(self, bytes(nbytes), self.keep_data)
+
+    def play(self, sound, loops=0):
+        now = self.clock()
+        self._queue = None
+        self._end = float('inf') if loops < 0 else now + sound.duration * (loops + 1)
+        self._log(now, 'play', sound, loops)
+
+    def queue(self, sound):
+        now = self._advance()
+        if now >= self._end:
+            self.play(sound)
+            return
+        self._queue = sound
+        self._log(now, 'queue', sound)
+
+    def stop(self):
+        now = self.clock()
+        self._end, self._queue = 0.0, None
+        self._log(now, 'stop')
+
+    def set_volume(self, volume):
+        self.volume = volume
+
+    def busy(self):
+        return self._advance() < self._end
+
+    def queued(self):
+        self._advance()
+        return self._queue is not None
+
+
+BACKENDS = {
+    PygameBackend.name: PygameBackend,
+    WinMMBackend.name: WinMMBackend,
+    RecordingBackend.name: RecordingBackend,
+}
+
+
+def create_backend(name="auto"):
+    """
+    按名称创建后端；auto (或指定的后端不可用时) 依次尝试 pygame、winmm
+
+    Returns:
+        后端实例；没有可发声的后端时返回 None
+    """
+    if name == RecordingBackend.name:
+        # 用户选项 null (静音) 只模拟不记录；需要事件记录时 (测试、基准) 直接创建 RecordingBackend
+        return RecordingBackend(record=False)
+    if name in BACKENDS and BACKENDS[name].available:
+        return BACKENDS[name]()
+    if name not in ("auto", None):
+        print(f"警告: 音频后端 {name} 不可用, 自动选择")
+    for cls in (PygameBackend, WinMMBackend):
+        if cls.available:
+            return cls()
+    print("警告: 未检测到 pygame, 声音功能将不可用")
+    return None
@@ -1,5 +1,16 @@
 import os
+from collections import OrderedDict
 from config import resource_path
+from core.fm_store import FMStore
+
+# 游戏 type 中常见的变体后缀 (活动/连杀/高级版等)，解析失败时逐个剥离重试
+KNOWN_SUFFIXES = (
+    "_killstreak", "_event", "_premium", "_prem", "_gift", "_tutorial", "_test",
+)
+
+# 名称解析缓存上限 (每个 type 只在首次出现时完整解析一次)
+RESOLVE_CACHE_SIZE = 256
+
 
 class FM_DB:
     """处理飞机气动数据加载，支持可变后掠翼飞机"""
@@ -7,38 +18,19 @@ class FM_DB:
         # 存储格式: float (普通飞机) 或 list[(sweep, value), ...] (可变后掠翼)
         self.crit_speeds = {}
         self.crit_machs = {}
+        # 列式存储: 保留 fm_data_db.csv 的全部字段
+        self.store = FMStore()
         # 名称映射: 游戏返回的 type -> FM 数据库中的 name
         self.name_to_fm = {}
+        # 反向映射: FM name -> [游戏 type, ...]
+        self.fm_to_names = {}
+        # 规范化索引: 规范化名称 -> crit_speeds 中的有效名称
+        self._norm_index = {}
+        # 解析缓存: type -> 有效名称 或 None (未知机型)，LRU 淘汰
+        self._resolve_cache = OrderedDict()
         self.load_names_db()
         self.load_db()
-    
-    @staticmethod
-    def _parse_sweep_value(raw: str):
-        """
-        解析可能包含后掠角数据的值
-        
-        普通飞机: "892" -> 892.0
-        可变后掠翼: "0,892,0.5,1312,1,1470" -> [(0.0, 892.0), (0.5, 1312.0), (1.0, 1470.0)]
-        """
-        raw = raw.strip()
-        if not raw:
-            return None
-            
-        if ',' in raw:
-            # 可变后掠翼格式: sweep0,value0,sweep1,value1,...
-            parts = raw.split(',')
-            if len(parts) < 2 or len(parts) % 2 != 0:
-                return None
-            result = []
-            for i in range(0, len(parts), 2):
-                sweep = float(parts[i])
-                value = float(parts[i+1])
-                result.append((sweep, value))
-            # 按 sweep 排序确保插值正确
-            result.sort(key=lambda x: x[0])
-            return result
-        else:
-            return float(raw)
+        self.build_index()
     
     @staticmethod
     def _interpolate(data_points: list, sweep: float):
@@ -97,11 +89,13 @@ class FM_DB:
                         fm_name = parts[1].strip()    # FM 数据库中的 name
                         if game_name and fm_name:
                             self.name_to_fm[game_name] = fm_name
+                            self.fm_to_names.setdefault(fm_name, []).append(game_name)
             print(f"成功加载 {len(self.name_to_fm)} 条名称映射")
         except Exception as e:
             print(f"加载名称映射出错: {e}")
         
     def load_db(self):
+        """加载 fm_data_db.csv 到列式存储 (全部 18 列)，并提取 Vne / Mach 限制"""
         csv_path = resource_path(os.path.join("FM", "fm_data_db.csv"))
         
         if not os.path.exists(csv_path):
@@ -109,37 +103,90 @@ class FM_DB:
             return
             
         try:
-            with open(csv_path, 'r', encoding='utf-8') as f:
-                next(f)  # 跳过 Header
-                for line in f:
-                    parts = line.strip().split(';')
-                    if len(parts) >= 8:
-                        name = parts[0]
-                        
-                        # 解析 CritAirSpd (index 6)
-                        try:
-                            parsed = self._parse_sweep_value(parts[6])
-                            if parsed is not None:
-                                self.crit_speeds[name] = parsed
-                        except (ValueError, IndexError):
-                            pass
-                        
-                        # 解析 CritAirSpdMach (index 7)
-                        try:
-                            parsed = self._parse_sweep_value(parts[7])
-                            if parsed is not None:
-                                self.crit_machs[name] = parsed
-                        except (ValueError, IndexError):
-                            pass
-                            
-            print(f"成功加载 {len(self.crit_speeds)} 条飞机数据")
+            self.store = FMStore.load(csv_path)
         except Exception as e:
             print(f"加载数据库出错: {e}")
+            return
+        
+        for col, target in (("CritAirSpd", self.crit_speeds), ("CritAirSpdMach", self.crit_machs)):
+            values = self.store.columns[col]
+            for aid, name in enumerate(self.store.names):
+                # 可变后掠翼: [(sweep, value), ...]
+                table = self.store.sweep_table(col, aid)
+                if table is not None:
+                    target[name] = [(sweep, vals[0]) for sweep, vals in table]
+                elif values[aid] == values[aid]:  # 跳过 NaN
+                    target[name] = values[aid]
+                    
+        print(f"成功加载 {len(self.crit_speeds)} 条飞机数据")
+
+    @staticmethod
+    def _normalize(name: str) -> str:
+        """规范化名称: 忽略大小写，并将 '-' 视同 '_' (如 a-10a_early / A_10A_EARLY)"""
+        return name.strip().casefold().replace('-', '_')
+
+    @classmethod
+    def _strip_suffix(cls, norm_name: str):
+        """剥离一个已知变体后缀，无可剥离时返回 None"""
+        for suffix in KNOWN_SUFFIXES:
+            if norm_name.endswith(suffix) and len(norm_name) > len(suffix):
+                return norm_name[:-len(suffix)]
+        return None
+
+    def build_index(self):
+        """
+        加载完成后建立规范化解析索引
+        
+        索引来源 (优先级从高到低):
+            1. crit_speeds 中的 FM 名称本身
+            2. fm_names_db 的游戏名称 (正向映射)
+            3. 指向同一 FM 的其它游戏名称 (反向 FmName 映射)
+        """
+        index = {}
+        for fm_name in self.crit_speeds:
+            index.setdefault(self._normalize(fm_name), fm_name)
+        
+        for game_name, fm_name in self.name_to_fm.items():
+            if fm_name in self.crit_speeds:
+                index.setdefault(self._normalize(game_name), fm_name)
+        
+        for fm_name, game_names in self.fm_to_names.items():
+            target = index.get(self._normalize(fm_name))
+            if target is None:
+                continue
+            for game_name in game_names:
+                index.setdefault(self._normalize(game_name), target)
+        
+        self._norm_index = index
+        self._resolve_cache.clear()
+
+    def _lookup(self, plane_type):
+        """完整解析流程 (不经过缓存)"""
+        # 1. 直接用原始名称查找
+        if plane_type in self.crit_speeds:
+            return plane_type
+        
+        # 2. 尝试通过 fm_names_db 映射查找
+        fm_name = self.name_to_fm.get(plane_type)
+        if fm_name and fm_name in self.crit_speeds:
+            return fm_name
+        
+        # 3. 规范化索引 (大小写/连字符差异)，并逐级剥离变体后缀
+        norm = self._normalize(plane_type)
+        while norm:
+            resolved = self._norm_index.get(norm)
+            if resolved is not None:
+                return resolved
+            norm = self._strip_suffix(norm)
+        
+        return None
 
     def _resolve_name(self, plane_type):
         """
         解析飞机名称，尝试多种方式匹配数据库
         
+        结果 (包括未找到) 会被缓存，未知机型每个 type 只解析并提示一次
+        
         Args:
             plane_type: 游戏返回的飞机类型
             
@@ -149,16 +196,31 @@ class FM_DB:
         if not plane_type:
             return None
         
-        # 1. 直接用原始名称查找
-        if plane_type in self.crit_speeds:
-            return plane_type
+        cache = self._resolve_cache
+        if plane_type in cache:
+            cache.move_to_end(plane_type)
+            return cache[plane_type]
         
-        # 2. 尝试通过 fm_names_db 映射查找
-        fm_name = self.name_to_fm.get(plane_type)
-        if fm_name and fm_name in self.crit_speeds:
-            return fm_name
+        resolved = self._lookup(plane_type)
+        if resolved is None:
+            print(f"警告: 数据库中找不到机型 {plane_type}，将不提供超速警告")
         
-        return None
+        cache[plane_type] = resolved
+        if len(cache) > RESOLVE_CACHE_SIZE:
+            cache.popitem(last=False)
+        return resolved
+
+    def get_store_id(self, plane_type):
+        """
+        获取飞机在列式存储 (self.store) 中的 id
+        
+        Returns:
+            整数 id，未找到时返回 None
+        """
+        resolved = self._resolve_name(plane_type)
+        if resolved is None:
+            return None
+        return self.store.id_of(resolved)
 
     def get_limit(self, plane_type, wing_sweep=None):
         """
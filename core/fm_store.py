@@ -0,0 +1,226 @@
+import math
+import operator
+import re
+from array import array
+
+# fm_data_db.csv 列定义 (与 FM/update_fm.py 保持一致)
+FM_DATA_COLUMNS = [
+    "Name", "Length", "WingSpan", "WingArea", "EmptyMass", "MaxFuelMass",
+    "CritAirSpd", "CritAirSpdMach", "CritGearSpd", "CombatFlaps", "TakeoffFlaps",
+    "CritFlapsSpd", "CritWingOverload", "NumEngines", "RPM", "MaxNitro",
+    "NitroConsum", "CritAoA"
+]
+
+# 复合字段拆分后的子列名，未列出的数值列为单值 (子列名即列名)
+# 可变后掠翼飞机的值为 sweep,v1..vk,sweep,v1..vk,... 分组格式
+SUB_COLUMNS = {
+    "CritWingOverload": ("neg", "pos"),
+    "RPM": ("min", "max", "max_allowed"),
+    "CritAoA": ("high", "low", "high_flaps", "low_flaps"),
+}
+
+# 分段线性字段: x0,y0,x1,y1,... (CritFlapsSpd: 襟翼比例 -> 解体速度)
+PIECEWISE_COLUMNS = ("CritFlapsSpd",)
+
+_NAN = float('nan')
+
+_OPS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+_COND_RE = re.compile(r'^\s*([\w.]+)\s*(<=|>=|==|!=|<|>)\s*(\S+)\s*$')
+
+
+def _to_float(raw: str) -> float:
+    try:
+        return float(raw) if raw else _NAN
+    except ValueError:
+        return _NAN
+
+
+class FMStore:
+    """
+    列式 FM 数据存储
+
+    每架飞机分配一个整数 id (按加载顺序)，每个数值 (子) 列是一个 array('d')，
+    缺失值为 NaN。复合字段在加载时拆分:
+        - CritWingOverload / RPM / CritAoA 拆为 "列名.子列" (如 "CritAoA.high")
+        - 可变后掠翼的值额外保存完整的后掠表，列数组中保存最大后掠角时的值
+        - CritFlapsSpd 保存为 offsets + x/y 扁平数组
+    原始字符串也会保留，便于原样回写 CSV。
+    """
+    def __init__(self):
+        self.names = []         # id -> name
+        self.ids = {}           # name -> id
+        self.raw = {col: [] for col in FM_DATA_COLUMNS[1:]}
+        self.columns = {}       # (子)列名 -> array('d')
+        self.sweep_tables = {}  # 列名 -> {id: [(sweep, (v1, ..., vk)), ...]}
+        self.pw_offsets = {}    # 列名 -> array('l')，长度 n+1
+        self.pw_x = {}          # 列名 -> array('d')
+        self.pw_y = {}          # 列名 -> array('d')
+
+        for col in FM_DATA_COLUMNS[1:]:
+            if col in PIECEWISE_COLUMNS:
+                self.pw_offsets[col] = array('l', [0])
+                self.pw_x[col] = array('d')
+                self.pw_y[col] = array('d')
+                continue
+            for sub in self.sub_column_names(col):
+                self.columns[sub] = array('d')
+            self.sweep_tables[col] = {}
+
+    # ------------------------------------------------------------------
+    # 构建
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def sub_column_names(col):
+        """返回某列拆分后的子列名列表"""
+        subs = SUB_COLUMNS.get(col)
+        if not subs:
+            return [col]
+        return [f"{col}.{s}" for s in subs]
+
+    @classmethod
+    def load(cls, csv_path):
+        """从 fm_data_db.csv 加载 (分号分隔，首行为表头)"""
+        store = cls()
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            next(f)  # 跳过 Header
+            for line in f:
+                parts = line.rstrip('\r\n').split(';')
+                if parts and parts[0] and parts[0].strip() not in store.ids:
+                    store.append(parts)
+        return store
+
+    @classmethod
+    def from_records(cls, records):
+        """从 {name: {列名: 值}} 形式的记录构建 (update_fm.py 的 FMDatabase)"""
+        store = cls()
+        for name, record in records.items():
+            store.append([name] + [str(record.get(col, "")) for col in FM_DATA_COLUMNS[1:]])
+        return store
+
+    def append(self, parts):
+        """追加一行 (按 FM_DATA_COLUMNS 顺序的字符串列表)，返回分配的 id"""
+        name = parts[0].strip()
+        if name in self.ids:
+            aid = self.ids[name]
+            raise ValueError(f"重复的飞机名称: {name} (id={aid})")
+        aid = len(self.names)
+        self.names.append(name)
+        self.ids[name] = aid
+
+        for i, col in enumerate(FM_DATA_COLUMNS[1:], start=1):
+            raw = parts[i].strip() if i < len(parts) else ""
+            self.raw[col].append(raw)
+            if col in PIECEWISE_COLUMNS:
+                self._append_piecewise(col, raw)
+            else:
+                self._append_numeric(col, aid, raw)
+        return aid
+
+    def _append_numeric(self, col, aid, raw):
+        subs = self.sub_column_names(col)
+        width = len(subs)
+        values = [_to_float(v) for v in raw.split(',')] if raw else []
+
+        if len(values) == width:
+            row = values
+        elif len(values) > width and len(values) % (width + 1) == 0:
+            # 可变后掠翼: sweep, v1..vk 分组
+            step = width + 1
+            table = [(values[j], tuple(values[j + 1:j + step]))
+                     for j in range(0, len(values), step)]
+            table.sort(key=lambda x: x[0])
+            self.sweep_tables[col][aid] = table
+            row = list(table[-1][1])
+        else:
+            row = [_NAN] * width
+
+        for sub, v in zip(subs, row):
+            self.columns[sub].append(v)
+
+    def _append_piecewise(self, col, raw):
+        values = [_to_float(v) for v in raw.split(',')] if raw else []
+        if len(values) % 2 == 0:
+            pairs = sorted(zip(values[0::2], values[1::2]))
+            for x, y in pairs:
+                self.pw_x[col].append(x)
+                self.pw_y[col].append(y)
+        self.pw_offsets[col].append(len(self.pw_x[col]))
+
+    # ------------------------------------------------------------------
+    # 访问
+    # ------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.names)
+
+    def id_of(self, name):
+        return self.ids.get(name)
+
+    def value(self, aid, column):
+        """单个数值，缺失时返回 None"""
+        v = self.columns[column][aid]
+        return None if math.isnan(v) else v
+
+    def sweep_table(self, column, aid):
+        """可变后掠翼的后掠表 [(sweep, (v1, ..)), ...]，普通飞机返回 None"""
+        return self.sweep_tables.get(column, {}).get(aid)
+
+    def piecewise(self, column, aid):
+        """分段线性字段的点列表 [(x, y), ...] (按 x 排序)"""
+        offsets = self.pw_offsets[column]
+        lo, hi = offsets[aid], offsets[aid + 1]
+        xs, ys = self.pw_x[column], self.pw_y[column]
+        return [(xs[k], ys[k]) for k in range(lo, hi)]
+
+    def record(self, aid):
+        """原始字符串记录 {列名: 值}，与 CSV 一致"""
+        rec = {"Name": self.names[aid]}
+        for col in FM_DATA_COLUMNS[1:]:
+            rec[col] = self.raw[col][aid]
+        return rec
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def filter(self, column, op, value, ids=None):
+        """
+        返回满足 column <op> value 的飞机 id 列表，缺失值 (NaN) 永不匹配
+
+        例: store.filter("CritAirSpdMach", "<", 0.9)
+        ids: 可选，在已有结果上继续过滤
+        """
+        cmp = _OPS[op]
+        col = self.columns[column]
+        if ids is None:
+            return [i for i, v in enumerate(col) if v == v and cmp(v, value)]
+        return [i for i in ids if col[i] == col[i] and cmp(col[i], value)]
+
+    def where(self, *conditions):
+        """多个条件取交集，条件为 (column, op, value) 元组或 "CritAirSpdMach<0.9" 字符串"""
+        ids = None
+        for cond in conditions:
+            if isinstance(cond, str):
+                cond = self.parse_condition(cond)
+            ids = self.filter(*cond, ids=ids)
+        return ids if ids is not None else list(range(len(self.names)))
+
+    def names_of(self, ids):
+        return [self.names[i] for i in ids]
+
+    @staticmethod
+    def parse_condition(text):
+        """解析 "列名 op 数值" 形式的条件字符串"""
+        m = _COND_RE.match(text)
+        if not m:
+            raise ValueError(f"无法解析查询条件: {text}")
+        return m.group(1), m.group(2), float(m.group(3))
@@ -0,0 +1,82 @@
+import os
+import threading
+from config import resource_path
+from core.fm_db import FM_DB
+
+# 需要监视的数据文件
+WATCHED_FILES = ("fm_data_db.csv", "fm_names_db.csv")
+
+
+class FMWatcher:
+    """
+    监视 FM 数据文件，变化后在后台线程重建 FM_DB 并通过回调整体替换
+
+    新的 FM_DB 完全构建好后才交给回调，调用方只需做一次属性赋值，
+    轮询线程永远不会看到构建到一半的表。
+    """
+    def __init__(self, on_reload, interval=2.0):
+        self.on_reload = on_reload
+        self.interval = interval
+        self.paths = [resource_path(os.path.join("FM", name)) for name in WATCHED_FILES]
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._last_sig = self._signature()
+
+    def _signature(self):
+        """文件 (mtime, size) 签名，文件不存在时为 None"""
+        sig = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                sig.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                sig.append(None)
+        return tuple(sig)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._watch_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _watch_loop(self):
+        pending = None
+        while not self._stop_event.wait(self.interval):
+            sig = self._signature()
+            if sig == self._last_sig:
+                pending = None
+                continue
+
+            # 等待文件写入完成: 连续两次检查签名一致才重新加载
+            if sig != pending:
+                pending = sig
+                continue
+            pending = None
+            self._last_sig = sig
+
+            if None in sig:
+                print("警告: FM 数据文件缺失，跳过重新加载")
+                continue
+
+            self.reload()
+
+    def reload(self):
+        """在当前线程构建新的 FM_DB，成功后交给回调"""
+        try:
+            new_db = FM_DB()
+        except Exception as e:
+            print(f"重新加载 FM 数据库失败: {e}")
+            return
+
+        if not new_db.crit_speeds:
+            print("警告: 新的 FM 数据库为空，保留旧数据")
+            return
+
+        try:
+            self.on_reload(new_db)
+            print("FM 数据库已重新加载")
+        except Exception as e:
+            print(f"替换 FM 数据库失败: {e}")
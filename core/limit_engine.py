@@ -0,0 +1,310 @@
+import time
+from core.fm_db import FM_DB
+
+G = 9.80665
+
+# 临界判定 (默认): IAS >= 99.2% 限制速度 / M >= MNE - 0.02
+CRIT_SPEED_RATIO = 0.992
+CRIT_MACH_MARGIN = 0.02
+
+# 告警滞回 (默认): 降级需要 当前值/限制值 比进入阈值低这么多 (比例)
+ALERT_EXIT_MARGIN = 0.005
+# 进入某一等级后至少保持的时间 (s)，期间不降级；升级不受限制
+ALERT_MIN_DWELL_S = 0.3
+
+# 告警等级 (与 SoundManager 的状态一致)
+LEVEL_NONE = 0
+LEVEL_WARN = 1
+LEVEL_CRIT = 2
+
+
+def _const(value):
+    return lambda sweep: value
+
+
+def _limit_value(store, column, aid, index=0):
+    """限制值: 普通飞机为常量，可变后掠翼为后掠表 [(sweep, 值), ...]；缺失时为 None"""
+    table = store.sweep_table(column, aid)
+    if table is not None:
+        return [(sweep, vals[index]) for sweep, vals in table]
+
+    sub = store.sub_column_names(column)[index]
+    value = store.value(aid, sub)
+    if value is None or value == 0:
+        return None
+    return value
+
+
+def _sweep_fn(value):
+    """
+    生成 sweep -> 限制值 的函数
+
+    常量返回常量函数；后掠表线性插值 (复用 FM_DB._interpolate)
+    """
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return lambda sweep: FM_DB._interpolate(value, sweep)
+    return _const(value)
+
+
+class LimitEngine:
+    """
+    多限制结构告警引擎
+
+    切换机型时一次性预编译该机所有可用的限制检查 (Vne、Mach、起落架、襟翼、
+    过载、迎角)，之后每个 tick 只需一次遍历即可得到最严重的告警。
+    缺少 FM 数据或遥测字段的检查会被跳过。
+    """
+    def __init__(self, crit_speed_ratio=CRIT_SPEED_RATIO, crit_mach_margin=CRIT_MACH_MARGIN):
+        self.crit_speed_ratio = crit_speed_ratio
+        self.crit_mach_margin = crit_mach_margin
+        self._db = None
+        self._type = None
+        self._vne = None     # sweep -> km/h
+        self._mne = None     # sweep -> Mach
+        self._checks = []    # [(kind, fn(data, sweep) -> (ratio, crit_ratio) | None), ...]
+        self._resolved = {}  # 当前机型解析出的限制值 (见 resolved_limits)
+
+    def set_margins(self, crit_speed_ratio, crit_mach_margin):
+        """修改临界判定，下一次 evaluate() 时重新编译"""
+        if (crit_speed_ratio, crit_mach_margin) != (self.crit_speed_ratio, self.crit_mach_margin):
+            self.crit_speed_ratio = crit_speed_ratio
+            self.crit_mach_margin = crit_mach_margin
+            self._db = None
+
+    def compile(self, fm_db, plane_type):
+        """为指定机型预编译限制检查，结果缓存到机型或数据库改变为止"""
+        crit_speed = self.crit_speed_ratio
+        crit_mach_margin = self.crit_mach_margin
+        self._db = fm_db
+        self._type = plane_type
+        self._vne = None
+        self._mne = None
+        self._checks = []
+        self._resolved = {}
+
+        aid = fm_db.get_store_id(plane_type)
+        if aid is None:
+            return
+        store = fm_db.store
+
+        resolved = self._resolved
+        resolved['vne_kmh'] = _limit_value(store, "CritAirSpd", aid)
+        resolved['mne'] = _limit_value(store, "CritAirSpdMach", aid)
+        self._vne = _sweep_fn(resolved['vne_kmh'])
+        self._mne = _sweep_fn(resolved['mne'])
+        checks = self._checks
+
+        # 1. Vne (IAS)
+        if self._vne is not None:
+            vne = self._vne
+
+            def check_vne(data, sweep):
+                ias = data['ias_kmh']
+                limit = vne(sweep)
+                if ias is None or not limit:
+                    return None
+                return ias / limit, crit_speed
+            checks.append(("vne", check_vne))
+
+        # 2. Mach
+        if self._mne is not None:
+            mne = self._mne
+
+            def check_mach(data, sweep):
+                mach = data['mach']
+                limit = mne(sweep)
+                if mach is None or not limit:
+                    return None
+                return mach / limit, 1.0 - crit_mach_margin / limit
+            checks.append(("mach", check_mach))
+
+        # 3. 起落架 (放下时)
+        gear_spd = resolved['gear_kmh'] = store.value(aid, "CritGearSpd")
+        if gear_spd:
+            def check_gear(data, sweep):
+                gear, ias = data['gear'], data['ias_kmh']
+                if not gear or ias is None:
+                    return None
+                return ias / gear_spd, crit_speed
+            checks.append(("gear", check_gear))
+
+        # 4. 襟翼 (按襟翼比例分段插值)
+        flaps_points = resolved['flaps_kmh'] = store.piecewise("CritFlapsSpd", aid) or None
+        if flaps_points:
+            def check_flaps(data, sweep):
+                flaps, ias = data['flaps'], data['ias_kmh']
+                if not flaps or ias is None:
+                    return None
+                limit = FM_DB._interpolate(flaps_points, flaps / 100.0)
+                if not limit:
+                    return None
+                return ias / limit, crit_speed
+            checks.append(("flaps", check_flaps))
+
+        # 5. 过载: 机翼临界载荷 (N) / 当前重量 (空重 + 燃油)
+        empty_mass = resolved['empty_mass_kg'] = store.value(aid, "EmptyMass")
+        resolved['wing_overload_n'] = [_limit_value(store, "CritWingOverload", aid, i) for i in range(2)]
+        neg_load, pos_load = map(_sweep_fn, resolved['wing_overload_n'])
+        if empty_mass and neg_load and pos_load:
+            def check_overload(data, sweep):
+                ny = data['ny']
+                if ny is None:
+                    return None
+                weight = (empty_mass + (data['fuel_kg'] or 0.0)) * G
+                load = pos_load(sweep) if ny >= 0 else neg_load(sweep)
+                if not load:
+                    return None
+                return ny * weight / load, crit_speed
+            checks.append(("overload", check_overload))
+
+        # 6. 迎角 (襟翼放下时使用 FlapsPolar1 的临界迎角)
+        resolved['crit_aoa'] = [_limit_value(store, "CritAoA", aid, i) for i in range(4)]
+        aoa_high, aoa_low, aoa_high_flaps, aoa_low_flaps = map(_sweep_fn, resolved['crit_aoa'])
+        aoa_high_flaps = aoa_high_flaps or aoa_high
+        aoa_low_flaps = aoa_low_flaps or aoa_low
+        if aoa_high and aoa_low:
+            def check_aoa(data, sweep):
+                aoa = data['aoa']
+                if aoa is None:
+                    return None
+                flaps_down = bool(data['flaps'])
+                if aoa >= 0:
+                    limit = (aoa_high_flaps if flaps_down else aoa_high)(sweep)
+                else:
+                    limit = (aoa_low_flaps if flaps_down else aoa_low)(sweep)
+                if not limit:
+                    return None
+                return aoa / limit, crit_speed
+            checks.append(("aoa", check_aoa))
+
+    @property
+    def plane_type(self):
+        """最近一次编译的机型"""
+        return self._type
+
+    def resolved_limits(self):
+        """
+        当前机型解析出的限制值 (用于记录文件头)
+
+        常量直接给出，可变后掠翼给出后掠表 [(sweep, 值), ...]，缺失为 None；
+        另附临界判定参数。未编译或数据库中没有该机型时只有判定参数。
+        """
+        limits = {'crit_speed_ratio': self.crit_speed_ratio,
+                  'crit_mach_margin': self.crit_mach_margin}
+        limits.update(self._resolved)
+        return limits
+
+    def evaluate(self, fm_db, data, warn_ratio):
+        """
+        单次遍历所有已编译的限制检查
+
+        Args:
+            fm_db: 当前的 FM_DB (替换数据库后会自动重新编译)
+            data: get_telemetry() 的返回字典
+            warn_ratio: 警告阈值 (如 0.97)
+
+        Returns:
+            {
+                'level': 0/1/2 (无/警告/临界),
+                'kind': 最严重限制的类型 ('vne', 'mach', 'gear', 'flaps', 'overload', 'aoa') 或 None,
+                'ratio': 最严重限制的 当前值/限制值,
+                'limit_kmh': 当前 Vne (km/h) 或 None,
+                'limit_mach': 当前 MNE 或 None,
+                'warn_excess': 各限制 (比例 - 警告阈值) 的最大值，无可用检查时为 None,
+                'crit_excess': 各限制 (比例 - 临界阈值) 的最大值，无可用检查时为 None
+            }
+        """
+        plane_type = data['type']
+        if fm_db is not self._db or plane_type != self._type:
+            self.compile(fm_db, plane_type)
+
+        sweep = data.get('wing_sweep')
+        level = LEVEL_NONE
+        worst_kind = None
+        worst_ratio = 0.0
+        worst_severity = 0.0
+        warn_excess = None
+        crit_excess = None
+
+        for kind, check in self._checks:
+            res = check(data, sweep)
+            if res is None:
+                continue
+            ratio, crit_ratio = res
+            if warn_excess is None or ratio - warn_ratio > warn_excess:
+                warn_excess = ratio - warn_ratio
+            if crit_excess is None or ratio - crit_ratio > crit_excess:
+                crit_excess = ratio - crit_ratio
+            # 以 "距临界的比例" 衡量严重程度，不同限制之间可比较
+            severity = ratio / crit_ratio
+            if severity > worst_severity:
+                worst_severity = severity
+                worst_kind = kind
+                worst_ratio = ratio
+            if ratio >= crit_ratio:
+                level = LEVEL_CRIT
+            elif ratio >= warn_ratio and level < LEVEL_WARN:
+                level = LEVEL_WARN
+
+        return {
+            'level': level,
+            'kind': worst_kind,
+            'ratio': worst_ratio,
+            'limit_kmh': self._vne(sweep) if self._vne else None,
+            'limit_mach': self._mne(sweep) if self._mne else None,
+            'warn_excess': warn_excess,
+            'crit_excess': crit_excess
+        }
+
+
+class AlertStateMachine:
+    """
+    带滞回和最短停留时间的告警等级
+
+    LimitEngine.evaluate() 每个 tick 独立判定，当前值在阈值附近抖动时等级会来回跳变。
+    本状态机只过滤降级: 进入/升级沿用原阈值并在当帧生效 (进入告警的时间不变)；
+    降级要求最严重的限制比进入阈值低 exit_margin，且当前等级已保持至少 min_dwell 秒。
+    """
+    def __init__(self, exit_margin=ALERT_EXIT_MARGIN, min_dwell=ALERT_MIN_DWELL_S, clock=time.monotonic):
+        self.exit_margin = exit_margin
+        self.min_dwell = min_dwell
+        self.clock = clock
+        self.level = LEVEL_NONE
+        self.since = 0.0
+
+    def reset(self):
+        """立即回到无告警 (离开空战、无数据等)"""
+        self.level = LEVEL_NONE
+
+    def _held(self, limits):
+        """按退出阈值判定仍然成立的最高等级"""
+        margin = self.exit_margin
+        crit = limits.get('crit_excess')
+        if crit is not None and crit >= -margin:
+            return LEVEL_CRIT
+        warn = limits.get('warn_excess')
+        if warn is not None and warn >= -margin:
+            return LEVEL_WARN
+        return LEVEL_NONE
+
+    def update(self, limits):
+        """
+        Args:
+            limits: LimitEngine.evaluate() 的结果
+        Returns:
+            经过滞回的告警等级
+        """
+        raw = limits['level']
+        level = self.level
+        if raw >= level:
+            new = raw
+        elif self.clock() - self.since < self.min_dwell:
+            new = level
+        else:
+            new = max(raw, min(level, self._held(limits)))
+        if new != level:
+            self.level = new
+            self.since = self.clock()
+        return new
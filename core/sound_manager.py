@@ -1,82 +1,416 @@
-import os
-from config import resource_path
+import sys
+import time
+import threading
+from array import array
+from core.alarm_curve import AlarmCurve
+from core.alarm_synth import (AlarmSynth, wave_sample, TONE_AMPLITUDE, FADE_S,
+                              LEVEL_NONE, LEVEL_CRIT, LEVEL_CUE, CUE_FREQS, CUE_NOTE_MS, CUE_VOLUME)
+from core.tone_cache import ToneCache, tone_key
+from core.audio_backend import AudioBackend, create_backend
 
-# === 音频库 ===
-try:
-    import pygame
-    PYGAME_AVAILABLE = True
-except ImportError:
-    PYGAME_AVAILABLE = False
-    print("警告: 未检测到 pygame, 声音功能将不可用")
+SAMPLE_RATE = 44100
+MIXER_BUFFER = 512      # 样本数，约 11.6ms
 
-class SoundManager:
-    """处理声音播放，单例/单独管理"""
+# 调度线程: 每次最多粗等待这么久就重新读取危险程度 (s)
+POLL_SLICE = 0.02
+# 距离下一次蜂鸣不足该时间时改为忙等，避免系统定时器粒度带来的误差 (s)
+SPIN_MARGIN = 0.002
+# 默认空闲多久后关闭音频设备 (s)，0 表示不关闭
+IDLE_SUSPEND_S = 30
+
+# 临界状态的连续音时长 (ms，循环播放)
+CONTINUOUS_MS = 500
+# 流式模式下轮流复用的块数 = 后端提前量 + 该值 (正在播放 + 正在写入，再留一个余量)
+STREAM_RING_SPARE = 3
+
+
+def make_tone_samples(freq, dur_ms, waveform='sine', sample_rate=SAMPLE_RATE, channels=1, loop=False):
+    """
+    生成 16-bit PCM 蜂鸣 (array('h'))
+
+    loop=True 时不加淡入淡出，并把时长取整到整数个周期，循环播放时无接缝
+    """
+    n = max(1, int(sample_rate * dur_ms / 1000.0))
+    if loop:
+        cycles = max(1, round(freq * n / sample_rate))
+        n = int(round(cycles * sample_rate / freq))
+    amp = 32767 * TONE_AMPLITUDE
+    fade = 0 if loop else max(1, min(int(sample_rate * FADE_S), n // 2))
+    step = freq / sample_rate
+
+    buf = array('h')
+    for i in range(n):
+        v = amp * wave_sample(waveform, (i * step) % 1.0)
+        if i < fade:
+            v *= i / fade
+        elif i >= n - fade:
+            v *= (n - i) / fade
+        s = int(v)
+        for _ in range(channels):
+            buf.append(s)
+    return buf
+
+
+class _TimerResolution:
+    """Windows 默认定时器粒度约 15.6ms，调度线程运行期间请求 1ms"""
     def __init__(self):
+        self._winmm = None
+        if sys.platform == 'win32':
+            try:
+                import ctypes
+                self._winmm = ctypes.WinDLL('winmm')
+            except OSError:
+                self._winmm = None
+
+    def __enter__(self):
+        if self._winmm:
+            self._winmm.timeBeginPeriod(1)
+        return self
+
+    def __exit__(self, *exc):
+        if self._winmm:
+            self._winmm.timeEndPeriod(1)
+
+
+class _ChunkRing:
+    """
+    流式模式的块缓冲: 预先创建 size 个等长的后端缓冲，轮流把新块写入
+
+    只会写入已经播放完的缓冲 (环的长度大于正在播放和已排队的数量)，整个过程不再分配内存。
+    """
+    def __init__(self, backend, size, nbytes):
+        self.slots = [backend.stream_buffer(nbytes) for _ in range(size)]
+        self.i = 0
+
+    def push(self, buf):
+        """写入一个块并返回承载它的声音"""
+        i = self.i
+        self.i = (i + 1) % len(self.slots)
+        return self.slots[i].write(buf)
+
+
+class SoundManager:
+    """
+    分级连续告警
+
+    独立的音频线程按预计算的 AlarmCurve 把危险程度 (当前值/限制值) 映射为
+    蜂鸣间隔、音高和音量: 越接近极限，蜂鸣越密、越高、越响；达到临界时为连续音。
+    轮询线程只需调用 update_alarm() 更新目标，不会被音频阻塞。
+
+    streaming=True (默认) 时由 AlarmSynth 持续合成相位连续的短块，通过
+    backend.queue() 无缝衔接，参数变化在块边界生效；False 时按曲线调度缓存好的
+    独立蜂鸣 (每次 play)。
+
+    输出经由 AudioBackend (见 core/audio_backend.py)，backend 可以是名称
+    (auto/pygame/winmm/null) 或后端实例。设备按需打开: 启用声音或出现告警时由
+    音频线程打开，连续 idle_suspend 秒没有告警 (或声音被禁用) 就关闭释放，
+    线程随之挂起不再唤醒。
+    """
+    def __init__(self, streaming=True, idle_suspend=IDLE_SUSPEND_S, backend="auto"):
+        self.backend = backend if isinstance(backend, AudioBackend) else create_backend(backend)
+        self.streaming = streaming
+        self.idle_suspend = idle_suspend
         self.enabled = False
         self.volume = 0.5
-        self.current_state = 0 # 0: None, 1: Warn, 2: Critical
-        
-        # 声音对象
-        self.snd_warn = None
-        self.snd_crit = None
-        
-        self.init_sound()
-        
-    def init_sound(self):
-        if not PYGAME_AVAILABLE:
-            return
-            
+        self.curve = AlarmCurve()
+
+        # 轮询线程写入、调度线程读取 (整体替换元组，无需加锁)
+        self._target = (LEVEL_NONE, 0.0)
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        # 设备状态只由音频线程修改
+        self.ready = False
+        self._sample_rate = SAMPLE_RATE
+        self._channels = 1
+        self._open_requested = False
+        self._open_failed = False
+        self.tones = ToneCache(self._build_tone)
+        self._prewarm_thread = None
+        self._prewarm_curve = None
+
+    def _ensure_thread(self):
+        if self.backend is not None and self._thread is None:
+            self._thread = threading.Thread(target=self._audio_loop, daemon=True)
+            self._thread.start()
+
+    def _open_device(self):
         try:
-            pygame.mixer.init()
-            
-            p_warn = resource_path(os.path.join("sounds", "beep_fast.wav"))
-            p_crit = resource_path(os.path.join("sounds", "beep_force_critical.wav"))
-            
-            if os.path.exists(p_warn):
-                self.snd_warn = pygame.mixer.Sound(p_warn)
-            
-            if os.path.exists(p_crit):
-                self.snd_crit = pygame.mixer.Sound(p_crit)
-                
-            print("音频系统初始化完成")
+            self._sample_rate, self._channels = self.backend.open(SAMPLE_RATE, MIXER_BUFFER)
         except Exception as e:
             print(f"音频初始化失败: {e}")
+            self._open_failed = True
+            return False
+        self.ready = True
+        if not self.streaming:
+            self._prewarm()
+        return True
+
+    def _close_device(self):
+        self.ready = False
+        # 声音对象依附于设备，关闭前先停掉预热并清空缓存
+        self.tones.cancel_prewarm()
+        if self._prewarm_thread is not None:
+            self._prewarm_thread.join()
+            self._prewarm_thread = None
+        self._prewarm_curve = None
+        self.tones.clear()
+        self.backend.close()
 
-    def update_settings(self, enabled, volume_percent):
+    def update_settings(self, enabled, volume_percent, warn_ratio=None, preset=None):
+        was_enabled = self.enabled
         self.enabled = enabled
         self.volume = max(0.0, min(1.0, volume_percent / 100.0))
-        
+
+        # 阈值或预设变化时重建曲线表 (整体替换，音频线程读到的总是完整的表)
+        start = self.curve.start if warn_ratio is None else warn_ratio
+        preset = self.curve.preset if preset is None else preset
+        if start != self.curve.start or preset != self.curve.preset:
+            self.curve = AlarmCurve(start, preset)
+
+        if enabled and not was_enabled:
+            # 启用时提前打开设备 (并预热)，首次告警不必等待初始化
+            self._open_failed = False
+            self._open_requested = True
+            self._ensure_thread()
+
         # 如果被禁用，立即停止所有声音
         if not self.enabled:
-            self.stop_all()
-            self.current_state = 0
-            
-        # 更新音量
-        if self.snd_warn: self.snd_warn.set_volume(self.volume)
-        if self.snd_crit: self.snd_crit.set_volume(self.volume)
+            self._target = (LEVEL_NONE, 0.0)
+        self._wake.set()
+
+    def update_alarm(self, level, ratio):
+        """
+        level: 0=静音, 1=警告 (按 ratio 分级蜂鸣), 2=临界 (连续音)
+        ratio: 最严重限制的 当前值/限制值
+        """
+        if not self.enabled:
+            return
+        old_level = self._target[0]
+        self._target = (level, ratio or 0.0)
+        if level != old_level:
+            self._wake.set()
 
     def stop_all(self):
-        if self.snd_warn: self.snd_warn.stop()
-        if self.snd_crit: self.snd_crit.stop()
+        self._target = (LEVEL_NONE, 0.0)
+        self._wake.set()
+
+    def stop(self):
+        """结束音频线程并释放设备 (程序退出时调用)"""
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    # ------------------------------------------------------------------
+    # 音频线程
+    # ------------------------------------------------------------------
+
+    def _build_tone(self, freq, dur_ms, waveform, sample_rate, loop):
+        data = make_tone_samples(freq, dur_ms, waveform, sample_rate, self._channels, loop).tobytes()
+        return self.backend.make_sound(data), len(data)
+
+    def _prewarm(self):
+        """后台合成当前曲线用到的所有声音，调度线程到点只需查缓存"""
+        curve, sr = self.curve, self._sample_rate
+        keys = [tone_key(curve.f_max, CONTINUOUS_MS, curve.waveform, sr, loop=True)]
+        keys += [tone_key(f, d, curve.waveform, sr) for f, d in curve.tones()]
+        keys += [tone_key(f, CUE_NOTE_MS, curve.waveform, sr) for f in CUE_FREQS]
+        if self._prewarm_thread is not None:
+            # 旧的预热在 prewarm() 中被取消，等它合成完手头的条目
+            self.tones.cancel_prewarm()
+            self._prewarm_thread.join()
+        self._prewarm_thread = self.tones.prewarm(keys)
+        self._prewarm_curve = curve
+
+    def _wants_device(self):
+        return self.enabled and (self._open_requested or self._target[0] != LEVEL_NONE)
 
-    def update_state(self, new_state):
+    def _audio_loop(self):
+        """外层: 按需打开设备，内层循环因空闲或禁用返回后关闭"""
+        while not self._stop_event.is_set():
+            if self._open_failed or not self._wants_device():
+                # 设备已关闭，直到设置变化或出现告警才唤醒
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            self._open_requested = False
+            if not self._open_device():
+                continue
+            with _TimerResolution():
+                if self.streaming:
+                    self._stream_loop()
+                else:
+                    self._scheduler_loop()
+            self._close_device()
+
+    def _idle_wait(self, idle_since):
         """
-        new_state: 0=Silent, 1=Warn(beep_fast), 2=Critical(beep_critical)
+        静音时等待唤醒
+
+        Returns:
+            False 表示应当返回并关闭设备 (声音被禁用、空闲超时或正在退出)
         """
-        if not self.enabled or not PYGAME_AVAILABLE:
-            return
+        if not self.enabled or self._stop_event.is_set():
+            return False
+        timeout = None
+        if self.idle_suspend:
+            timeout = idle_since + self.idle_suspend - time.perf_counter()
+            if timeout <= 0:
+                return False
+        if self._wake.wait(timeout):
+            self._wake.clear()
+        return True
+
+    def _get_tone(self, curve, freq, dur_ms, loop=False):
+        return self.tones.get(freq, dur_ms, curve.waveform, self._sample_rate, loop)
+
+    def _wait_until(self, deadline):
+        """
+        等待到 deadline (perf_counter)；粗等待最多 POLL_SLICE，最后 SPIN_MARGIN 忙等
+
+        Returns:
+            True 表示到达 deadline，False 表示中途被唤醒或需要重新读取目标
+        """
+        remaining = deadline - time.perf_counter()
+        if remaining > SPIN_MARGIN:
+            if self._wake.wait(min(remaining - SPIN_MARGIN, POLL_SLICE)):
+                self._wake.clear()
+                return False
+            if deadline - time.perf_counter() > SPIN_MARGIN:
+                return False
+        while time.perf_counter() < deadline:
+            time.sleep(0)
+        return True
+
+    def _silence(self):
+        if self.backend.busy():
+            self.backend.stop()
+
+    def _scheduler_loop(self):
+        last_beep = None  # 上一次蜂鸣的 perf_counter 时间
+        continuous_on = False
+        continuous_curve = None
+        cue_played = False
+        idle_since = time.perf_counter()
+
+        while not self._stop_event.is_set():
+            level, ratio = self._target
+            curve = self.curve
+            if curve is not self._prewarm_curve:
+                self._prewarm()
+
+            if not self.enabled or level == LEVEL_NONE:
+                if continuous_on or last_beep is not None or cue_played:
+                    self._silence()
+                    continuous_on = False
+                    last_beep = None
+                    cue_played = False
+                    idle_since = time.perf_counter()
+                if not self._idle_wait(idle_since):
+                    break
+                continue
+
+            if level == LEVEL_CUE:
+                # 提示音: 两个短音只播一次，之后等待目标变化
+                if not cue_played:
+                    self.backend.set_volume(self.volume * CUE_VOLUME)
+                    self.backend.play(self._get_tone(curve, CUE_FREQS[0], CUE_NOTE_MS))
+                    for freq in CUE_FREQS[1:]:
+                        self.backend.queue(self._get_tone(curve, freq, CUE_NOTE_MS))
+                    cue_played = True
+                    continuous_on = False
+                    last_beep = None
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            cue_played = False
+
+            if level == LEVEL_CRIT:
+                # 临界: 最高音连续播放
+                if not continuous_on or continuous_curve is not curve:
+                    sound = self._get_tone(curve, curve.f_max, CONTINUOUS_MS, loop=True)
+                    self.backend.set_volume(self.volume * curve.v_max)
+                    self.backend.play(sound, loops=-1)
+                    continuous_on = True
+                    continuous_curve = curve
+                else:
+                    self.backend.set_volume(self.volume * curve.v_max)
+                last_beep = None
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            if continuous_on:
+                self.backend.stop()
+                continuous_on = False
+
+            interval, freq, vol, dur_ms = curve.lookup(ratio)
+            # 等待之前先取出声音 (已预热，只是查表)，到点只需 play()
+            sound = self._get_tone(curve, freq, dur_ms)
+
+            now = time.perf_counter()
+            # 刚进入警告立即响；之后按当前间隔 (危险程度变化时随之缩放)
+            deadline = now if last_beep is None else last_beep + interval
+            if deadline > now and not self._wait_until(deadline):
+                continue
+
+            self.backend.set_volume(self.volume * vol)
+            self.backend.play(sound)
+            fired = time.perf_counter()
+            # 以计划时间为基准避免累积漂移，落后超过一个间隔时重新对齐
+            last_beep = deadline if fired - deadline < interval else fired
+
+        self._silence()
+
+    def _stream_loop(self):
+        synth = AlarmSynth(self._sample_rate, self._channels)
+        ring = _ChunkRing(self.backend, self.backend.queue_ahead + STREAM_RING_SPARE,
+                          len(synth.buf) * synth.buf.itemsize)
+        # 队列空出后最迟这么久补上下一块 (远小于一个块的时长)
+        slice_s = synth.chunk_s / 4
+        streaming = False
+        idle_since = time.perf_counter()
+
+        def next_chunk():
+            level, ratio = self._target
+            if not self.enabled:
+                level = LEVEL_NONE
+            if not synth.render(self.curve, level, ratio, self.volume):
+                return None
+            return ring.push(synth.buf)
+
+        while not self._stop_event.is_set():
+            if not streaming:
+                if not self.enabled or self._target[0] == LEVEL_NONE:
+                    if not self._idle_wait(idle_since):
+                        break
+                    continue
+                # 从静音开始: 第一块立即播放，第二块排队
+                synth.reset()
+                sound = next_chunk()
+                if sound is None:
+                    continue
+                self.backend.set_volume(1.0)
+                self.backend.play(sound)
+                streaming = True
 
-        if new_state == self.current_state:
-            return # 状态未变
-            
-        # 状态改变，先停止旧的
-        self.stop_all()
-        
-        if new_state == 1:
-            if self.snd_warn: self.snd_warn.play(loops=-1)
-        elif new_state == 2:
-            if self.snd_crit: self.snd_crit.play(loops=-1)
-            
-        self.current_state = new_state
+            if not self.backend.queued():
+                sound = next_chunk()
+                if sound is None:
+                    # 已淡出到静音，让剩余的块自然播完
+                    streaming = False
+                    idle_since = time.perf_counter()
+                    continue
+                if self.backend.busy():
+                    self.backend.queue(sound)
+                else:
+                    # 线程被耽搁导致断流，直接重新开始
+                    self.backend.play(sound)
+                continue
 
+            if self._wake.wait(slice_s):
+                self._wake.clear()
 
+        self._silence()
@@ -13,7 +13,12 @@ def get_telemetry():
         'airbrake': None,
         'throttle_in': None,  # 输入
         'throttle_out': None,  # 输出
-        'wing_sweep': None  # 可变后掠翼位置 (0.0=展开, 1.0=后掠)
+        'wing_sweep': None,  # 可变后掠翼位置 (0.0=展开, 1.0=后掠)
+        'gear': None,  # 起落架放下程度 %
+        'flaps': None,  # 襟翼放下程度 %
+        'ny': None,  # 法向过载 G
+        'aoa': None,  # 迎角 deg
+        'fuel_kg': None  # 剩余燃油 kg
     }
     
     try:
@@ -71,6 +76,27 @@ def get_telemetry():
                     t_out = state.get('throttle 1, %')
                     if t_out is not None:
                         data['throttle_out'] = int(t_out)
+
+                    # 结构限制相关 (起落架/襟翼/过载/迎角/燃油)
+                    gear_val = state.get('gear, %')
+                    if gear_val is not None:
+                        data['gear'] = float(gear_val)
+
+                    flaps_val = state.get('flaps, %')
+                    if flaps_val is not None:
+                        data['flaps'] = float(flaps_val)
+
+                    ny_val = state.get('Ny')
+                    if ny_val is not None:
+                        data['ny'] = float(ny_val)
+
+                    aoa_val = state.get('AoA, deg')
+                    if aoa_val is not None:
+                        data['aoa'] = float(aoa_val)
+
+                    fuel_val = state.get('Mfuel, kg')
+                    if fuel_val is not None:
+                        data['fuel_kg'] = float(fuel_val)
     except:
         pass
         
@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+
+# 频率量化步长 (Hz)，相近的频率共用同一段波形
+FREQ_STEP = 10
+# 缓存上限 (字节，按 PCM 数据计)，单张曲线表量化后约 0.7MB (单声道)，可同时容纳切换前后的几张表
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+
+
+def tone_key(freq, dur_ms, waveform, sample_rate, loop=False):
+    """量化后的缓存键: (频率, 时长 ms, 波形, 采样率, 是否循环)"""
+    freq = max(FREQ_STEP, int(round(freq / FREQ_STEP)) * FREQ_STEP)
+    return (freq, int(round(dur_ms)), waveform, int(sample_rate), bool(loop))
+
+
+class ToneCache:
+    """
+    合成音的 LRU 缓存
+
+    builder(freq, dur_ms, waveform, sample_rate, loop) -> (sound, nbytes)
+    负责实际合成；缓存按量化键保存结果，总字节数超过 max_bytes 时淘汰最久未用的条目。
+    合成在锁外进行，预热线程合成时不会阻塞调度线程查表。
+    """
+    def __init__(self, builder, max_bytes=DEFAULT_MAX_BYTES):
+        self.builder = builder
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (sound, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._prewarm_gen = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def peek(self, key):
+        """只查缓存，不合成 (未命中返回 None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def get(self, freq, dur_ms, waveform, sample_rate, loop=False):
+        """取出 (必要时合成) 对应的声音"""
+        key = tone_key(freq, dur_ms, waveform, sample_rate, loop)
+        sound = self.peek(key)
+        if sound is not None:
+            self.hits += 1
+            return sound
+        self.misses += 1
+        return self._build(key)
+
+    def _build(self, key):
+        freq, dur_ms, waveform, sample_rate, loop = key
+        sound, nbytes = self.builder(freq, dur_ms, waveform, sample_rate, loop)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (sound, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+        return sound
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def cancel_prewarm(self):
+        """放弃进行中的预热 (当前条目合成完后退出)"""
+        with self._lock:
+            self._prewarm_gen += 1
+
+    def prewarm(self, keys):
+        """
+        后台线程依次合成 keys 中尚未缓存的条目
+
+        再次调用 (例如曲线变化) 时旧的预热任务会在下一个条目前放弃。
+        Returns:
+            预热线程
+        """
+        with self._lock:
+            self._prewarm_gen += 1
+            gen = self._prewarm_gen
+
+        def run():
+            for key in keys:
+                if self._prewarm_gen != gen:
+                    return
+                if self.peek(key) is None:
+                    self._build(key)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
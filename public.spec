@@ -11,7 +11,7 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=['test_features'],  # !!! 关键：排除敏感模块 !!!
+    excludes=['test_features', 'numpy'],  # !!! 关键：排除敏感模块 !!! (numpy 只用于离线读取飞行记录)
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+告警延迟基准: 从 update_data_loop 判定超过阈值到声音真正开始输出的时间
+
+用合成的遥测帧按 update_rate 驱动 LimitEngine.evaluate() -> AlertStateMachine ->
+AlertScheduler.post()/tick() -> SoundManager.update_alarm() (与 ui/overlay.py 的轮询循环相同)，
+IAS 以恒定加速度穿过警告阈值。每次试验记录:
+    判定:   穿越阈值的那一帧从 evaluate() 到 post()/tick() 返回 (含调度器选出告警并交给 sink)
+    play:   到音频线程第一次调用后端 play()/queue()
+    出声:   到混音器输出中出现第一个非静音样本 (SDL disk 驱动，见下)
+
+pygame 运行在 SDL 的 disk 音频驱动下: SDL 的音频线程每混好一个缓冲就写入
+SDL_DISKAUDIOFILE 并按缓冲时长休眠，后台线程追踪该文件即可得到样本离开混音器的
+时间 (真实声卡还要再加上驱动/硬件缓冲)。dummy 驱动不产生输出，只能测到 play。
+每个 (缓冲大小, 告警模式) 在独立子进程中运行。
+
+使用方法:
+    python bench_alert_latency.py                               # 默认: 缓冲 256/512/1024/2048, stream 和 beep
+    python bench_alert_latency.py --buffers 512 --trials 200
+    python bench_alert_latency.py --driver dummy                # 只测到 play()
+    python bench_alert_latency.py --backend null                # 不需要 pygame，只测告警路径本身
+    python bench_alert_latency.py --json latency.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+from array import array
+from typing import Dict, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子进程输出结果行的前缀
+RESULT_PREFIX = "BENCH_RESULT "
+
+MODES = ("stream", "beep")
+BUFFERS = (256, 512, 1024, 2048)
+SAMPLE_RATE = 44100
+
+# 输出中绝对值超过该值的样本视为有声
+ONSET_THRESHOLD = 64
+# 每次试验等待出声的上限 (s)
+TRIAL_TIMEOUT = 1.0
+# 两次试验之间至少保持的静音时间 (s)
+SETTLE_S = 0.3
+
+
+# ============================================================================
+# 计时
+# ============================================================================
+
+def _make_timed_backend(inner, buffer_samples):
+    """包装后端: 记录 play/queue/stop 的调用时间，并强制使用指定的缓冲大小"""
+    from core.audio_backend import AudioBackend
+
+    class TimedBackend(AudioBackend):
+        name = inner.name
+        queue_ahead = inner.queue_ahead
+
+        def __init__(self):
+            self.calls = []  # [(perf_counter, op)]
+            self.opened = threading.Event()
+
+        def open(self, sample_rate, _buffer_samples):
+            result = inner.open(sample_rate, buffer_samples)
+            self.opened.set()
+            return result
+
+        def close(self):
+            inner.close()
+
+        def make_sound(self, data):
+            return inner.make_sound(data)
+
+        def stream_buffer(self, nbytes):
+            return inner.stream_buffer(nbytes)
+
+        def play(self, sound, loops=0):
+            inner.play(sound, loops)
+            self.calls.append((time.perf_counter(), "play"))
+
+        def queue(self, sound):
+            inner.queue(sound)
+            self.calls.append((time.perf_counter(), "queue"))
+
+        def stop(self):
+            inner.stop()
+            self.calls.append((time.perf_counter(), "stop"))
+
+        def set_volume(self, volume):
+            inner.set_volume(volume)
+
+        def busy(self):
+            return inner.busy()
+
+        def queued(self):
+            return inner.queued()
+
+        def first_call_after(self, t, ops=("play", "queue")):
+            found = None
+            for ts, op in reversed(self.calls):
+                if ts < t:
+                    break
+                if op in ops:
+                    found = ts
+            return found
+
+    return TimedBackend()
+
+
+class OutputProbe:
+    """
+    追踪 SDL disk 驱动写出的 PCM 文件，记录每段有声输出开始的时间
+
+    arm() 之后第一次读到非静音样本的时间记为 onset；last_sound 为最近一次读到
+    非静音样本的时间，用于在试验之间确认已经静音。
+    """
+    def __init__(self, path):
+        self.path = path
+        self.onset = None
+        self.last_sound = 0.0
+        self.bytes_read = 0
+        self._armed = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+
+    def arm(self):
+        self.onset = None
+        self._armed = True
+
+    def _run(self):
+        while not os.path.exists(self.path) and not self._stop.is_set():
+            time.sleep(0.001)
+        rest = b""
+        samples = array('h')
+        with open(self.path, "rb") as f:
+            while not self._stop.is_set():
+                chunk = f.read()
+                if not chunk:
+                    time.sleep(0.0005)
+                    continue
+                now = time.perf_counter()
+                self.bytes_read += len(chunk)
+                chunk = rest + chunk
+                usable = len(chunk) & ~1
+                rest = chunk[usable:]
+                del samples[:]
+                samples.frombytes(chunk[:usable])
+                if samples and max(max(samples), -min(samples)) > ONSET_THRESHOLD:
+                    self.last_sound = now
+                    if self._armed:
+                        self.onset = now
+                        self._armed = False
+
+
+def _percentiles(values: List[float]) -> Optional[Dict]:
+    if not values:
+        return None
+    v = sorted(values)
+
+    def pct(p):
+        return v[min(len(v) - 1, int(round(p / 100.0 * (len(v) - 1))))]
+    return {
+        "n": len(v),
+        "mean": round(sum(v) / len(v), 2),
+        "p50": round(pct(50), 2),
+        "p90": round(pct(90), 2),
+        "p99": round(pct(99), 2),
+        "max": round(v[-1], 2),
+    }
+
+
+# ============================================================================
+# 子进程: 单个 (缓冲, 模式)
+# ============================================================================
+
+def run_worker(spec: Dict):
+    """在当前进程运行一组试验，结果以 RESULT_PREFIX 开头的一行 JSON 输出"""
+    workdir = spec["workdir"]
+    raw_path = os.path.join(workdir, f"out_{spec['buffer']}_{spec['mode']}.raw")
+    if spec["backend"] == "pygame":
+        # 必须在导入 pygame 之前设置
+        os.environ["SDL_AUDIODRIVER"] = spec["driver"]
+        os.environ["SDL_DISKAUDIOFILE"] = raw_path
+
+    sys.path.insert(0, ROOT_DIR)
+    from core.fm_db import FM_DB
+    from core.limit_engine import LimitEngine, AlertStateMachine
+    from core.alert_scheduler import AlertScheduler, limit_priority
+    from core.audio_backend import BACKENDS
+    from core.sound_manager import SoundManager
+
+    backend_cls = BACKENDS[spec["backend"]]
+    if not backend_cls.available:
+        print(f"后端 {spec['backend']} 不可用")
+        return
+    backend = _make_timed_backend(backend_cls(), spec["buffer"])
+
+    fm_db = FM_DB()
+    engine = LimitEngine()
+    alert_state = AlertStateMachine()
+    plane = spec["plane"]
+    vne = fm_db.get_limit(plane)
+    if not vne:
+        print(f"找不到 {plane} 的 Vne")
+        return
+    warn = spec["warn"]
+
+    mgr = SoundManager(streaming=spec["mode"] == "stream", idle_suspend=0, backend=backend)
+    mgr.update_settings(True, 50, warn, spec["preset"])
+    alerts = AlertScheduler(mgr.update_alarm)
+    if not backend.opened.wait(5.0):
+        print("音频设备打开超时")
+        return
+
+    probe = None
+    if spec["backend"] == "pygame" and spec["driver"] == "disk":
+        probe = OutputProbe(raw_path)
+        probe.start()
+    # 等待预热和设备进入稳定状态
+    time.sleep(1.0)
+
+    tick = 1.0 / spec["rate"]
+    step = spec["accel"] * tick
+    data = {
+        'running': True, 'army': 'air', 'type': plane,
+        'ias_kmh': None, 'tas_kmh': None, 'altitude': None, 'mach': None,
+        'airbrake': None, 'throttle_in': None, 'throttle_out': None,
+        'wing_sweep': None, 'gear': None, 'flaps': None,
+        'ny': None, 'aoa': None, 'fuel_kg': None,
+    }
+
+    eval_ms, play_ms, onset_ms = [], [], []
+    missed = 0
+    for _ in range(spec["trials"]):
+        # 从阈值下方一个随机位置开始，穿越时刻相对混音器缓冲的相位随机
+        ias = vne * (warn - 0.003 - random.random() * step / vne)
+        if probe is not None:
+            probe.arm()
+        t_cross = t_notify = None
+        next_tick = time.perf_counter()
+        deadline = None
+        while True:
+            now = time.perf_counter()
+            if now < next_tick:
+                time.sleep(next_tick - now)
+            next_tick += tick
+
+            data['ias_kmh'] = ias
+            t0 = time.perf_counter()
+            limits = engine.evaluate(fm_db, data, warn)
+            level = alert_state.update(limits)
+            alerts.post('limit', limit_priority(level), level, limits['ratio'])
+            alerts.tick()
+            if t_cross is None and level > 0:
+                t_cross, t_notify = t0, time.perf_counter()
+                deadline = t_cross + TRIAL_TIMEOUT
+            ias += step
+
+            if t_cross is not None:
+                played = backend.first_call_after(t_cross) is not None
+                heard = probe is None or probe.onset is not None
+                if (played and heard) or time.perf_counter() > deadline:
+                    break
+
+        t_play = backend.first_call_after(t_cross)
+        eval_ms.append((t_notify - t_cross) * 1000)
+        if t_play is None:
+            missed += 1
+        else:
+            play_ms.append((t_play - t_cross) * 1000)
+        if probe is not None:
+            if probe.onset is None:
+                missed += 1
+            else:
+                onset_ms.append((probe.onset - t_cross) * 1000)
+
+        # 回到静音，等输出确实安静下来再开始下一次
+        alert_state.reset()
+        alerts.clear_all()
+        time.sleep(SETTLE_S)
+        if probe is not None:
+            while time.perf_counter() - probe.last_sound < SETTLE_S:
+                time.sleep(0.01)
+        time.sleep(random.random() * tick)
+
+    mgr.stop()
+    if probe is not None:
+        probe.stop()
+
+    result = dict(spec)
+    result.pop("workdir")
+    result.update({
+        "buffer_ms": round(spec["buffer"] * 1000.0 / SAMPLE_RATE, 1),
+        "missed": missed,
+        "eval_ms": _percentiles(eval_ms),
+        "play_ms": _percentiles(play_ms),
+        "onset_ms": _percentiles(onset_ms),
+    })
+    print(RESULT_PREFIX + json.dumps(result, ensure_ascii=False), flush=True)
+
+
+# ============================================================================
+# 运行器
+# ============================================================================
+
+def run_case(spec: Dict, verbose: bool = False) -> Optional[Dict]:
+    """在子进程中运行一组试验 (每个缓冲大小需要重新初始化 SDL 音频)"""
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", json.dumps(spec)],
+        stdout=subprocess.PIPE, stderr=None if verbose else subprocess.DEVNULL,
+        text=True, encoding="utf-8", errors="replace"
+    )
+    result = None
+    output = []
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            result = json.loads(line[len(RESULT_PREFIX):])
+        else:
+            output.append(line)
+    if verbose or result is None:
+        for line in output:
+            print("    " + line)
+    if result is None:
+        print(f"  子进程失败 (退出码 {proc.returncode})")
+    return result
+
+
+def _fmt_dist(dist: Optional[Dict]) -> str:
+    if dist is None:
+        return f"{'n/a':>20}"
+    return f"{dist['p50']:>6.1f} {dist['p90']:>6.1f} {dist['max']:>6.1f}"
+
+
+def print_table(results: List[Dict]):
+    header = (f"{'模式':<7} {'缓冲':>6} {'ms':>5} {'次数':>5} {'丢失':>4} "
+              f"{'判定 p50':>8} | {'play p50    p90    max':>20} | {'出声 p50    p90    max':>20}")
+    print("\n" + header)
+    print("-" * len(header))
+    for r in results:
+        n = r["play_ms"]["n"] if r["play_ms"] else 0
+        ev = r["eval_ms"]["p50"] if r["eval_ms"] else None
+        print(f"{r['mode']:<7} {r['buffer']:>6} {r['buffer_ms']:>5} {n:>5} {r['missed']:>4} "
+              f"{'n/a' if ev is None else format(ev, '.2f'):>8} | {_fmt_dist(r['play_ms'])} | "
+              f"{_fmt_dist(r['onset_ms'])}")
+    print("\n单位 ms，从穿越阈值的那一帧开始计时")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="告警延迟基准 (阈值判定 -> 声音输出)",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--buffers", default=",".join(str(b) for b in BUFFERS),
+                        help=f"混音器缓冲大小 (样本)，逗号分隔 (默认 {','.join(str(b) for b in BUFFERS)})")
+    parser.add_argument("--modes", default=",".join(MODES),
+                        help=f"告警模式，逗号分隔 (默认 {','.join(MODES)})")
+    parser.add_argument("--trials", type=int, default=50, help="每组试验次数 (默认 50)")
+    parser.add_argument("--backend", choices=("pygame", "winmm", "null"), default="pygame",
+                        help="音频后端 (默认 pygame)")
+    parser.add_argument("--driver", choices=("disk", "dummy"), default="disk",
+                        help="SDL 音频驱动 (默认 disk，可测到实际出声)")
+    parser.add_argument("--rate", type=float, default=30, help="轮询频率 Hz (默认 30，同 update_rate)")
+    parser.add_argument("--accel", type=float, default=30.0, help="IAS 增加速度 km/h/s (默认 30)")
+    parser.add_argument("--plane", default="a-10a_early", help="机型 (默认 a-10a_early)")
+    parser.add_argument("--warn", type=float, default=0.97, help="警告阈值 (默认 0.97)")
+    parser.add_argument("--preset", default="normal", help="告警曲线预设 (默认 normal)")
+    parser.add_argument("--json", metavar="PATH", help="将结果保存为 JSON")
+    parser.add_argument("--verbose", action="store_true", help="显示子进程输出")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(json.loads(args.worker))
+        return
+
+    modes = [m for m in args.modes.split(",") if m]
+    for m in modes:
+        if m not in MODES:
+            parser.error(f"未知的告警模式: {m}")
+    buffers = [int(b) for b in args.buffers.split(",") if b]
+    if args.backend != "pygame":
+        # 只有 pygame 后端使用缓冲大小
+        buffers = buffers[:1]
+
+    workdir = tempfile.mkdtemp(prefix="bench_alert_latency_")
+    results = []
+    try:
+        for buffer in buffers:
+            for mode in modes:
+                spec = {
+                    "backend": args.backend,
+                    "driver": args.driver,
+                    "buffer": buffer,
+                    "mode": mode,
+                    "trials": args.trials,
+                    "rate": args.rate,
+                    "accel": args.accel,
+                    "plane": args.plane,
+                    "warn": args.warn,
+                    "preset": args.preset,
+                    "workdir": workdir,
+                }
+                print(f"运行: {args.backend}/{args.driver} 缓冲 {buffer} / {mode}")
+                result = run_case(spec, verbose=args.verbose)
+                if result is not None:
+                    results.append(result)
+    finally:
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        os.rmdir(workdir)
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,9 +14,13 @@ from config import (
 )
 from core.telemetry import get_telemetry
 from core.fm_db import FM_DB
+from core.limit_engine import LimitEngine, AlertStateMachine
+from core.alert_scheduler import AlertScheduler, limit_priority, PRIORITY_CUE, CUE_TTL, LEVEL_CUE
+from core.fm_watcher import FMWatcher
 from core.sound_manager import SoundManager
 from core.exp_telemetry import ExpTelemetry, get_ui_patcher
 from utils.logger import CSVLogger
+from utils.flight_record import FlightRecorder
 
 class ToolTip:
     """简单的工具提示控件"""
@@ -215,12 +219,12 @@ class SettingsWindow:
         ToolTip(lbl_warn, "推荐97 98")
         
         self.scale_warn_pct = tk.Scale(row_w, from_=70, to=100, resolution=0.1, orient=tk.HORIZONTAL, length=120, showvalue=0)
-        self.scale_warn_pct.set(self.cfg.get('warn_percent', 90))
+        self.scale_warn_pct.set(self.cfg.get('warn_percent', DEFAULT_CONFIG['warn_percent']))
         self.scale_warn_pct.pack(side=tk.RIGHT, padx=5)
         self.scale_warn_pct.configure(command=self.on_scale_change)
         
         self.entry_warn_pct = tk.Entry(row_w, width=5)
-        self.entry_warn_pct.insert(0, f"{self.cfg.get('warn_percent', 90):.1f}")
+        self.entry_warn_pct.insert(0, f"{self.cfg.get('warn_percent', DEFAULT_CONFIG['warn_percent']):.1f}")
         self.entry_warn_pct.pack(side=tk.RIGHT)
         self.entry_warn_pct.bind('<FocusOut>', self.on_warn_entry_change)
         self.entry_warn_pct.bind('<Return>', self.on_warn_entry_change)
@@ -238,6 +242,13 @@ class SettingsWindow:
         self.scale_vol = tk.Scale(row_vol, from_=0, to=100, orient=tk.HORIZONTAL, length=150)
         self.scale_vol.set(self.cfg.get('sound_volume', 50))
         self.scale_vol.pack(side=tk.RIGHT)
+        
+        row_preset = tk.Frame(group_snd)
+        row_preset.pack(fill=tk.X, pady=2)
+        tk.Label(row_preset, text="告警曲线:").pack(side=tk.LEFT)
+        self.var_alarm_preset = tk.StringVar(value=self.cfg.get('alarm_preset', 'normal'))
+        for text, preset in [("柔和", "gentle"), ("标准", "normal"), ("激进", "aggressive")]:
+            tk.Radiobutton(row_preset, text=text, variable=self.var_alarm_preset, value=preset).pack(side=tk.LEFT, padx=2)
 
         # --- 分组 3: 系统设置 ---
         group_sys = tk.LabelFrame(self.tab_func, text="系统性能", padx=5, pady=5)
@@ -372,6 +383,7 @@ class SettingsWindow:
             
             self.var_snd_enable.set(self.cfg['enable_sound'])
             self.scale_vol.set(self.cfg['sound_volume'])
+            self.var_alarm_preset.set(self.cfg.get('alarm_preset', 'normal'))
             
             # Restore experimental vars
             if hasattr(self, 'var_exp_telemetry'):
@@ -417,6 +429,7 @@ class SettingsWindow:
         
         new_snd_enable = self.var_snd_enable.get()
         new_vol = self.scale_vol.get()
+        new_alarm_preset = self.var_alarm_preset.get()
         
         # Experimental features
         new_exp_telemetry = self.cfg.get('exp_telemetry_enabled', False)
@@ -458,6 +471,7 @@ class SettingsWindow:
         
         self.cfg['enable_sound'] = new_snd_enable
         self.cfg['sound_volume'] = new_vol
+        self.cfg['alarm_preset'] = new_alarm_preset
         
         self.cfg['exp_telemetry_enabled'] = new_exp_telemetry
         self.cfg['exp_input_enabled'] = new_exp_input
@@ -480,22 +494,45 @@ class OverlayApp:
         self.root.title("WT Speed Monitor")
         
         self.fm_db = FM_DB()
-        self.sound_mgr = SoundManager()
+        self.limit_engine = LimitEngine()
+        self.alert_state = AlertStateMachine()
+        # 轮询线程最近一次调度给 update_text 的 (文字, 颜色, 录制状态)，未变化时不再调度
+        self._scheduled = None
+        # 监视 FM 数据文件，update_fm.py 更新后无需重启
+        self.fm_watcher = FMWatcher(self.on_fm_db_reloaded)
+        self.fm_watcher.start()
+        
+        self.cfg = load_config()
+        self.sound_mgr = SoundManager(
+            streaming=self.cfg.get('alarm_streaming', True),
+            idle_suspend=self.cfg.get('audio_idle_suspend', 30),
+            backend=self.cfg.get('audio_backend', 'auto')
+        )
+        # 所有告警源经由优先级调度器输出到同一个声音通道
+        self.alerts = AlertScheduler(self.sound_mgr.update_alarm)
         
         # Initialize ExpTelemetry (Experiment Manager)
         self.exp_mgr = ExpTelemetry()
         
-        self.logger = CSVLogger()
+        if self.cfg.get('log_format', 'csv') == 'binary':
+            self.logger = FlightRecorder(self.limit_engine, self.cfg.get('log_compress', True))
+        else:
+            self.logger = CSVLogger()
         self.is_logging_enabled = False
         self.debug_mode_unlocked = False
         self.click_count = 0
         self.last_click_time = 0
         
-        self.cfg = load_config()
         self.current_handle_size = self.cfg.get('handle_size', 20)
         
         # Apply initial settings
-        self.sound_mgr.update_settings(self.cfg.get('enable_sound', False), self.cfg.get('sound_volume', 50))
+        self.sound_mgr.update_settings(
+            self.cfg.get('enable_sound', False),
+            self.cfg.get('sound_volume', 50),
+            self.cfg.get('warn_percent', DEFAULT_CONFIG['warn_percent']) / 100.0,
+            self.cfg.get('alarm_preset', 'normal')
+        )
+        self.apply_alert_settings()
         
         # Update Exp settings
         self.exp_mgr.update_settings(
@@ -587,8 +624,18 @@ class OverlayApp:
             return
         self.setting_win_ref = SettingsWindow(self)
 
+    def apply_alert_settings(self):
+        """临界判定和告警滞回参数"""
+        self.limit_engine.set_margins(
+            self.cfg.get('crit_speed_pct', 99.2) / 100.0,
+            self.cfg.get('crit_mach_margin', 0.02)
+        )
+        self.alert_state.exit_margin = self.cfg.get('alert_exit_margin_pct', 0.5) / 100.0
+        self.alert_state.min_dwell = self.cfg.get('alert_min_dwell_ms', 300) / 1000.0
+
     def apply_ui_update(self):
         # Called when settings change
+        self._scheduled = None
         self.label.config(font=(FONT_NAME, self.cfg['font_size'], "bold"), fg=self.cfg['font_color'])
         
         # 重绘圆球以适应新尺寸
@@ -638,7 +685,14 @@ class OverlayApp:
         self.canvas.bind("<ButtonRelease-1>", self.stop_move)
         self.canvas.bind("<Button-3>", self.show_context_menu)
         
-        self.sound_mgr.update_settings(self.cfg['enable_sound'], self.cfg['sound_volume'])
+        self.sound_mgr.update_settings(
+            self.cfg['enable_sound'],
+            self.cfg['sound_volume'],
+            self.cfg['warn_percent'] / 100.0,
+            self.cfg.get('alarm_preset', 'normal')
+        )
+        self.apply_alert_settings()
+        self.alerts.refresh()
         
         # Update Exp settings
         self.exp_mgr.update_settings(self.cfg['exp_telemetry_enabled'], self.cfg['exp_input_enabled'])
@@ -706,6 +760,7 @@ class OverlayApp:
         """恢复窗口并置顶"""
         # 1. 恢复显示 (deiconify)
         self.root.deiconify()
+        self._scheduled = None  # 隐藏期间 update_text 不更新控件，恢复后重新调度
         
         # 2. 尝试置顶操作，以确保它浮在最上面
         # lift() 提升窗口层级
@@ -730,8 +785,14 @@ class OverlayApp:
     def hide_window(self):
         self.root.withdraw()
 
+    def on_fm_db_reloaded(self, new_db):
+        """FMWatcher 回调 (后台线程): 原子替换数据库引用"""
+        self.fm_db = new_db
+
     def quit_app(self, icon=None, item=None):
         self.is_running = False
+        self.fm_watcher.stop()
+        self.sound_mgr.stop()
         if self.logger:
             self.logger.stop_session()
         if hasattr(self, 'icon'):
@@ -744,6 +805,7 @@ class OverlayApp:
     def reset_position(self, icon=None, item=None):
         def _reset():
             self.root.deiconify()
+            self._scheduled = None
             self.root.geometry(f"+{int(DEFAULT_CONFIG['x'])}+{int(DEFAULT_CONFIG['y'])}")
             self.cfg['x'] = DEFAULT_CONFIG['x']
             self.cfg['y'] = DEFAULT_CONFIG['y']
@@ -821,6 +883,8 @@ class OverlayApp:
     def update_data_loop(self):
         while self.is_running:
             data = get_telemetry()
+            # 每个 tick 只读取一次引用，热重载替换不会影响本 tick
+            fm_db = self.fm_db
             
             # --- Config Values ---
             prefix = self.cfg.get('text_prefix', "IAS: ")
@@ -830,7 +894,7 @@ class OverlayApp:
             
             base_color = self.cfg.get('font_color', '#00FF00')
             warn_color = self.cfg.get('warn_color', '#FF0000')
-            warn_percent = self.cfg.get('warn_percent', 90) / 100.0
+            warn_percent = self.cfg.get('warn_percent', DEFAULT_CONFIG['warn_percent']) / 100.0
             
             # --- Visibility Logic ---
             should_show = True
@@ -841,6 +905,7 @@ class OverlayApp:
             display_text = ""
             final_color = base_color
             snd_state = 0
+            limits = None
             
             if data['ias_kmh'] is not None:
                 val_kmh = data['ias_kmh']
@@ -859,30 +924,11 @@ class OverlayApp:
                     
                 display_text = f"{prefix}{int(val_disp)}{suffix}"
                 
-                wing_sweep = data.get('wing_sweep')
-                limit_kmh = self.fm_db.get_limit(data['type'], wing_sweep)
-                limit_mach = self.fm_db.get_mach_limit(data['type'], wing_sweep)
-                
-                is_warn_ui = False
-                
-                if limit_kmh:
-                    if val_kmh >= limit_kmh * warn_percent:
-                        is_warn_ui = True
-                        snd_state = 1
-
-                is_crit = False
-                if limit_kmh:
-                    if val_kmh >= limit_kmh * 0.992:
-                        is_crit = True
-                if limit_mach and data['mach'] is not None:
-                    if data['mach'] >= limit_mach - 0.02:
-                        is_crit = True
-
-                if is_crit:
-                    is_warn_ui = True
-                    snd_state = 2
-
-                if is_warn_ui:
+                # 所有结构限制一次遍历，取最严重者；等级经过滞回过滤
+                limits = self.limit_engine.evaluate(fm_db, data, warn_percent)
+                snd_state = self.alert_state.update(limits)
+
+                if snd_state > 0:
                     final_color = warn_color
             else:
                 if data['running'] and data['army'] == 'air':
@@ -890,32 +936,36 @@ class OverlayApp:
                 else:
                     display_text = f"{prefix}?"
             
-            if not (data['running'] and data['army'] == 'air'):
+            if not (data['running'] and data['army'] == 'air') or limits is None:
                  snd_state = 0
+                 self.alert_state.reset()
             
-            self.sound_mgr.update_state(snd_state)
+            self.alerts.post('limit', limit_priority(snd_state), snd_state,
+                             limits['ratio'] if limits else 0.0)
 
             ab_result = None # Store result for logging
 
             if data['running'] and data['army'] == 'air':
-                wing_sweep = data.get('wing_sweep')
-                limit_kmh = self.fm_db.get_limit(data['type'], wing_sweep)
-                limit_mach = self.fm_db.get_mach_limit(data['type'], wing_sweep)
-                
                 if data['ias_kmh'] is not None:
                     ab_result = self.exp_mgr.update(
                         ias_kmh=data['ias_kmh'],
                         mach=data['mach'],
-                        limit_kmh=limit_kmh,
-                        limit_mach=limit_mach,
+                        limit_kmh=limits['limit_kmh'],
+                        limit_mach=limits['limit_mach'],
                         ab_pct=data['airbrake'],
                         trigger_pct=self.cfg.get('ab_trigger_pct', 99.7),
                         exit_pct=self.cfg.get('ab_exit_pct', 95.0)
                     )
 
+            # 实验功能执行动作时给一个短提示音 (低于结构告警，过时即丢弃)
+            if ab_result and ab_result.get('did_action'):
+                self.alerts.post('exp', PRIORITY_CUE, LEVEL_CUE,
+                                 ttl=CUE_TTL, start_within=CUE_TTL)
+            self.alerts.tick()
+
             # Debug Logging
             if self.is_logging_enabled and data['running'] and data['army'] == 'air':
-                self.logger.log_step(data, ab_result)
+                self.logger.log_step(data, ab_result, limits)
 
             if self.cfg.get('hide_text', False):
                 display_text = ""
@@ -923,10 +973,13 @@ class OverlayApp:
             if not should_show:
                 display_text = ""
             
-            try:
-                self.root.after(0, self.update_text, display_text, final_color)
-            except:
-                break
+            shown = (display_text, final_color, self.is_logging_enabled)
+            if shown != self._scheduled:
+                try:
+                    self.root.after(0, self.update_text, display_text, final_color)
+                except:
+                    break
+                self._scheduled = shown
             
             rate = self.cfg.get('update_rate', 30)
             if rate <= 0: rate = 1
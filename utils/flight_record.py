@@ -0,0 +1,575 @@
+"""
+二进制飞行记录 (.wtrec)
+
+CSV 日志每个值都是文本，60Hz 的长时间记录体积大、重新载入慢。记录文件改为
+定宽类型的列式存储，按块写入，可选 zlib 压缩；文件头记录机型及其解析出的限制值。
+
+文件布局 (小端):
+    文件头   8s 魔数 | u32 版本 | u32 JSON 长度 | JSON (空格补齐到 8 字节)
+    块 * N   4s 'CHNK' | u32 行数 | u32 编码 | u32 存储长度 | u32 原始长度 | u32 新字符串长度
+             | 列数据 (按 COLUMNS 顺序，每列补齐到 8 字节；压缩时整体 zlib)
+             | 新字符串 JSON 列表 (不压缩) | 补齐到 8 字节
+
+字符串列 (实验动作、限制类型等) 存为 u16 编号，编号表在各块中追加，0 为空。
+块写完才算有效，写入中途崩溃时读取方忽略末尾不完整的块。
+
+使用方法:
+    python -m utils.flight_record info logs/log_xxx.wtrec
+    python -m utils.flight_record to-csv logs/log_xxx.wtrec [-o out.csv]
+    python -m utils.flight_record from-csv logs/log_xxx.csv [-o out.wtrec] [--aircraft f_16c]
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import math
+import mmap
+import time
+import zlib
+import struct
+import tempfile
+import argparse
+from array import array
+
+from utils.logger import AsyncLogger, CSV_HEADERS, format_timestamp
+
+RECORD_EXT = '.wtrec'
+MAGIC = b'WTREC\x00\x00\x00'
+FORMAT_VERSION = 1
+CHUNK_MAGIC = b'CHNK'
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+ALIGN = 8
+
+# 每块最多行数 (60Hz 下约 1 分钟)；记录时按 RECORD_FLUSH_INTERVAL_S 提前写出不满的块
+RECORD_CHUNK_ROWS = 4096
+RECORD_FLUSH_INTERVAL_S = 5.0
+COMPRESS_LEVEL = 6
+
+_FILE_HEAD = struct.Struct('<8sII')
+_CHUNK_HEAD = struct.Struct('<4sIIIII')
+
+# (列名, NumPy dtype)
+COLUMNS = (
+    ('time', '<f8'),              # Unix 时间戳 (s)
+    ('ias_kmh', '<f4'),           # 指示空速
+    ('tas_kmh', '<f4'),           # 真空速
+    ('altitude_m', '<f4'),        # 高度
+    ('mach', '<f4'),              # 马赫数
+    ('airbrake_pct', '<f4'),      # 减速板开度 %
+    ('throttle_in', '<f4'),       # 油门输入
+    ('throttle_out_pct', '<f4'),  # 引擎输出 %
+    ('limit_level', 'u1'),        # LimitEngine 判定等级 0/1/2 (未经滞回)
+    ('limit_kind', '<u2'),        # 最严重限制的类型 (字符串)
+    ('limit_ratio', '<f4'),       # 最严重限制的 当前值/限制值
+    ('limit_kmh', '<f4'),         # 当前 Vne (可变后掠翼随后掠变化)
+    ('limit_mach', '<f4'),        # 当前 MNE
+    ('exp_action', '<u2'),        # 实验动作类型 (字符串)
+    ('exp_reason', '<u2'),        # 实验触发原因 (字符串)
+)
+STRING_COLUMNS = ('limit_kind', 'exp_action', 'exp_reason')
+
+# 与 CSV 的对应关系: CSV_HEADERS 的数据列 + 限制列
+_CSV_MAP = (
+    ('Unix_Time', 'time'),
+    ('IAS_kmh', 'ias_kmh'),
+    ('TAS_kmh', 'tas_kmh'),
+    ('Altitude_m', 'altitude_m'),
+    ('Mach', 'mach'),
+    ('Airbrake_Pct', 'airbrake_pct'),
+    ('Throttle_In', 'throttle_in'),
+    ('Throttle_Out_Pct', 'throttle_out_pct'),
+    ('Exp_Action', 'exp_action'),
+    ('Exp_Reason', 'exp_reason'),
+    ('Limit_Level', 'limit_level'),
+    ('Limit_Kind', 'limit_kind'),
+    ('Limit_Ratio', 'limit_ratio'),
+    ('Limit_kmh', 'limit_kmh'),
+    ('Limit_Mach', 'limit_mach'),
+)
+CSV_EXPORT_HEADERS = CSV_HEADERS + [h for h, _ in _CSV_MAP if h not in CSV_HEADERS]
+
+# dtype -> array 类型码
+_TYPECODES = {'<f8': 'd', '<f4': 'f', 'u1': 'B', '<u2': 'H'}
+_ITEMSIZE = {'<f8': 8, '<f4': 4, 'u1': 1, '<u2': 2}
+
+
+def _pad(n):
+    return -n % ALIGN
+
+
+def _column_offsets(columns, rows):
+    """各列在块原始数据中的偏移"""
+    offsets = []
+    pos = 0
+    for _, dtype in columns:
+        offsets.append(pos)
+        size = rows * _ITEMSIZE[dtype]
+        pos += size + _pad(size)
+    return offsets, pos
+
+
+class RecordWriter:
+    """
+    按块写入记录文件 (只用标准库)
+
+    append() 按 COLUMNS 顺序接收一行原始值: 数值可以为 None (存为 NaN / 0)，
+    字符串列接收字符串或 None。write_chunk() 把已缓存的行写成一个块。
+    """
+    def __init__(self, f, aircraft='', limits=None, started=None, compress=True):
+        self.f = f
+        self.compress = compress
+        self.rows = 0
+        self._cols = [array(_TYPECODES[dtype]) for _, dtype in COLUMNS]
+        self._kinds = [dtype[-2] for _, dtype in COLUMNS]  # 'f' / 'u'
+        self._is_str = [name in STRING_COLUMNS for name, _ in COLUMNS]
+        self._strings = {'': 0}
+        self._new_strings = []
+
+        header = {
+            'aircraft': aircraft,
+            'limits': limits or {},
+            'started': started,
+            'compression': 'zlib' if compress else 'none',
+            'columns': [list(c) for c in COLUMNS],
+            'string_columns': list(STRING_COLUMNS),
+        }
+        blob = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        blob += b' ' * _pad(_FILE_HEAD.size + len(blob))
+        f.write(_FILE_HEAD.pack(MAGIC, FORMAT_VERSION, len(blob)))
+        f.write(blob)
+
+    @property
+    def pending(self):
+        """尚未写出的行数"""
+        return len(self._cols[0])
+
+    def _code(self, s):
+        if not s:
+            return 0
+        code = self._strings.get(s)
+        if code is None:
+            if len(self._strings) > 0xFFFF:
+                return 0  # 编号用尽 (u16)，记为空
+            code = self._strings[s] = len(self._strings)
+            self._new_strings.append(s)
+        return code
+
+    def append(self, row):
+        for col, kind, is_str, v in zip(self._cols, self._kinds, self._is_str, row):
+            if is_str:
+                col.append(self._code(v))
+            elif kind == 'f':
+                col.append(math.nan if v is None else v)
+            else:
+                col.append(v or 0)
+
+    def write_chunk(self):
+        rows = self.pending
+        if not rows:
+            return
+        parts = []
+        for col in self._cols:
+            if sys.byteorder == 'big':
+                col = array(col.typecode, col)
+                col.byteswap()
+            data = col.tobytes()
+            parts.append(data)
+            parts.append(bytes(_pad(len(data))))
+        raw = b''.join(parts)
+
+        codec = CODEC_NONE
+        stored = raw
+        if self.compress:
+            codec = CODEC_ZLIB
+            stored = zlib.compress(raw, COMPRESS_LEVEL)
+        strings = json.dumps(self._new_strings, ensure_ascii=False).encode('utf-8') if self._new_strings else b''
+
+        self.f.write(_CHUNK_HEAD.pack(CHUNK_MAGIC, rows, codec, len(stored), len(raw), len(strings)))
+        self.f.write(stored)
+        self.f.write(strings)
+        self.f.write(bytes(_pad(len(stored) + len(strings))))
+
+        self.rows += rows
+        self._cols = [array(col.typecode) for col in self._cols]
+        self._new_strings = []
+
+
+def _scan(buf):
+    """
+    解析文件头和块索引 (不读取列数据)
+
+    Returns:
+        (header, chunks, strings)
+        chunks: [(数据偏移, 行数, 编码, 存储长度, 原始长度)]
+        strings: 字符串编号表
+    """
+    size = len(buf)
+    if size < _FILE_HEAD.size:
+        raise ValueError("不是飞行记录文件")
+    magic, version, hlen = _FILE_HEAD.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise ValueError("不是飞行记录文件")
+    if version > FORMAT_VERSION:
+        raise ValueError(f"不支持的记录格式版本: {version}")
+    pos = _FILE_HEAD.size
+    header = json.loads(bytes(buf[pos:pos + hlen]).decode('utf-8'))
+    pos += hlen
+
+    chunks = []
+    strings = ['']
+    while pos + _CHUNK_HEAD.size <= size:
+        magic, rows, codec, stored, raw, slen = _CHUNK_HEAD.unpack_from(buf, pos)
+        data = pos + _CHUNK_HEAD.size
+        end = data + stored + slen
+        if magic != CHUNK_MAGIC or end > size:
+            break  # 写入中途中断的块
+        if slen:
+            strings.extend(json.loads(bytes(buf[data + stored:end]).decode('utf-8')))
+        chunks.append((data, rows, codec, stored, raw))
+        pos = end + _pad(stored + slen)
+    return header, chunks, strings
+
+
+class FlightRecording:
+    """
+    记录文件的只读视图 (需要 numpy)
+
+    文件通过 mmap 映射: 未压缩块的列直接是映射内存上的 NumPy 视图，不做任何解析
+    和复制 (只有一个块时 column() 返回的就是该视图)；压缩块按需解压一次并缓存。
+
+    with FlightRecording(path) as rec:
+        ias = rec['ias_kmh']
+        reasons = rec.strings('exp_reason')
+    """
+    def __init__(self, path):
+        # 只在读取时导入 numpy，写入记录 (界面) 不依赖它
+        try:
+            import numpy
+        except ImportError:
+            raise RuntimeError("读取飞行记录需要 numpy") from None
+        self._np = numpy
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.header, self._chunks, self.string_table = _scan(self._mm)
+        except Exception:
+            self._file.close()
+            raise
+        self._dtypes = {name: numpy.dtype(dtype) for name, dtype in self.header['columns']}
+        self.columns = list(self._dtypes)
+        self._offsets = {}
+        self._decoded = {}
+        self._cache = {}
+
+    @property
+    def aircraft(self):
+        return self.header.get('aircraft', '')
+
+    @property
+    def limits(self):
+        return self.header.get('limits', {})
+
+    def __len__(self):
+        return sum(c[1] for c in self._chunks)
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    def _chunk_data(self, i):
+        data, rows, codec, stored, raw = self._chunks[i]
+        if codec == CODEC_NONE:
+            return self._mm, data
+        buf = self._decoded.get(i)
+        if buf is None:
+            buf = self._decoded[i] = zlib.decompress(self._mm[data:data + stored])
+        return buf, 0
+
+    def _chunk_column(self, i, name):
+        rows = self._chunks[i][1]
+        offsets = self._offsets.get(rows)
+        if offsets is None:
+            offsets = self._offsets[rows] = dict(zip(self.columns, _column_offsets(self.header['columns'], rows)[0]))
+        buf, base = self._chunk_data(i)
+        return self._np.frombuffer(buf, self._dtypes[name], count=rows, offset=base + offsets[name])
+
+    def column(self, name):
+        """整列数据 (只读 ndarray)"""
+        if name not in self._dtypes:
+            raise KeyError(name)
+        arr = self._cache.get(name)
+        if arr is None:
+            parts = [self._chunk_column(i, name) for i in range(len(self._chunks))]
+            if not parts:
+                arr = self._np.empty(0, self._dtypes[name])
+            elif len(parts) == 1:
+                arr = parts[0]
+            else:
+                arr = self._np.concatenate(parts)
+            self._cache[name] = arr
+        return arr
+
+    def strings(self, name):
+        """字符串列解码后的 object 数组 (空为 '')"""
+        return self._np.array(self.string_table, dtype=object)[self.column(name)]
+
+    def close(self):
+        self._cache.clear()
+        self._decoded.clear()
+        try:
+            self._mm.close()
+        except BufferError:
+            pass  # 仍有列视图在使用映射，随对象释放
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FlightRecorder(AsyncLogger):
+    """
+    二进制飞行记录，会话接口与 CSVLogger 相同
+
+    每个机型一个文件 (log_YYYYMMDD_HHMMSS_<序号>_<机型>.wtrec)，文件头写入
+    LimitEngine.resolved_limits()。文件在该机型的第一行到达时由写入线程创建；
+    创建失败时停止会话，尚未写入的行计入 dropped。
+    """
+    extension = RECORD_EXT
+    flush_interval = RECORD_FLUSH_INTERVAL_S
+    flush_rows = RECORD_CHUNK_ROWS
+
+    def __init__(self, limit_engine=None, compress=True):
+        super().__init__()
+        self.limit_engine = limit_engine
+        self.compress = compress
+        self._base = None
+        self._type = None    # 轮询线程: 当前文件的机型
+        self._seq = 0        # 以下只由写入线程使用
+        self._file = None
+        self._rec = None
+        self.paths = []
+
+    def _open(self, path):
+        self._base = path
+        self._type = None
+        self._seq = 0
+        self.paths = []
+        # 文件按机型稍后创建，这里先确认目录可写，让失败在开启会话时就暴露
+        with tempfile.TemporaryFile(dir=os.path.dirname(path)):
+            pass
+        return path + '_*' + self.extension
+
+    def log_step(self, data, auto_result, limits=None):
+        plane_type = data.get('type') or ''
+        if plane_type != self._type and self.session_active:
+            engine = self.limit_engine
+            resolved = engine.resolved_limits() if engine and engine.plane_type == plane_type else {}
+            # 机型标记入队失败时下一帧重试，保证各行写入正确的文件
+            if not self._enqueue(('segment', plane_type, resolved, time.time())):
+                return
+            self._type = plane_type
+        super().log_step(data, auto_result, limits)
+
+    def _make_item(self, data, auto_result, limits):
+        return (
+            time.time(),
+            data.get('ias_kmh'),
+            data.get('tas_kmh'),
+            data.get('altitude'),
+            data.get('mach'),
+            data.get('airbrake'),
+            data.get('throttle_in'),
+            data.get('throttle_out'),
+            limits['level'] if limits else 0,
+            limits['kind'] if limits else None,
+            limits['ratio'] if limits else None,
+            limits['limit_kmh'] if limits else None,
+            limits['limit_mach'] if limits else None,
+            auto_result.get('action_type') if auto_result else None,
+            auto_result.get('reason') if auto_result else None
+        )
+
+    def _open_segment(self, plane_type, resolved, started):
+        self._close()
+        self._seq += 1
+        name = re.sub(r'[^\w.-]+', '_', plane_type) or 'unknown'
+        path = f"{self._base}_{self._seq}_{name}{self.extension}"
+        self._file = open(path, 'wb')
+        self._rec = RecordWriter(self._file, plane_type, resolved, started, self.compress)
+        self.paths.append(path)
+
+    def _write(self, items):
+        rows = 0
+        for item in items:
+            if item[0] == 'segment':
+                try:
+                    self._open_segment(*item[1:])
+                except OSError as e:
+                    print(f"创建飞行记录文件失败: {e}，日志记录已停止")
+                    self.session_active = False
+                continue
+            if self._rec is None:
+                self.dropped += 1
+                continue
+            self._rec.append(item)
+            rows += 1
+            if self._rec.pending >= RECORD_CHUNK_ROWS:
+                self._rec.write_chunk()
+        return rows
+
+    def _flush(self):
+        if self._rec is not None:
+            self._rec.write_chunk()
+            self._file.flush()
+
+    def _sync(self):
+        if self._rec is not None:
+            self._flush()
+            os.fsync(self._file.fileno())
+
+    def _close(self):
+        if self._file is not None:
+            try:
+                self._rec.write_chunk()
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+            self._rec = None
+
+
+# ----------------------------------------------------------------------
+# CSV 转换
+# ----------------------------------------------------------------------
+
+def _fmt_value(v):
+    return '' if v != v else f"{v:.7g}"
+
+
+def record_to_csv(src, dst):
+    """记录文件 -> CSV (CSVLogger 的列 + 限制列)，返回行数；只用标准库"""
+    with open(src, 'rb') as f, open(dst, 'w', newline='', encoding='utf-8') as out:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            header, chunks, strings = _scan(mm)
+            columns = header['columns']
+            index = {name: i for i, (name, _) in enumerate(columns)}
+            csv_map = dict(_CSV_MAP)
+            # 每个 CSV 列: (列号, 种类)，列号 None 表示该文件没有这一列
+            plan = []
+            for h in CSV_EXPORT_HEADERS[1:]:
+                name = csv_map.get(h)
+                kind = 'str' if name in STRING_COLUMNS else 'time' if name == 'time' else 'num'
+                plan.append((index.get(name), kind))
+            t_col = index['time']
+
+            writer = csv.writer(out)
+            writer.writerow(CSV_EXPORT_HEADERS)
+            total = 0
+            for data, rows, codec, stored, raw in chunks:
+                buf = mm[data:data + stored]
+                if codec == CODEC_ZLIB:
+                    buf = zlib.decompress(buf)
+                offsets, _ = _column_offsets(columns, rows)
+                cols = []
+                for (name, dtype), off in zip(columns, offsets):
+                    col = array(_TYPECODES[dtype])
+                    col.frombytes(buf[off:off + rows * _ITEMSIZE[dtype]])
+                    if sys.byteorder == 'big':
+                        col.byteswap()
+                    cols.append(col)
+
+                for r in range(rows):
+                    row = [format_timestamp(cols[t_col][r])]
+                    for i, kind in plan:
+                        if i is None:
+                            row.append('')
+                            continue
+                        v = cols[i][r]
+                        if kind == 'str':
+                            row.append(strings[v])
+                        elif kind == 'time':
+                            row.append(f"{v:.3f}")
+                        else:
+                            row.append(_fmt_value(v) if isinstance(v, float) else v)
+                    writer.writerow(row)
+                total += rows
+        finally:
+            mm.close()
+    return total
+
+
+def _parse_cell(name, s):
+    if name in STRING_COLUMNS:
+        return s or None
+    if s in ('', 'None'):
+        return None
+    if name == 'limit_level':
+        return int(float(s))
+    return float(s)
+
+
+def csv_to_record(src, dst, aircraft='', limits=None, compress=True):
+    """CSV (CSVLogger 或 record_to_csv 的输出) -> 记录文件，返回行数"""
+    names = [name for name, _ in COLUMNS]
+    with open(src, 'r', newline='', encoding='utf-8') as f, open(dst, 'wb') as out:
+        reader = csv.DictReader(f)
+        mapping = [(h, name) for h, name in _CSV_MAP if h in reader.fieldnames]
+        rec = None
+        for line in reader:
+            values = dict.fromkeys(names)
+            for h, name in mapping:
+                values[name] = _parse_cell(name, line[h])
+            if rec is None:
+                rec = RecordWriter(out, aircraft, limits, values['time'], compress)
+            rec.append([values[name] for name in names])
+            if rec.pending >= RECORD_CHUNK_ROWS:
+                rec.write_chunk()
+        if rec is None:
+            rec = RecordWriter(out, aircraft, limits, None, compress)
+        rec.write_chunk()
+        return rec.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="二进制飞行记录 (.wtrec) 工具",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("info", help="显示文件头和块信息")
+    p.add_argument("path")
+    p = sub.add_parser("to-csv", help="记录文件转换为 CSV")
+    p.add_argument("path")
+    p.add_argument("-o", "--output", help="输出路径 (默认同名 .csv)")
+    p = sub.add_parser("from-csv", help="CSV 转换为记录文件")
+    p.add_argument("path")
+    p.add_argument("-o", "--output", help=f"输出路径 (默认同名 {RECORD_EXT})")
+    p.add_argument("--aircraft", default="", help="写入文件头的机型")
+    p.add_argument("--no-compress", action="store_true", help="不压缩 (可直接映射为 NumPy 视图)")
+    args = parser.parse_args()
+
+    stem = os.path.splitext(args.path)[0]
+    if args.cmd == "info":
+        with open(args.path, 'rb') as f:
+            header, chunks, strings = _scan(f.read())
+        print(f"机型: {header.get('aircraft') or '-'}  压缩: {header.get('compression')}")
+        print(f"块: {len(chunks)}  行: {sum(c[1] for c in chunks)}  字符串: {len(strings) - 1}")
+        print("限制: " + json.dumps(header.get('limits', {}), ensure_ascii=False))
+        print("列: " + ", ".join(f"{n}:{d}" for n, d in header['columns']))
+    elif args.cmd == "to-csv":
+        dst = args.output or stem + '.csv'
+        print(f"{dst}: {record_to_csv(args.path, dst)} 行")
+    else:
+        dst = args.output or stem + RECORD_EXT
+        print(f"{dst}: {csv_to_record(args.path, dst, args.aircraft, compress=not args.no_compress)} 行")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,67 @@ import os
 import time
 import datetime
 import csv
+import queue
+import atexit
+import threading
+
+# 待写入行的队列上限 (30Hz 下约 2 分钟)，写盘卡住时超出的行计入 dropped
+LOG_QUEUE_SIZE = 4096
+# 刷新策略: 距上次刷新超过该时间，或累计未刷新行数达到上限
+FLUSH_INTERVAL_S = 1.0
+FLUSH_ROWS = 256
+
+# CSV 表头
+CSV_HEADERS = [
+    'Timestamp',        # 格式化时间 HH:MM:SS.mmm
+    'Unix_Time',        # Unix 时间戳
+    'IAS_kmh',          # 指示空速
+    'TAS_kmh',          # 真空速 (地速参考)
+    'Altitude_m',       # 高度
+    'Mach',             # 马赫数
+    'Airbrake_Pct',     # 减速板开度 %
+    'Throttle_In',      # 油门输入
+    'Throttle_Out_Pct', # 引擎输出 %
+    'Exp_Action',       # 实验动作类型
+    'Exp_Reason'        # 实验触发原因
+]
+
+_STOP = object()
+
+
+def format_timestamp(unix_time):
+    """HH:MM:SS.mmm (本地时间)"""
+    return datetime.datetime.fromtimestamp(unix_time).strftime('%H:%M:%S.%f')[:-3]
+
+
+class AsyncLogger:
+    """
+    后台写入的日志会话
+
+    log_step() 在轮询线程里只把原始值放进有界队列，不做格式化和任何 IO；
+    后台写入线程批量格式化、写入，并按时间/行数策略 flush。队列满时丢弃新行并计数，
+    stop_session() (以及进程退出时) 会写完队列中剩余的行并 fsync。
+
+    子类实现:
+        _open(path): 调用线程，打开会话 (path 不含扩展名)，返回用于提示的路径
+        _make_item(data, auto_result, limits): 轮询线程，取出要记录的原始值
+        _write(items) -> 写入行数 / _flush() / _sync() / _close(): 写入线程
+    """
+    extension = ''
+    flush_interval = FLUSH_INTERVAL_S
+    flush_rows = FLUSH_ROWS
 
-class CSVLogger:
     def __init__(self):
-        self.file = None
-        self.writer = None
         self.start_time = 0
         self.session_active = False
 
+        self._queue = None
+        self._thread = None
+        self.dropped = 0
+        self.written = 0
+        self.write_errors = 0
+        atexit.register(self.stop_session)
+
     def start_new_session(self):
         """开始新的日志会话，创建文件"""
         if self.session_active:
@@ -24,84 +77,181 @@ class CSVLogger:
                 print(f"无法创建日志目录: {e}")
                 return
 
-        # 创建文件名 logs/log_YYYYMMDD_HHMMSS.csv
-        filename = f"log_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        # 文件名 logs/log_YYYYMMDD_HHMMSS
+        filename = f"log_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
         filepath = os.path.join(log_dir, filename)
 
         try:
-            self.file = open(filepath, 'w', newline='', encoding='utf-8')
-            self.writer = csv.writer(self.file)
-            
-            # 写入表头
-            headers = [
-                'Timestamp',        # 格式化时间 HH:MM:SS.mmm
-                'Unix_Time',        # Unix 时间戳
-                'IAS_kmh',          # 指示空速
-                'TAS_kmh',          # 真空速 (地速参考)
-                'Altitude_m',       # 高度
-                'Mach',             # 马赫数
-                'Airbrake_Pct',     # 减速板开度 %
-                'Throttle_In',      # 油门输入
-                'Throttle_Out_Pct', # 引擎输出 %
-                'Exp_Action',       # 实验动作类型
-                'Exp_Reason'        # 实验触发原因
-            ]
-            self.writer.writerow(headers)
-            self.file.flush()
-            
+            shown = self._open(filepath)
+
+            self.start_time = time.time()
+            self.dropped = 0
+            self.written = 0
+            self.write_errors = 0
+            self._queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+            self._thread = threading.Thread(target=self._writer_loop, args=(self._queue,), daemon=True)
+            self._thread.start()
+
             self.session_active = True
-            print(f"日志记录已开启: {filepath}")
-            
+            print(f"日志记录已开启: {shown}")
+
         except Exception as e:
             print(f"创建日志文件失败: {e}")
             self.session_active = False
 
     def stop_session(self):
-        """停止日志记录并关闭文件"""
-        if self.file:
-            try:
-                self.file.close()
-            except:
-                pass
-            self.file = None
-            self.writer = None
-        
+        """停止日志记录: 写完队列中剩余的行，fsync 后关闭文件"""
+        if not self.session_active and self._thread is None:
+            return
         self.session_active = False
-        print("日志记录已停止")
 
-    def log_step(self, data, auto_result):
+        if self._thread is not None:
+            # 写入线程在处理完队列中已有的行之后才会读到 _STOP
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+            self._queue = None
+
+        try:
+            self._close()
+        except Exception:
+            pass
+
+        msg = f"日志记录已停止 (写入 {self.written} 行"
+        if self.dropped:
+            msg += f"，丢弃 {self.dropped} 行"
+        print(msg + ")")
+
+    def log_step(self, data, auto_result, limits=None):
         """
-        记录一步数据
+        记录一步数据 (只入队，不阻塞轮询线程)
         data: get_telemetry() 的返回字典
         auto_result: ab_mgr.update() 的返回字典
+        limits: LimitEngine.evaluate() 的返回字典 (可选)
         """
-        if not self.session_active or not self.writer:
-            return
+        self._enqueue(self._make_item(data, auto_result, limits))
 
+    def _enqueue(self, item):
+        """放入写入队列，队列满时丢弃并计数；返回是否成功"""
+        q = self._queue
+        if not self.session_active or q is None:
+            return False
         try:
-            now = datetime.datetime.now()
-            time_str = now.strftime('%H:%M:%S.%f')[:-3] # HH:MM:SS.mmm
-            
-            # 提取数据，处理 None
-            row = [
-                time_str,
-                f"{time.time():.3f}",
-                data.get('ias_kmh', ''),
-                data.get('tas_kmh', ''),
-                data.get('altitude', ''),
-                data.get('mach', ''),
-                data.get('airbrake', ''),
-                data.get('throttle_in', ''),
-                data.get('throttle_out', ''),
-                auto_result.get('action_type', '') if auto_result else '',
-                auto_result.get('reason', '') if auto_result else ''
-            ]
-            
-            self.writer.writerow(row)
-            # 实时刷新，防止崩溃丢失数据
-            self.file.flush()
-            
-        except Exception as e:
-            print(f"写入日志失败: {e}")
-            # 如果出错次数太多可能需要停止，暂时忽略
+            q.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _writer_loop(self, q):
+        """后台写入线程: 批量取出队列中的行，按时间/行数刷新"""
+        pending = 0
+        last_flush = time.monotonic()
+        stopping = False
 
+        while not stopping:
+            timeout = max(0.0, last_flush + self.flush_interval - time.monotonic()) if pending else None
+            try:
+                item = q.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            batch = []
+            while item is not None:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                try:
+                    item = q.get_nowait()
+                except queue.Empty:
+                    item = None
+
+            try:
+                if batch:
+                    rows = self._write(batch)
+                    self.written += rows
+                    pending += rows
+                now = time.monotonic()
+                if pending and (stopping or pending >= self.flush_rows or now - last_flush >= self.flush_interval):
+                    self._flush()
+                    pending = 0
+                    last_flush = now
+                if stopping:
+                    self._sync()
+            except Exception as e:
+                self.write_errors += 1
+                if self.write_errors == 1:
+                    print(f"写入日志失败: {e}")
+
+    def _open(self, path):
+        raise NotImplementedError
+
+    def _make_item(self, data, auto_result, limits):
+        raise NotImplementedError
+
+    def _write(self, items):
+        raise NotImplementedError
+
+    def _flush(self):
+        raise NotImplementedError
+
+    def _sync(self):
+        raise NotImplementedError
+
+    def _close(self):
+        raise NotImplementedError
+
+
+class CSVLogger(AsyncLogger):
+    """飞行数据 CSV 日志"""
+    extension = '.csv'
+
+    def __init__(self):
+        super().__init__()
+        self.file = None
+        self.writer = None
+
+    def _open(self, path):
+        filepath = path + self.extension
+        self.file = open(filepath, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+
+        # 写入表头
+        self.writer.writerow(CSV_HEADERS)
+        self.file.flush()
+        return filepath
+
+    def _make_item(self, data, auto_result, limits):
+        return (
+            time.time(),
+            data.get('ias_kmh', ''),
+            data.get('tas_kmh', ''),
+            data.get('altitude', ''),
+            data.get('mach', ''),
+            data.get('airbrake', ''),
+            data.get('throttle_in', ''),
+            data.get('throttle_out', ''),
+            auto_result.get('action_type', '') if auto_result else '',
+            auto_result.get('reason', '') if auto_result else ''
+        )
+
+    def _write(self, items):
+        self.writer.writerows([format_timestamp(item[0]), f"{item[0]:.3f}", *item[1:]] for item in items)
+        return len(items)
+
+    def _flush(self):
+        self.file.flush()
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def _close(self):
+        if self.file:
+            try:
+                self.file.close()
+            except:
+                pass
+            self.file = None
+            self.writer = None